@@ -0,0 +1,347 @@
+"""
+Pipeline benchmark for pyguardian-lt.
+
+Times every stage of an analysis on generated files of a few sizes and on a generated tree of
+many files: loading the policy (cold from YAML and from its snapshot), RulesFilter.collect_all,
+each Analysis.analyse_* scanner, the native backend's built-in checks, the combined pass the CLI
+runs, OutputFormatter.reformat_output and the serialization of the findings to JSON. The generated
+code is the same for the same --seed, so runs on different commits time the same work.
+
+    python benchmarks/pipeline.py [--scenarios small,medium,large,tree] [--runs N]
+                                  [--output results.json] [--baseline baseline.json]
+
+Results are printed (or written to --output) as JSON. With --baseline the medians are compared
+against an earlier output, and the exit code is 1 when a stage got slower than --threshold.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pyguardian_lite import config as policy_config  # noqa: E402
+from pyguardian_lite import core  # noqa: E402
+from pyguardian_lite.pg_files.analysis import Analysis  # noqa: E402
+from pyguardian_lite.pg_files.formatter import OutputFormatter  # noqa: E402
+from pyguardian_lite.pg_files.rulesfilter import CompiledPolicy, RulesFilter  # noqa: E402
+
+# Lines of the generated files
+SIZES = {"small": 200, "medium": 5000, "large": 100000}
+# Runs of the large file and the tree, they take seconds each
+SLOW_RUNS = 1
+
+HEADER = '''"""
+Generated module {index}.
+"""
+import os, sys
+import subprocess
+import pickle
+
+'''
+
+# Snippets with the usual mix of findings: naming, whitespace, long lines, complexity and security
+SNIPPETS = [
+    '''def compute_{index}(Value, items=None):
+    """Sums up the items."""
+    Total = 0
+    for item in items or []:
+        if item % 3 == 0 :
+            Total += item*2
+        elif item > {index}:
+            Total -= item
+        else:
+            Total+=1
+    assert Total >= 0
+    return Total
+
+
+''',
+    '''class record_{index}(object):
+    limit = {index}
+
+    def method(this, x):
+        l = [x,x]
+        return subprocess.call(["ls", str(x)], shell=True)
+
+    def load(self, data):
+        return pickle.loads(data)
+
+
+''',
+    '''def describe_{index}(name, value):
+    message = "the value of " + name + " is " + str(value) + " and it was computed at step number {index} of the run"
+    if value == None:
+        return message  # no value
+    return message.strip()
+
+
+''',
+    '''def branch_{index}(a, b, c):
+    if a:
+        if b:
+            return 1
+        elif c:
+            return 2
+    elif b and c:
+        for i in range(a):
+            if i % 2:
+                continue
+            while c:
+                c -= 1
+                if c == i:
+                    break
+    try:
+        return a / b
+    except:
+        pass
+    return 0
+
+
+''',
+    '''CONSTANT_{index} = {{ "key":{index}, 'other' : [1,2,3] }}
+password_{index} = "hunter2"
+
+
+''',
+]
+
+
+def generate_module(lines, seed, index=0):
+    """
+    Returns generated Python source of about `lines` lines, the same for the same seed.
+    """
+    rng = random.Random(seed)
+    parts = [HEADER.format(index=index)]
+    count = parts[0].count("\n")
+    number = 0
+    while count < lines:
+        snippet = rng.choice(SNIPPETS).format(index=number)
+        parts.append(snippet)
+        count += snippet.count("\n")
+        number += 1
+    parts.append("os.getcwd()\nsys.exit(0)\n")
+    return "".join(parts)
+
+
+def generate_tree(directory, files, seed):
+    """
+    Writes `files` generated modules of 40 to 400 lines into nested packages below `directory`.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for index in range(files):
+        package = os.path.join(directory, f"package_{index // 100}", f"module_{index // 10 % 10}")
+        os.makedirs(package, exist_ok=True)
+        path = os.path.join(package, f"file_{index}.py")
+        with open(path, "w") as f:
+            f.write(generate_module(rng.randint(40, 400), rng.random(), index))
+        paths.append(path)
+    return paths
+
+
+def measure(function, runs):
+    """
+    Calls function `runs` times, returns (median, min) in milliseconds and the last result.
+    """
+    times = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times) * 1000, 3), round(min(times) * 1000, 3), result
+
+
+def stage(stages, name, function, runs):
+    median, minimum, result = measure(function, runs)
+    stages[name] = {"median_ms": median, "min_ms": minimum}
+    return result
+
+
+def benchmark_policy(runs, workdir):
+    """
+    Times loading and compiling the default policy.
+    """
+    # A copy, so the snapshot of the installed policy is left alone
+    policy_path = os.path.join(workdir, "pipeguardian.yaml")
+    shutil.copy(os.path.join(ROOT, "pyguardian_lite", "config", "pipeguardian.yaml"), policy_path)
+
+    def load_cold():
+        if os.path.exists(policy_path + policy_config.SNAPSHOT_SUFFIX):
+            os.unlink(policy_path + policy_config.SNAPSHOT_SUFFIX)
+        return policy_config.load_config(policy_path)
+
+    stages = {}
+    stage(stages, "load_config_cold", load_cold, runs)
+    config = stage(stages, "load_config", lambda: policy_config.load_config(policy_path), runs)
+    stage(stages, "rulesfilter_collect_all", lambda: RulesFilter(config).collect_all(), runs)
+    policy = CompiledPolicy.from_config(config)
+    return stages, policy
+
+
+def analysis_stages(source, path, policy, runs):
+    """
+    Times the stages of analysing one source, returns the stages and the number of findings.
+    """
+    def analysis(scan_mode, backend="inprocess"):
+        run = Analysis(source, policy.rules, policy.extra_rules, backend, scan_mode, path)
+        run.check_extra_rules(policy.extra_rules)
+        return run
+
+    stages = {}
+    stage(stages, "analyse_pep8naming", lambda: analysis("separate").analyse_pep8naming(), runs)
+    stage(stages, "native_pep8naming", lambda: analysis("separate", "native").analyse_pep8naming(), runs)
+    stage(stages, "analyse_pycodestyle", lambda: analysis("separate").analyse_pycodestyle(), runs)
+    stage(stages, "native_pycodestyle", lambda: analysis("separate", "native").analyse_pycodestyle(), runs)
+    stage(stages, "analyse_bandit", lambda: analysis("separate").analyse_bandit(), runs)
+    # Every run after the first one finds the scores of the functions in the cache
+    stage(stages, "complexity_report", lambda: core.complexity_report([(path, source)]), runs)
+    scan_output = stage(stages, "analyse_combined", lambda: analysis("combined").full_analysis(), runs)
+
+    def reformat():
+        formatter = OutputFormatter(scan_output, policy.rules, policy.severity, policy.format_rules)
+        formatter.reformat_output()
+        return formatter.collect_default_output()
+
+    result = stage(stages, "reformat_output", reformat, runs)
+
+    def serialize():
+        entries = []
+        for category_data in result:
+            for severity_data in category_data.values():
+                for errors in severity_data.values():
+                    entries.extend(error.to_dict(path) for error in errors)
+        return json.dumps(entries)
+
+    serialized = stage(stages, "serialize", serialize, runs)
+    return stages, len(json.loads(serialized))
+
+
+def benchmark_file(name, lines, policy, runs, seed, workdir):
+    source = generate_module(lines, seed)
+    path = os.path.join(workdir, f"{name}.py")
+    with open(path, "w") as f:
+        f.write(source)
+    stages, findings = analysis_stages(source, path, policy, runs)
+    stages["total"] = {key: round(sum(value[key] for stage_name, value in stages.items()
+                                      if stage_name in ("analyse_combined", "reformat_output", "serialize")), 3)
+                       for key in ("median_ms", "min_ms")}
+    return {"lines": source.count("\n"), "findings": findings, "stages": stages}
+
+
+def benchmark_tree(files, policy, runs, seed, workdir, jobs):
+    paths = generate_tree(os.path.join(workdir, "tree"), files, seed)
+    lines = 0
+    for path in paths:
+        with open(path) as f:
+            lines += f.read().count("\n")
+
+    # The stages summed over the files, each file analysed once per run
+    totals = {}
+    findings = 0
+    for _ in range(runs):
+        for path in paths:
+            with open(path) as f:
+                source = f.read()
+            stages, count = analysis_stages(source, path, policy, 1)
+            for stage_name, value in stages.items():
+                totals.setdefault(stage_name, []).append(value["median_ms"])
+            findings += count
+    stages = {stage_name: {"median_ms": round(sum(times) / runs, 3)} for stage_name, times in totals.items()}
+
+    # And the whole batch the way the CLI runs it
+    stages["run_batch_analysis"] = dict(zip(("median_ms", "min_ms"), measure(
+        lambda: core.run_batch_analysis(paths, policy, jobs), runs)[:2]))
+    return {"files": len(paths), "lines": lines, "findings": findings // runs, "jobs": jobs, "stages": stages}
+
+
+def compare(results, baseline, threshold, min_delta):
+    """
+    Returns the stages whose median changed by more than `threshold` against the baseline, and by
+    at least `min_delta` ms (the sub-millisecond stages are mostly noise).
+    """
+    changes = []
+    for scenario, result in results.items():
+        previous = baseline.get("results", {}).get(scenario)
+        if previous is None:
+            continue
+        for stage_name, value in result["stages"].items():
+            before = previous["stages"].get(stage_name, {}).get("median_ms")
+            if not before:
+                continue
+            ratio = value["median_ms"] / before
+            if abs(ratio - 1) > threshold and abs(value["median_ms"] - before) >= min_delta:
+                changes.append({"scenario": scenario, "stage": stage_name, "baseline_ms": before,
+                                "median_ms": value["median_ms"], "ratio": round(ratio, 3),
+                                "regression": ratio > 1})
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pyguardian-lt pipeline benchmark")
+    parser.add_argument("--scenarios", default="small,medium,large,tree",
+                        help="Comma separated scenarios to run: small, medium, large (100k lines) and tree")
+    parser.add_argument("--runs", type=int, default=5,
+                        help="Runs per stage, the median is reported (the large file and the tree run once)")
+    parser.add_argument("--tree-files", type=int, default=2000, help="Number of files of the tree scenario")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="Worker processes of the tree's batch run")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated code")
+    parser.add_argument("--output", help="Write the results to this file instead of stdout")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative change of a median reported by --baseline (default 0.10)")
+    parser.add_argument("--min-delta", type=float, default=1.0,
+                        help="Smallest change in ms reported by --baseline (default 1.0)")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SIZES and name != "tree"]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="pyguardian-pipeline-")
+    try:
+        policy_stages, policy = benchmark_policy(args.runs, workdir)
+        # Load the flake8 plugins once, so the first stage doesn't pay for it
+        core.run_source_analysis("warmup.py", "import os\n", policy)
+
+        results = {"policy": {"stages": policy_stages}}
+        for name in scenarios:
+            if name == "tree":
+                results[name] = benchmark_tree(args.tree_files, policy, SLOW_RUNS, args.seed, workdir, args.jobs)
+            else:
+                runs = SLOW_RUNS if name == "large" else args.runs
+                results[name] = benchmark_file(name, SIZES[name], policy, runs, args.seed, workdir)
+            print(f"{name}: done", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"python": sys.version.split()[0], "runs": args.runs, "seed": args.seed, "results": results}
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(results, json.load(f), args.threshold, args.min_delta)
+        for change in report["comparison"]:
+            label = "slower" if change["regression"] else "faster"
+            print(f"{change['scenario']} {change['stage']}: {change['baseline_ms']} -> {change['median_ms']} ms "
+                  f"({change['ratio']}x, {label})", file=sys.stderr)
+        if any(change["regression"] for change in report["comparison"]):
+            exit_code = 1
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
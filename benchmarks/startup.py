@@ -0,0 +1,112 @@
+"""
+Startup benchmark for the pyguardian-lt CLI.
+
+Runs the CLI in fresh interpreters with `python -X importtime` and reports the cold start
+(no bytecode cache, no policy snapshot, empty result cache) and warm start latency of a few
+scenarios, together with the slowest imports.
+
+    python benchmarks/startup.py [file] [--runs N] [--top N]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = "import sys; from pyguardian_lite.cli import main; sys.argv[0] = 'pyguardian-lt'; main()"
+
+
+def run_cli(arguments, environment):
+    command = [sys.executable, "-X", "importtime", "-c", CLI, *arguments]
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True, cwd=ROOT, env=environment)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"pyguardian-lt {' '.join(arguments)} failed:\n{result.stderr}")
+    return elapsed, parse_importtime(result.stderr)
+
+
+def parse_importtime(stderr):
+    """
+    Returns {module: cumulative microseconds} from the -X importtime output.
+    """
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        imports[module.strip()] = int(cumulative)
+    return imports
+
+
+def remove_snapshot():
+    snapshot = os.path.join(ROOT, "pyguardian_lite", "config", "pipeguardian.yaml.pgc")
+    if os.path.exists(snapshot):
+        os.unlink(snapshot)
+
+
+def benchmark(name, arguments, runs, workdir):
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+
+    # Cold: bytecode compiled from scratch, policy compiled from YAML and an empty result cache
+    cold_times = []
+    cold_imports = {}
+    for run in range(runs):
+        environment["PYTHONPYCACHEPREFIX"] = os.path.join(workdir, f"{name}-pycache-{run}")
+        shutil.rmtree(os.path.join(workdir, "cache"), ignore_errors=True)
+        remove_snapshot()
+        elapsed, cold_imports = run_cli(arguments, environment)
+        cold_times.append(elapsed)
+
+    # Warm: reuse the bytecode, snapshot and result cache of the last cold run
+    warm_times = []
+    warm_imports = {}
+    for _ in range(runs):
+        elapsed, warm_imports = run_cli(arguments, environment)
+        warm_times.append(elapsed)
+
+    return {
+        "scenario": name,
+        "cold_ms": round(statistics.median(cold_times) * 1000, 1),
+        "warm_ms": round(statistics.median(warm_times) * 1000, 1),
+        "cold_imports": cold_imports,
+        "warm_imports": warm_imports,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pyguardian-lt startup benchmark")
+    parser.add_argument("file", nargs="?", default=os.path.join(ROOT, "pyguardian_lite", "core.py"),
+                        help="Python file analyzed by the scenarios")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per scenario, the median is reported")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to report")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pyguardian-startup-")
+    cache_dir = os.path.join(workdir, "cache")
+    scenarios = [
+        ("help", ["--help"]),
+        ("analyze", [args.file]),
+        ("cache-hit", ["--cache-dir", cache_dir, args.file]),
+    ]
+    try:
+        results = []
+        for name, arguments in scenarios:
+            result = benchmark(name, arguments, args.runs, workdir)
+            for key in ("cold_imports", "warm_imports"):
+                slowest = sorted(result[key].items(), key=lambda item: item[1], reverse=True)
+                result[key] = [{"module": module, "cumulative_us": us} for module, us in slowest[:args.top]]
+            results.append(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps({"python": sys.version.split()[0], "runs": args.runs, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,77 @@
 import argparse
 import json
+import os
 import sys
-from pyguardian_lite.core import run_analysis
-from pyguardian_lite.config import load_config
-from pyguardian_lite.config import add_policy
+
+# The pyguardian modules are imported where they are used, so that e.g. --addPolicy or a
+# result cache hit never import the scanners (this runs on every save in the editor)
 
 
 def main():
-    parser = argparse.ArgumentParser(description="PipeGuardian-lite CLI")
+    if sys.argv[1:2] == ["serve"]:
+        serve(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["lsp"]:
+        lsp(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description="PipeGuardian-lite CLI",
+                                     epilog="Run 'pyguardian-lt serve' to start a persistent analysis daemon, "
+                                            "or 'pyguardian-lt lsp' to start the language server")
     parser.add_argument("--addPolicy", help="Path to the custom YAML file to add as policy")
-    parser.add_argument("file", nargs="?", help="Python file to analyze")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="Number of worker processes used when analyzing multiple files")
+    add_analysis_options(parser)
+    parser.add_argument("--client", action="store_true",
+                        help="Send the analysis to a running 'pyguardian-lt serve' daemon, "
+                             "analyze in this process when none is running")
+    parser.add_argument("--socket", help="Unix socket of the daemon used by --client")
+    parser.add_argument("--diff", metavar="BASE",
+                        help="Only analyze the Python files changed since the merge base with this git ref")
+    parser.add_argument("--staged", action="store_true",
+                        help="Analyze the staged content of the Python files changed in the git index")
+    parser.add_argument("--only-changed-lines", action="store_true",
+                        help="With --diff or --staged, drop findings outside the added or modified lines")
+    parser.add_argument("--format", choices=["json", "ndjson", "sarif", "junit"], default="json",
+                        help="Print one JSON list (default), one JSON finding per line, a SARIF 2.1.0 log or a "
+                             "JUnit XML report; all but json are written as soon as each file is analysed")
+    parser.add_argument("--tiered", action="store_true",
+                        help="Report the policy categories of tier 1 in meta.tiers first and the slower tiers "
+                             "after them; with --format json every tier is printed as a JSON list of its own line")
+    parser.add_argument("--timings", action="store_true",
+                        help="Report the wall and CPU time of every stage and scanner on stderr. With the "
+                             "inprocess backend every flake8 plugin gets a check: row, the other backends only "
+                             "time whole scans")
+    parser.add_argument("--profile-rules", action="store_true",
+                        help="Measure the time spent per flake8 plugin and check, mapped to the rulebook types "
+                             "and policy categories, and print it on stderr. Needs the inprocess backend, files "
+                             "served from the result cache aren't measured")
+    parser.add_argument("--profile-output", metavar="FILE",
+                        help="Write the --profile-rules measurements to FILE as JSON instead")
+    parser.add_argument("--complexity-report", action="store_true",
+                        help="Print the cyclomatic complexity of every function of the files as a JSON list "
+                             "instead of analysing them, also of the functions below the policy's threshold")
+    parser.add_argument("--stdin-display-name", default="stdin",
+                        help="File name reported for source code read from stdin (file argument '-')")
+    parser.add_argument("file", nargs="*",
+                        help="Python files, directories (searched recursively) or glob patterns to analyze, "
+                             "or '-' to read the source from stdin")
 
     args = parser.parse_args()
+    if args.diff and args.staged:
+        parser.error("--diff and --staged can't be combined")
+    if args.only_changed_lines and not (args.diff or args.staged):
+        parser.error("--only-changed-lines requires --diff or --staged")
+    if args.profile_output:
+        args.profile_rules = True
+    if args.profile_rules and (args.backend != "inprocess" or args.client or args.scan_mode == "concurrent"):
+        parser.error("--profile-rules requires the inprocess backend and can't be combined with --client or "
+                     "--scan-mode concurrent")
+    if args.tiered and args.client:
+        parser.error("--tiered can't be combined with --client")
 
     # Check if neither argument is provided
-    if not args.addPolicy and not args.file:
+    if not args.addPolicy and not args.file and not args.diff and not args.staged:
         custom_error_message()
 
     # If no arguments are provided, show the custom error message
@@ -23,13 +80,265 @@ def main():
 
     # Handle addPolicy independently
     if args.addPolicy:
+        from pyguardian_lite.config import add_policy
         add_policy(args.addPolicy)
         return  # Exit after adding the policy
 
-    config = load_config()
-    results = run_analysis(args.file, config)
+    collector = None
+    if args.timings:
+        from pyguardian_lite.pg_files.timings import TimingCollector, add_hook
+        collector = add_hook(TimingCollector())
+    profiler = None
+    if args.profile_rules:
+        from pyguardian_lite.pg_files.engine import get_engine
+        from pyguardian_lite.pg_files.profiler import RuleProfiler
+        profiler = RuleProfiler().install(get_engine())
+
+    changes = None
+    staged = None
+    if args.diff or args.staged:
+        from pyguardian_lite import gitdiff
+        try:
+            if args.diff:
+                changes = gitdiff.changed_lines(args.diff, args.file)
+            else:
+                # Blob contents are read lazily, one at a time, while the files are analysed
+                staged = gitdiff.read_blobs(gitdiff.staged_blobs(args.file))
+                if args.only_changed_lines:
+                    changes = gitdiff.staged_lines(args.file)
+        except gitdiff.GitError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    source = None
+    files = None
+    single = False
+    if staged is not None:
+        files = staged
+    elif changes is not None:
+        files = sorted(changes)
+    elif args.file == ["-"]:
+        # Unsaved editor buffers are piped in and analysed in memory
+        source = sys.stdin.read()
+    else:
+        from pyguardian_lite.core import collect_files
+        files = collect_files(args.file)
+        # A single file keeps reporting its basename
+        single = len(args.file) == 1 and files == args.file
+
+    if args.complexity_report:
+        from pyguardian_lite.core import complexity_report
+        items = [(args.stdin_display_name, source)] if source is not None else files
+        print(json.dumps(complexity_report(items)))
+        return
+
+    batches = None
+    if args.client:
+        if staged is not None:
+            # Kept around in case the daemon goes away and the files are analysed here after all
+            files = list(staged)
+        results = run_client(args, source, files, single)
+        if results is not None:
+            batches = [results]
+
+    cache = None
+    if batches is None:
+        from pyguardian_lite.config import load_compiled_policy
+        from pyguardian_lite import core
+
+        config = load_compiled_policy()
+        cache = make_cache(args)
+
+        tiers = core.policy_tiers(config) if args.tiered else [(1, None)]
+        if staged is not None and len(tiers) > 1:
+            # Every tier reads the staged files again
+            files = list(staged)
+        # One batch of outputs per tier, the next tier is only analysed once the previous one is written
+        batches = (analyse_batch(args, core, config, cache, source, files, single, categories)
+                   for _, categories in tiers)
+
+    changes = changes if args.only_changed_lines else None
+    if args.format == "json":
+        for outputs in batches:
+            write_results(outputs, args.format, changes)
+    else:
+        write_results((output for outputs in batches for output in outputs), args.format, changes)
+    if collector is not None:
+        print(collector.report(), file=sys.stderr)
+    if profiler is not None:
+        profiler.uninstall()
+        write_rule_profile(profiler.report(), args.profile_output)
+    if cache is not None:
+        # Keep stdout clean for the JSON output
+        stats = cache.stats
+        print(f"Cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions",
+              file=sys.stderr)
+
+
+def analyse_batch(args, core, config, cache, source, files, single, categories=None):
+    """
+    Returns [(file name, output)] of analysing the source or the files, limited to `categories` of the
+    policy. The name is None for the output of a whole batch.
+    """
+    if source is not None:
+        return [(args.stdin_display_name, core.run_source_analysis(args.stdin_display_name, source, config,
+                                                                   args.backend, args.scan_mode, cache, categories))]
+    if single:
+        return [(os.path.basename(files[0]), core.run_analysis(files[0], config, args.backend, args.scan_mode,
+                                                               cache=cache, categories=categories))]
+    if args.format != "json":
+        # Every file's findings are written as soon as the file is done; the names are recorded while the
+        # files are read, they may be read lazily (--staged)
+        names = []
+        outputs = core.iter_batch_analysis(named_items(files, names), config, args.jobs, args.backend,
+                                           args.scan_mode, cache, categories)
+        return ((names[index], output) for index, output in outputs)
+    # Findings report the path as given, or relative to the current directory for --diff
+    return [(None, core.run_batch_analysis(files, config, args.jobs, args.backend, args.scan_mode, cache,
+                                           categories))]
+
+
+def named_items(items, names):
+    for item in items:
+        # Reported with the path as given, or the name of an in-memory file
+        names.append(item[0] if isinstance(item, tuple) else item)
+        yield item
+
+
+def write_results(outputs, output_format, changes=None):
+    """
+    Writes the findings of every (file name, output) in `outputs`; with `changes` only the ones on
+    changed lines. The names let the report formats list the files without findings.
+    """
+    # Only the writing is timed, streamed outputs are analysed while they are consumed
+    from pyguardian_lite.pg_files.timings import span
+
+    if changes is not None:
+        from pyguardian_lite.gitdiff import in_changed_lines
+        outputs = ((name, [entry for entry in output
+                           if in_changed_lines(entry["line"], changes.get(entry["file"], ()))])
+                   for name, output in outputs)
+
+    if output_format in ("sarif", "junit"):
+        from pyguardian_lite.config import load_config
+        from pyguardian_lite.pg_files.reports import REPORT_WRITERS, rule_metadata
+
+        # Rule names and descriptions of the policy, written once per reported rule
+        writer = REPORT_WRITERS[output_format](sys.stdout, rule_metadata(load_config()))
+        writer.start()
+        for name, output in outputs:
+            with span("serialize"):
+                writer.write(output, name)
+        with span("serialize"):
+            writer.finish()
+        return
+
+    if output_format == "ndjson":
+        for _, output in outputs:
+            with span("serialize"):
+                for entry in output:
+                    sys.stdout.write(json.dumps(entry) + "\n")
+                # Downstream tools read the findings while the rest of the files are analysed
+                sys.stdout.flush()
+        return
+
+    outputs = list(outputs)
+    with span("serialize"):
+        print(json.dumps([entry for _, output in outputs for entry in output]))  # Output for VS Code to parse
+
+
+def write_rule_profile(plugins, path):
+    if path is None:
+        from pyguardian_lite.pg_files.profiler import format_report
+        print(format_report(plugins), file=sys.stderr)
+        return
+    with open(path, "w") as f:
+        json.dump({"plugins": plugins}, f, indent=2)
+
+
+def serve(arguments):
+    parser = argparse.ArgumentParser(prog="pyguardian-lt serve",
+                                     description="Run a persistent PipeGuardian-lite analysis daemon")
+    parser.add_argument("--socket", help="Unix socket to listen on")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="Append the timing spans of every request to FILE, one JSON object per line")
+    add_analysis_options(parser)
+    args = parser.parse_args(arguments)
+
+    if args.metrics:
+        from pyguardian_lite.pg_files.timings import MetricsFile, add_hook
+        add_hook(MetricsFile(args.metrics))
+
+    from pyguardian_lite.server import serve as serve_daemon
+    serve_daemon(args.socket, args.backend, args.scan_mode, make_cache(args))
+
+
+def lsp(arguments):
+    parser = argparse.ArgumentParser(prog="pyguardian-lt lsp",
+                                     description="Run the PipeGuardian-lite language server on stdin/stdout")
+    parser.add_argument("--debounce", type=int, default=300,
+                        help="Milliseconds without edits before a changed document is analysed again")
+    add_analysis_options(parser)
+    args = parser.parse_args(arguments)
+
+    from pyguardian_lite.lsp import serve_stdio
+    sys.exit(serve_stdio(args.backend, args.scan_mode, make_cache(args), args.debounce / 1000))
+
+
+def add_analysis_options(parser):
+    parser.add_argument("--backend", choices=["inprocess", "subprocess", "native"], default="inprocess",
+                        help="Run flake8 inside this process (default) or as a subprocess per scan, or check the "
+                             "naming conventions, the physical lines and the complexity with the built-in "
+                             "checkers and the rest with flake8 in-process")
+    parser.add_argument("--scan-mode", choices=["combined", "separate", "concurrent"], default="combined",
+                        help="Check all categories in one flake8 pass (default), one pass per category, or one "
+                             "concurrent flake8 subprocess per category, killed at the policy's meta.scan_timeouts")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse the results of unchanged files from the on-disk result cache")
+    parser.add_argument("--cache-dir", help="Directory of the result cache (implies --cache)")
+    parser.add_argument("--cache-size", type=int, default=256,
+                        help="Maximum size of the result cache in MB, least recently used entries are evicted")
+
+
+def make_cache(args):
+    if not (args.cache or args.cache_dir):
+        return None
+    from pyguardian_lite.pg_files.cache import ResultCache
+    return ResultCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+
+def run_client(args, source, files, single):
+    """
+    Forwards the analysis to the daemon, returns [(file name, output)]. Returns None when no daemon is
+    running, the caller then analyses in this process.
+    """
+    from pyguardian_lite.config import find_config
+    from pyguardian_lite.server import ServerError, request
 
-    print(json.dumps(results))  # Output for VS Code to parse
+    # The daemon may run in another directory, send absolute paths and the policy found from here
+    policy = os.path.abspath(find_config())
+    try:
+        if source is not None:
+            return [(args.stdin_display_name, request("analyze_source", {"name": args.stdin_display_name,
+                                                                         "text": source, "policy": policy},
+                                                      args.socket))]
+        results = []
+        for path in files:
+            if isinstance(path, tuple):
+                results.append((path[0], request("analyze_source", {"name": path[0], "text": path[1],
+                                                                    "policy": policy}, args.socket)))
+                continue
+            display_name = os.path.basename(path) if single else path
+            results.append((display_name, request("analyze", {"path": os.path.abspath(path),
+                                                              "display_name": display_name, "policy": policy},
+                                                  args.socket)))
+        return results
+    except ServerError as e:
+        print(f"Error: {e.message}", file=sys.stderr)
+        sys.exit(1)
+    except OSError:
+        # No daemon listening (or it went away)
+        return None
 
 
 # Custom error message handler
@@ -1,23 +1,139 @@
-import yaml
+import hashlib
+import marshal
 import os
 import shutil
 
+from pyguardian_lite.pg_files.timings import current_span, span
 
-def load_config(config_path=None):
+# Bump when the layout of the snapshot changes
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MAGIC = b"PGPOLICY"
+SNAPSHOT_SUFFIX = ".pgc"
+
+
+def find_config(config_path=None):
     if config_path is None:
         # First check if the file exists in the current working directory
         config_path = 'pipeguardian.yaml'
         if not os.path.isfile(config_path):
             # If not, fall back to the package's default configuration
             config_path = os.path.join(os.path.dirname(__file__), 'config', 'pipeguardian.yaml')
+    return config_path
+
+
+def load_config(config_path=None):
+    config_path = find_config(config_path)
     try:
-        with open(config_path, 'r') as f:
-            return yaml.safe_load(f)
+        return load_snapshot(config_path)["config"]
     except FileNotFoundError:
         print(f"Config file not found at {config_path}. Using default config.")
         return {"YAML": "Not found!"}  # Default config
 
 
+def load_compiled_policy(config_path=None):
+    """
+    Returns the CompiledPolicy of the policy file, from its snapshot when it is still up to date.
+    """
+    from pyguardian_lite.pg_files.rulesfilter import CompiledPolicy
+
+    config_path = find_config(config_path)
+    try:
+        return CompiledPolicy.from_data(load_snapshot(config_path)["compiled"])
+    except FileNotFoundError:
+        print(f"Config file not found at {config_path}. Using default config.")
+        return CompiledPolicy.from_config({"YAML": "Not found!"})  # Default config
+
+
+def compiler_signature():
+    # The compiled rules depend on the rulebook and the filter, recompile when either changes
+    pg_files = os.path.join(os.path.dirname(__file__), 'pg_files')
+    return [os.stat(os.path.join(pg_files, module)).st_mtime_ns for module in ('rulebook.py', 'rulesfilter.py')]
+
+
+def load_snapshot(config_path):
+    """
+    Loads the snapshot stored next to the YAML policy. The snapshot is used as long as the
+    policy's mtime and size, or otherwise its content hash, still match; if not the policy is
+    compiled again.
+    """
+    with span("load_config"):
+        stat = os.stat(config_path)
+        snapshot = read_snapshot(config_path + SNAPSHOT_SUFFIX)
+        if snapshot is not None and snapshot["compiler"] == compiler_signature():
+            if snapshot["mtime"] == stat.st_mtime_ns and snapshot["size"] == stat.st_size:
+                return snapshot
+            # Touched but maybe not changed (e.g. a fresh checkout), compare the content
+            with open(config_path, 'rb') as f:
+                if hashlib.sha256(f.read()).hexdigest() == snapshot["sha256"]:
+                    snapshot["mtime"] = stat.st_mtime_ns
+                    snapshot["size"] = stat.st_size
+                    write_snapshot(config_path + SNAPSHOT_SUFFIX, snapshot)
+                    return snapshot
+        with span("compile_policy"):
+            return compile_snapshot(config_path)
+
+
+def read_snapshot(snapshot_path):
+    try:
+        with open(snapshot_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if not data.startswith(SNAPSHOT_MAGIC):
+        return None
+    try:
+        snapshot = marshal.loads(data[len(SNAPSHOT_MAGIC):])
+    except (EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+def compile_snapshot(config_path):
+    """
+    Parses the YAML policy, compiles its rules and stores both in a snapshot next to the policy.
+    """
+    # Only needed when the snapshot is out of date
+    import yaml
+    from pyguardian_lite.pg_files.rulesfilter import CompiledPolicy
+
+    stat = os.stat(config_path)
+    with open(config_path, 'rb') as f:
+        content = f.read()
+    # The C loader is a lot faster, fall back to the pure-python one when libyaml is missing
+    config = yaml.load(content, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "compiler": compiler_signature(),
+        "mtime": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": hashlib.sha256(content).hexdigest(),
+        "config": config,
+        "compiled": CompiledPolicy.from_config(config).to_data(),
+    }
+    write_snapshot(config_path + SNAPSHOT_SUFFIX, snapshot)
+    return snapshot
+
+
+def write_snapshot(snapshot_path, snapshot):
+    try:
+        data = SNAPSHOT_MAGIC + marshal.dumps(snapshot)
+    except ValueError:
+        # The policy holds values marshal can't store (e.g. unquoted dates), go without snapshot
+        return
+    try:
+        # Write next to the snapshot and rename, so readers never see a partial file
+        temp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, snapshot_path)
+        current_span().add("temp_bytes_written", len(data))
+    except OSError:
+        # The policy directory may be read-only, the policy is then compiled on every run
+        pass
+
+
 def add_policy(custom_yaml_path):
     # Validate that the custom YAML file exists
     if not os.path.exists(custom_yaml_path):
@@ -40,3 +156,10 @@ def add_policy(custom_yaml_path):
         print(f"Successfully added custom policy. The policy has been updated at '{destination_path}'")
     except Exception as e:
         print(f"Error: Could not overwrite the policy file. {e}")
+        return
+
+    try:
+        # Compile the new policy right away, so the next scan can use the snapshot
+        compile_snapshot(destination_path)
+    except Exception as e:
+        print(f"Warning: Could not compile the policy snapshot. {e}")
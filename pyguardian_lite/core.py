@@ -1,59 +1,358 @@
 import os
-import re
-from pyguardian_lite.pg_files.rulesfilter import RulesFilter
-from pyguardian_lite.pg_files.analysis import Analysis
-from pyguardian_lite.pg_files.formatter import OutputFormatter
+import sys
+from pyguardian_lite.pg_files.rulesfilter import CompiledPolicy, RulesFilter
+from pyguardian_lite.pg_files.timings import span
 
 
-def run_analysis(file, config):
-    vscode_output = []
+def run_analysis(file, config, backend="inprocess", scan_mode="combined", display_name=None, cache=None,
+                 categories=None):
+    """
+    Analyses a file on disk in place, the scanners read it directly from its path.
+    `categories` limits the analysis to these policy categories, see policy_tiers.
+    """
+    if not os.path.isfile(file):
+        raise FileNotFoundError(f"No such file: '{file}'")
+    return analyse_code(None, file, display_name or os.path.basename(file), config, backend, scan_mode, cache,
+                        categories)
 
-    with open(file, 'r') as file:
-        code_string = file.read()
 
-    policy = config
+def run_source_analysis(name, source, config, backend="inprocess", scan_mode="combined", cache=None,
+                        categories=None, cancelled=None):
+    """
+    Analyses source code that only exists in memory (e.g. an unsaved editor buffer).
+    The analysis raises Cancelled once `cancelled` returns True, see Analysis.cancelled.
+    """
+    return analyse_code(source, name, name, config, backend, scan_mode, cache, categories, cancelled)
 
-    fetch_rules = RulesFilter(policy)
-    errors_and_rules = fetch_rules.collect_all()
-    # Collect the 'custom' severity list
-    custom_severity_list = fetch_rules.collect_severity()
-    # Collect extra rules that are defined within the yaml blocks
-    extra_rules = fetch_rules.collect_extra_rules()
-    # Collect the format rules
-    format_rules = fetch_rules.collect_format_rules()
 
-    analysis = Analysis(code_string, errors_and_rules, extra_rules)
-    scan_output = analysis.full_analysis()
+def run_tiered_analysis(file, config, backend="inprocess", scan_mode="combined", display_name=None, cache=None):
+    """
+    Generator over (tier, findings) of a file on disk, one analysis per tier of the policy's
+    meta.tiers: the findings of the cheap categories are yielded before the slow ones are checked.
+    """
+    policy = compile_policy(config)
+    for tier, categories in policy_tiers(policy):
+        yield tier, run_analysis(file, policy, backend, scan_mode, display_name, cache, categories)
 
-    formatter = OutputFormatter(scan_output, errors_and_rules, custom_severity_list, format_rules)
-    formatter.reformat_output()
-    collect = formatter.collect_default_output()
 
-    result = collect
-    filename = os.path.basename(file.name)
+def compile_policy(config):
+    # The config is either the loaded YAML policy or an already compiled policy
+    if isinstance(config, CompiledPolicy):
+        return config
+    with span("collect_rules"):
+        return CompiledPolicy.from_config(config)
+
+
+def policy_tiers(config):
+    """
+    Returns [(tier, categories)] in the order the tiers are reported. The categories missing in
+    meta.tiers are in tier 1, code_complexity (C901) is in the tier of style_conventions unless it
+    has its own. Without meta.tiers this is [(1, None)], one analysis of all categories.
+    """
+    tiers = {}
+    for dictionary in compile_policy(config).extra_rules:
+        if 'tiers' in dictionary:
+            tiers = dictionary['tiers']
+    if not tiers:
+        return [(1, None)]
+
+    categories = {}
+    for category in RulesFilter.tierCategories:
+        default = tiers.get("style_conventions", 1) if category == "code_complexity" else 1
+        categories.setdefault(tiers.get(category, default), set()).add(category)
+    if len(categories) == 1:
+        return [(tier, None) for tier in categories]
+    return sorted(categories.items())
+
+
+def analyse_code(code_string, path, filename, config, backend, scan_mode, cache=None, categories=None,
+                 cancelled=None):
+    policy = compile_policy(config)
+
+    errors_and_rules = policy.rules
+    custom_severity_list = policy.severity
+    extra_rules = policy.extra_rules
+
+    if cache is not None:
+        if categories is not None:
+            # A tier's findings are cached apart from the findings of the whole policy
+            extra_rules = [*extra_rules, {"categories": sorted(categories)}]
+        if code_string is None:
+            with open(path, 'rb') as file:
+                key = cache.make_key(file.read(), errors_and_rules, custom_severity_list, extra_rules)
+        else:
+            key = cache.make_key(code_string, errors_and_rules, custom_severity_list, extra_rules)
+        with span("cache_lookup"):
+            cached = cache.get(key)
+        if cached is not None:
+            return [{"file": filename, **entry} for entry in cached]
+
+    # Imported here, so a result cache hit doesn't pay for loading the scanners
+    from pyguardian_lite.pg_files.analysis import Analysis
+
+    analysis = Analysis(code_string, errors_and_rules, policy.extra_rules, backend, scan_mode, path, categories,
+                        cancelled)
+    scan_output = analysis.full_analysis()
+
+    with span("format"):
+        vscode_output = format_findings(scan_output, policy, filename)
+    for error in analysis.scan_errors:
+        # Without findings a failed scan looks like a clean file, stdout is kept for the JSON output
+        print(f"Warning: a scan of {filename} failed: {error.rstrip()}", file=sys.stderr)
+    if analysis.partial_scans:
+        mark_partial(vscode_output, analysis, filename)
+    elif cache is not None and not analysis.scan_errors:
+        # A failed scan isn't stored, its missing findings would be replayed as a clean file.
+        # The file name is left out, so renamed or copied files share the entry
+        with span("cache_store"):
+            cache.put(key, [{k: v for k, v in entry.items() if k != "file"} for entry in vscode_output])
 
-    # Loop through categories
-    for category_data in result:
-        for category, severity_data in category_data.items():
-            for severity, errors in severity_data.items():
-                for error in errors:
-                    match = re.match(r":(\d+):(\d+): (.+)", error)
-                    if match:
-                        line, position, message = match.groups()
-                        vscode_entry = {
-                            "file": filename,
-                            "line": int(line),
-                            "position": int(position),
-                            "severity": severity,
-                            "message": message,
-                            "category": category
-                        }
-                        vscode_output.append(vscode_entry)
     try:
-        fetch_rules.reset()
         analysis.reset()
-        formatter.reset()
     except Exception as e:
         print(f"Error occurred: {e}")
     finally:
         return vscode_output
+
+
+def format_findings(scan_output, policy, filename):
+    """
+    Applies the policy's severities to the scan output and flattens it into the entries the
+    VS Code extension reads, grouped by category and severity.
+    """
+    from pyguardian_lite.pg_files.formatter import OutputFormatter
+
+    vscode_output = []
+    formatter = OutputFormatter(scan_output, policy.rules, policy.severity, policy.format_rules)
+    formatter.reformat_output()
+    result = formatter.collect_default_output()
+
+    # Loop through categories
+    for category_data in result:
+        for category, severity_data in category_data.items():
+            for severity, errors in severity_data.items():
+                for error in errors:
+                    vscode_output.append(error.to_dict(filename))
+    formatter.reset()
+    return vscode_output
+
+
+def mark_partial(vscode_output, analysis, filename):
+    """
+    Marks the entries of the scans stopped at their timeout with "partial": true, and adds a
+    TIMEOUT entry per stopped scan so a category without findings can't be taken for a clean one.
+    """
+    partial_categories = {}
+    for scan, timeout in analysis.partial_scans.items():
+        partial_categories[analysis.scan_categories[scan]] = (scan, timeout)
+        print(f"Warning: the {scan} scan of {filename} timed out after {timeout}s, its findings are partial",
+              file=sys.stderr)
+    for entry in vscode_output:
+        if entry["category"] in partial_categories:
+            entry["partial"] = True
+    for category, (scan, timeout) in partial_categories.items():
+        vscode_output.append({"file": filename, "line": 1, "position": 1, "severity": "warning",
+                              "message": f"TIMEOUT the {scan} scan timed out after {timeout}s, its findings are "
+                                         f"partial", "category": category, "partial": True})
+
+
+def collect_files(targets):
+    """
+    Expands files, directories (recursively) and glob patterns into a list of python files.
+    """
+    import glob
+
+    files = []
+    for target in targets:
+        if os.path.isdir(target):
+            for root, dirs, names in os.walk(target):
+                # Skip hidden directories (.git, .venv, ...) and bytecode caches
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d != '__pycache__')
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith('.py'))
+        elif glob.has_magic(target):
+            files.extend(path for path in sorted(glob.glob(target, recursive=True))
+                         if os.path.isfile(path) and path.endswith('.py'))
+        else:
+            files.append(target)
+    # Drop duplicates from overlapping targets but keep the order
+    return list(dict.fromkeys(files))
+
+
+# Settings of a pool worker, filled in once by init_worker
+_worker_settings = {}
+
+
+def init_worker(config, backend, scan_mode, cache, record_spans=False, profile_rules=False, categories=None):
+    if not isinstance(config, CompiledPolicy):
+        # Compile the policy once per worker instead of once per file
+        config = CompiledPolicy.from_config(config)
+    # The spans and rule profile of a pool worker are sent back with its results, see iter_batch_analysis
+    recorder = None
+    if record_spans:
+        from pyguardian_lite.pg_files.timings import SpanRecorder, add_hook
+        recorder = add_hook(SpanRecorder())
+    profiler = None
+    _worker_settings.update(config=config, backend=backend, scan_mode=scan_mode, cache=cache, recorder=recorder,
+                            categories=categories)
+    if backend != "subprocess":
+        try:
+            from pyguardian_lite.pg_files.engine import get_engine
+            # Load the flake8 plugins once for the lifetime of the worker
+            engine = get_engine()
+        except ImportError:
+            pass
+        else:
+            if profile_rules:
+                from pyguardian_lite.pg_files.profiler import RuleProfiler
+                profiler = RuleProfiler().install(engine)
+    _worker_settings["profiler"] = profiler
+
+
+def analyse_in_worker(job):
+    index, item = job
+    cache = _worker_settings["cache"]
+    if isinstance(item, tuple):
+        # An in-memory file, e.g. a blob read from the git index
+        name, source = item
+        output = run_source_analysis(name, source, _worker_settings["config"], _worker_settings["backend"],
+                                     _worker_settings["scan_mode"], cache, _worker_settings["categories"])
+    else:
+        output = run_analysis(item, _worker_settings["config"], _worker_settings["backend"],
+                              _worker_settings["scan_mode"], item, cache, _worker_settings["categories"])
+    stats = {}
+    if cache is not None:
+        stats["cache"] = cache.take_stats()
+    if _worker_settings["recorder"] is not None:
+        stats["spans"] = _worker_settings["recorder"].take()
+    if _worker_settings["profiler"] is not None:
+        stats["rules"] = _worker_settings["profiler"].take()
+    return index, output, stats
+
+
+def item_size(item):
+    if isinstance(item, tuple):
+        return len(item[1])
+    return os.path.getsize(item) if os.path.isfile(item) else 0
+
+
+def iter_batch_analysis(files, config, jobs=1, backend="inprocess", scan_mode="combined", cache=None,
+                        categories=None):
+    """
+    Generator over (index, findings) of the files, each yielded as soon as the file is analysed:
+    in the order of `files` in a single process, in the order the workers finish with jobs > 1.
+    Items are paths or (name, source) pairs; a single process consumes them one at a time.
+    """
+    if jobs > 1:
+        files = list(files)
+    if jobs <= 1 or len(files) <= 1:
+        init_worker(config, backend, scan_mode, cache, categories=categories)
+        for job in enumerate(files):
+            index, output, stats = analyse_in_worker(job)
+            if "cache" in stats:
+                cache.add_stats(stats["cache"])
+            yield index, output
+        return
+
+    # Largest files first, so no worker is left with one big module at the end
+    sizes = [item_size(item) for item in files]
+    schedule = sorted(enumerate(files), key=lambda job: sizes[job[0]], reverse=True)
+
+    import multiprocessing
+    from pyguardian_lite.pg_files import timings
+    from pyguardian_lite.pg_files.profiler import active_profiler
+    profiler = active_profiler()
+    settings = (config, backend, scan_mode, cache, timings.hooks_active(), profiler is not None, categories)
+    with multiprocessing.Pool(min(jobs, len(files)), init_worker, settings) as pool:
+        for index, output, stats in pool.imap_unordered(analyse_in_worker, schedule, chunksize=1):
+            if "cache" in stats:
+                cache.add_stats(stats["cache"])
+            if "spans" in stats:
+                timings.replay(stats["spans"])
+            if "rules" in stats:
+                profiler.merge(stats["rules"])
+            yield index, output
+
+
+def run_batch_analysis(files, config, jobs=1, backend="inprocess", scan_mode="combined", cache=None,
+                       categories=None):
+    """
+    Analyses multiple files, in a pool of `jobs` worker processes when jobs > 1.
+    Findings are reported with the file path (or name) and in the order of `files`.
+    """
+    results = dict(iter_batch_analysis(files, config, jobs, backend, scan_mode, cache, categories))
+    batch_output = []
+    for index in range(len(results)):
+        batch_output.extend(results[index])
+    return batch_output
+
+
+def complexity_report(items):
+    """
+    Returns the cyclomatic complexity of every function of the files, not only of the ones above the
+    policy's threshold, e.g. for a dashboard: [{"file", "name", "line", "column", "complexity"}].
+    Items are paths or (name, source) pairs; files that don't parse have no entries. Functions whose
+    source didn't change since they were scored in this process aren't walked again.
+    """
+    from pyguardian_lite.pg_files.complexity import complexity_report as function_scores
+    from pyguardian_lite.pg_files.native import ParsedSource
+
+    report = []
+    for item in items:
+        if isinstance(item, tuple):
+            name, source = item
+        else:
+            name, source = item, None
+        with span("complexity_report"):
+            report.extend({"file": name, **entry} for entry in function_scores(ParsedSource(name, source)))
+    return report
+
+
+class Analyzer:
+    """
+    Reusable analysis session for long-running hosts (daemons, editor integrations).
+    The policy is compiled once; every call works on its own state, so a session can be
+    shared between threads and keeps no findings around after a call returns.
+    """
+
+    def __init__(self, policy=None, backend="inprocess", scan_mode="combined", cache=None):
+        if policy is None:
+            from pyguardian_lite.config import load_compiled_policy
+            policy = load_compiled_policy()
+        elif not isinstance(policy, CompiledPolicy):
+            policy = CompiledPolicy.from_config(policy)
+        self.policy = policy
+        self.backend = backend
+        self.scan_mode = scan_mode
+        self.cache = cache
+
+    def analyze(self, path, display_name=None):
+        """
+        Analyses a file on disk, findings report display_name or else the file's basename.
+        """
+        return run_analysis(path, self.policy, self.backend, self.scan_mode, display_name, self.cache)
+
+    def analyze_source(self, name, text):
+        """
+        Analyses in-memory source code, findings report the given name.
+        """
+        return run_source_analysis(name, text, self.policy, self.backend, self.scan_mode, self.cache)
+
+    def incremental(self):
+        """
+        Returns an IncrementalAnalysis for one document (e.g. an open editor buffer), which
+        re-checks only the edited part of the source on subsequent calls.
+        """
+        from pyguardian_lite.pg_files.incremental import IncrementalAnalysis
+        return IncrementalAnalysis(self.policy, self.backend, self.scan_mode)
+
+    def analyze_many(self, items):
+        """
+        Generator over (name, findings) for every item, which is either a path or a (name, text)
+        pair. Files are analysed one at a time, only the current file's findings are kept.
+        """
+        for item in items:
+            if isinstance(item, tuple):
+                name, text = item
+                yield name, self.analyze_source(name, text)
+            else:
+                yield item, self.analyze(item, item)
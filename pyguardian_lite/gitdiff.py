@@ -0,0 +1,148 @@
+import codecs
+import io
+import re
+import subprocess
+import threading
+import tokenize
+
+# "@@ -12,3 +14,5 @@": the new side starts at line 14 and spans 5 lines (1 when the count is left out)
+HUNK_PATTERN = re.compile(rb"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+
+class GitError(Exception):
+    """
+    A git command failed, e.g. outside a repository or for an unknown ref.
+    """
+
+
+def run_git(arguments, cwd=None):
+    try:
+        result = subprocess.run(["git", *arguments], capture_output=True, cwd=cwd)
+    except FileNotFoundError:
+        raise GitError("git is not installed")
+    if result.returncode != 0:
+        raise GitError(result.stderr.decode("utf-8", "replace").strip() or f"git {arguments[0]} failed")
+    return result.stdout
+
+
+def diff_path(raw):
+    # git ends a path with a space in it with a tab, so the header can be told from a timestamp after it
+    if raw.endswith(b"\t"):
+        raw = raw[:-1]
+    # Paths with special characters (a tab among them) are C-quoted, e.g. "b/caf\303\251.py"
+    if raw.startswith(b'"'):
+        raw = codecs.escape_decode(raw[1:-1])[0]
+    return raw[2:].decode("utf-8", "surrogateescape")
+
+
+def changed_lines(base, targets=(), cwd=None):
+    """
+    Returns {path: [(first, last), ...]} with the added or modified line ranges of the tracked
+    Python files that differ between the merge base of `base` and HEAD and the working tree. Paths are
+    relative to the current directory, `targets` limits the diff to these paths.
+    """
+    merge_base = run_git(["merge-base", base, "HEAD"], cwd).decode().strip()
+    return parse_hunks(diff_patch([merge_base], targets, cwd))
+
+
+def staged_lines(targets=(), cwd=None):
+    """
+    Like changed_lines, for the changes staged in the index against HEAD.
+    """
+    return parse_hunks(diff_patch(["--cached"], targets, cwd))
+
+
+def diff_patch(revisions, targets, cwd):
+    # -U0 leaves only the changed lines in the hunks, ACMR skips deleted files
+    return run_git(["-c", "core.quotepath=off", "diff", "-U0", "--relative", "--no-color", "--no-ext-diff",
+                    "--diff-filter=ACMR", "--src-prefix=a/", "--dst-prefix=b/", *revisions, "--", *targets], cwd)
+
+
+def parse_hunks(patch):
+    changes = {}
+    path = None
+    for line in patch.splitlines():
+        if line.startswith(b"+++ "):
+            path = diff_path(line[4:])
+            if path.endswith(".py"):
+                changes[path] = []
+            else:
+                path = None
+        elif line.startswith(b"@@") and path is not None:
+            match = HUNK_PATTERN.match(line)
+            if match is None:
+                continue
+            start = int(match.group(1))
+            count = int(match.group(2)) if match.group(2) is not None else 1
+            if count:
+                # A count of 0 is a deletion, no line of the new file changed
+                changes[path].append((start, start + count - 1))
+    return changes
+
+
+def staged_blobs(targets=(), cwd=None):
+    """
+    Returns [(path, blob id)] of the Python files added, copied or modified in the index.
+    """
+    # Outside a repository git diff would fall back to comparing paths (--no-index)
+    run_git(["rev-parse", "--git-dir"], cwd)
+    output = run_git(["diff", "--cached", "--raw", "-z", "--no-abbrev", "--no-renames", "--relative",
+                      "--diff-filter=ACM", "--", *targets], cwd)
+    # ":100644 100644 <old id> <new id> M" and the path, each terminated by NUL
+    fields = output.split(b"\0")
+    blobs = []
+    for meta, path in zip(fields[0::2], fields[1::2]):
+        _, new_mode, _, blob_id, _ = meta.decode().split(" ")
+        path = path.decode("utf-8", "surrogateescape")
+        # Regular files only, no symlinks (120000) or submodules (160000)
+        if new_mode.startswith("100") and path.endswith(".py"):
+            blobs.append((path, blob_id))
+    return blobs
+
+
+def read_blobs(blobs, cwd=None):
+    """
+    Generator over (path, source) for [(path, blob id)], read through a single `git cat-file --batch`.
+    """
+    try:
+        process = subprocess.Popen(["git", "cat-file", "--batch"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   cwd=cwd)
+    except FileNotFoundError:
+        raise GitError("git is not installed")
+
+    def write_ids():
+        # Written from a thread, git blocks on a full stdout pipe while we'd block on a full stdin
+        try:
+            for _, blob_id in blobs:
+                process.stdin.write(blob_id.encode() + b"\n")
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    writer = threading.Thread(target=write_ids, daemon=True)
+    writer.start()
+    try:
+        for path, blob_id in blobs:
+            header = process.stdout.readline().split()
+            if len(header) != 3:
+                raise GitError(f"Could not read the staged content of {path}")
+            data = process.stdout.read(int(header[2]) + 1)[:-1]
+            yield path, decode_source(data)
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+        writer.join()
+
+
+def decode_source(data):
+    # Honor the PEP 263 encoding declaration, like reading the file from disk would
+    try:
+        encoding, _ = tokenize.detect_encoding(io.BytesIO(data).readline)
+    except SyntaxError:
+        encoding = "utf-8"
+    return data.decode(encoding, "replace")
+
+
+def in_changed_lines(line, ranges):
+    return any(first <= line <= last for first, last in ranges)
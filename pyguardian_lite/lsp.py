@@ -0,0 +1,271 @@
+import json
+import os
+import queue
+import re
+import sys
+import threading
+from urllib.parse import unquote, urlparse
+
+from pyguardian_lite.pg_files.analysis import Cancelled
+from pyguardian_lite.server import Daemon
+
+# LSP DiagnosticSeverity of the policy severities
+LSP_SEVERITY = {"critical": 1, "error": 1, "warning": 2, "info": 3, "hint": 4, "debug": 4}
+# TextDocumentSyncKind.Incremental
+INCREMENTAL_SYNC = 2
+DEFAULT_DEBOUNCE = 0.3
+# LSP only breaks lines at \n, \r\n and \r (str.splitlines also breaks at e.g. form feeds)
+LINE_PATTERN = re.compile(r"[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+")
+CAMEL_CASE = re.compile(r"(?<=[a-z])(?=[A-Z])")
+
+
+def handler_name(method):
+    # "textDocument/didOpen" is handled by on_text_document_did_open
+    return "on_" + CAMEL_CASE.sub("_", method).replace("/", "_").lower()
+
+
+def uri_to_path(uri):
+    return unquote(urlparse(uri).path)
+
+
+def split_lines(text):
+    return LINE_PATTERN.findall(text)
+
+
+def utf16_to_index(line, character):
+    """
+    LSP positions count UTF-16 code units, returns the matching index into the str.
+    """
+    if line.isascii():
+        return character
+    units = 0
+    for index, char in enumerate(line):
+        if units >= character:
+            return index
+        units += 2 if ord(char) > 0xFFFF else 1
+    return len(line)
+
+
+def to_lsp_diagnostic(entry):
+    # flake8 reports 1-based lines and columns, LSP positions are 0-based
+    position = {"line": max(entry["line"] - 1, 0), "character": max(entry["position"] - 1, 0)}
+    code, _, message = entry["message"].partition(" ")
+    return {
+        "range": {"start": position, "end": position},
+        "severity": LSP_SEVERITY.get(entry["severity"], 1),
+        "code": code,
+        "source": "pyguardian-lt",
+        "message": message,
+        # The run_analysis entry as the CLI prints it
+        "data": entry
+    }
+
+
+class Document:
+    """
+    An open text document, kept as a list of lines so incremental edits only touch the edited lines.
+    """
+
+    def __init__(self, uri, text, version):
+        self.uri = uri
+        self.lines = split_lines(text)
+        self.version = version
+        # Counts the edits, clients don't have to send versions
+        self.revision = 0
+        self.timer = None
+        # IncrementalAnalysis of the document, only used by the worker thread
+        self.analysis = None
+
+    @property
+    def text(self):
+        return "".join(self.lines)
+
+    def apply_change(self, change):
+        if "range" not in change:
+            self.lines = split_lines(change["text"])
+            return
+        start, end = change["range"]["start"], change["range"]["end"]
+        start_line = self.line(start["line"])
+        end_line = self.line(end["line"])
+        prefix = start_line[:utf16_to_index(start_line, start["character"])]
+        suffix = end_line[utf16_to_index(end_line, end["character"]):]
+        self.lines[start["line"]:end["line"] + 1] = split_lines(prefix + change["text"] + suffix)
+
+    def line(self, number):
+        # A position may point just past the last line
+        return self.lines[number] if number < len(self.lines) else ""
+
+
+class LanguageServer:
+    """
+    Language server over stdio. Documents are re-analysed `debounce` seconds after the last edit,
+    on one worker thread: a document waits in the queue at most once, and the analysis of a version
+    that is edited again (or closed) is cancelled at its next plugin check instead of run to the end.
+    """
+
+    def __init__(self, daemon, debounce=DEFAULT_DEBOUNCE, stdin=None, stdout=None):
+        self.daemon = daemon
+        self.debounce = debounce
+        self.stdin = stdin or sys.stdin.buffer
+        self.stdout = stdout or sys.stdout.buffer
+        self.documents = {}
+        # Guards the documents and the pending set, shared by the reader, timers and worker
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.pending = set()
+        self.queue = queue.Queue()
+        self.shutdown_requested = False
+
+    def read_message(self):
+        headers = {}
+        while True:
+            line = self.stdin.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.decode("ascii").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = self.stdin.read(int(headers.get("content-length", 0)))
+        return json.loads(body)
+
+    def send(self, message):
+        body = json.dumps(message).encode("utf-8")
+        with self.write_lock:
+            self.stdout.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+            self.stdout.flush()
+
+    def notify(self, method, params):
+        self.send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def run(self):
+        """
+        Serves until the client sends exit, returns the process exit code.
+        """
+        threading.Thread(target=self.work, daemon=True).start()
+        while True:
+            try:
+                message = self.read_message()
+            except ValueError:
+                continue
+            if message is None or message.get("method") == "exit":
+                return 0 if self.shutdown_requested else 1
+            self.dispatch(message)
+
+    def dispatch(self, message):
+        method = message.get("method")
+        handler = getattr(self, handler_name(method), None) if method else None
+        if "id" not in message:
+            # Notifications without a handler (e.g. $/cancelRequest for requests answered already)
+            if handler is not None:
+                handler(message.get("params") or {})
+            return
+        if handler is None:
+            self.send({"jsonrpc": "2.0", "id": message["id"],
+                       "error": {"code": -32601, "message": f"Unknown method '{method}'"}})
+            return
+        try:
+            result = handler(message.get("params") or {})
+        except Exception as e:
+            self.send({"jsonrpc": "2.0", "id": message["id"],
+                       "error": {"code": -32603, "message": f"{type(e).__name__}: {e}"}})
+        else:
+            self.send({"jsonrpc": "2.0", "id": message["id"], "result": result})
+
+    def on_initialize(self, params):
+        return {
+            "capabilities": {
+                "textDocumentSync": {"openClose": True, "change": INCREMENTAL_SYNC, "save": {"includeText": False}}
+            },
+            "serverInfo": {"name": "pyguardian-lt"}
+        }
+
+    def on_initialized(self, params):
+        # Load the policy and the flake8 plugins before the first document is analysed
+        threading.Thread(target=self.daemon.warm_up, daemon=True).start()
+
+    def on_shutdown(self, params):
+        self.shutdown_requested = True
+        return None
+
+    def on_text_document_did_open(self, params):
+        item = params["textDocument"]
+        with self.lock:
+            self.documents[item["uri"]] = Document(item["uri"], item["text"], item.get("version"))
+        self.enqueue(item["uri"])
+
+    def on_text_document_did_change(self, params):
+        uri = params["textDocument"]["uri"]
+        with self.lock:
+            document = self.documents.get(uri)
+            if document is None:
+                return
+            for change in params["contentChanges"]:
+                document.apply_change(change)
+            document.version = params["textDocument"].get("version")
+            document.revision += 1
+            if document.timer is not None:
+                document.timer.cancel()
+            document.timer = threading.Timer(self.debounce, self.enqueue, (uri,))
+            document.timer.daemon = True
+            document.timer.start()
+
+    def on_text_document_did_save(self, params):
+        self.enqueue(params["textDocument"]["uri"])
+
+    def on_text_document_did_close(self, params):
+        uri = params["textDocument"]["uri"]
+        with self.lock:
+            document = self.documents.pop(uri, None)
+            if document is not None and document.timer is not None:
+                document.timer.cancel()
+        self.notify("textDocument/publishDiagnostics", {"uri": uri, "diagnostics": []})
+
+    def enqueue(self, uri):
+        with self.lock:
+            if uri in self.pending:
+                # Still waiting, the worker picks up the latest text when it gets to it
+                return
+            self.pending.add(uri)
+        self.queue.put(uri)
+
+    def work(self):
+        while True:
+            uri = self.queue.get()
+            with self.lock:
+                self.pending.discard(uri)
+                document = self.documents.get(uri)
+                if document is None:
+                    continue
+                version, revision, text = document.version, document.revision, document.text
+
+            def cancelled():
+                # Edited or closed in the meantime, the newer version is analysed next
+                return document.revision != revision or self.documents.get(uri) is not document
+
+            try:
+                analyzer = self.daemon.current_analyzer()
+                if document.analysis is None or document.analysis.policy is not analyzer.policy:
+                    # First analysis, or the policy was reloaded
+                    document.analysis = analyzer.incremental()
+                results = document.analysis.analyze(os.path.basename(uri_to_path(uri)), text, cancelled)
+            except Cancelled:
+                continue
+            except Exception as e:
+                self.notify("window/logMessage", {"type": 1, "message": f"pyguardian-lt: {type(e).__name__}: {e}"})
+                continue
+            with self.lock:
+                if cancelled():
+                    continue
+            params = {"uri": uri, "diagnostics": [to_lsp_diagnostic(entry) for entry in results]}
+            if version is not None:
+                params["version"] = version
+            self.notify("textDocument/publishDiagnostics", params)
+
+
+def serve_stdio(backend="inprocess", scan_mode="combined", cache=None, debounce=DEFAULT_DEBOUNCE):
+    server = LanguageServer(Daemon(backend, scan_mode, cache), debounce)
+    # stdout carries the protocol, anything printed along the way goes to stderr
+    sys.stdout = sys.stderr
+    return server.run()
@@ -1,42 +1,104 @@
 import json
 import subprocess
-import re
-from pyguardian_lite.pg_files import tmpfile
-import os
+from pyguardian_lite.pg_files.diagnostic import Diagnostic
+from pyguardian_lite.pg_files.timings import current_span, span
+
+
+class Cancelled(Exception):
+    """
+    Raised out of an analysis whose `cancelled` callback returned True, e.g. for a document that
+    was edited again while it was analysed.
+    """
 
 
 class Analysis:
-    def __init__(self, src, configuration, extra_rules):
+    def __init__(self, src, configuration, extra_rules, backend="inprocess", scan_mode="combined", path="stdin",
+                 categories=None, cancelled=None):
+        # src is the in-memory source, or None to let flake8 read the file at path itself
         self.sourcecode = src
+        self.path = path
         self.configuration = configuration
         self.extra_rules = extra_rules
+        # "inprocess" runs flake8 through its python api, "subprocess" spawns the flake8 cli,
+        # "native" checks the native_scans and the codes of native_pycodestyle itself and runs flake8
+        # in-process for the rest
+        self.backend = backend
+        # "combined" checks all scans in one flake8 pass, "separate" runs one pass per scan,
+        # "concurrent" runs the passes of the scans at the same time as flake8 subprocesses
+        self.scan_mode = scan_mode
+        # The policy categories to check (see RulesFilter.tierCategories), None checks all of them
+        self.categories = categories
+        # Called between the scans and the in-process plugin checks, the analysis stops with
+        # Cancelled once it returns True
+        self.cancelled = cancelled
+        # Messages of scanners that failed, they don't produce findings
+        self.scan_errors = []
+        # Scans stopped at their timeout -> the timeout, their findings are incomplete
+        self.partial_scans = {}
+        # The source parsed once for all native checks
+        self.parsed = None
+        # The codes of the pycodestyle scan the native backend checks instead of flake8 and their
+        # findings, see native_pycodestyle
+        self.native_codes = None
+        self.native_findings = None
+        if backend == "native":
+            from pyguardian_lite.pg_files.native import ParsedSource
+            self.parsed = ParsedSource(path, src)
+        self.output = []
 
-    output = []
+    # Error code prefixes that belong to a scan other than pycodestyle
+    scan_prefixes = {"N": "pep8naming", "S": "bandit"}
+    # The policy category of every scan
+    scan_categories = {"pep8naming": "naming_conventions", "pycodestyle": "style_conventions", "bandit": "security"}
     line_length = 0
     code_complexity = 10
+    # Seconds per policy category (or "default") a scan may take in the concurrent scan mode
+    scan_timeouts = {}
+    # Scans the native backend checks without flake8
+    native_scans = ("pep8naming",)
 
     def full_analysis(self):
         # Create a list of all the main keys in the configuration
         scans = [key for entry in self.configuration for key in entry.keys()]
+        if self.categories is not None:
+            scans = [scan for scan in scans if self.checks_scan(scan)]
 
         if self.extra_rules:
             self.check_extra_rules(self.extra_rules)
+        if self.scan_mode == "combined":
+            with span("scan:combined"):
+                self.combined_analysis(scans)
+            return self.output
+        if self.scan_mode == "concurrent":
+            with span("scan:concurrent"):
+                self.concurrent_analysis(scans)
+            return self.output
+
         if "pep8naming" in scans:
             # Full analysis of pep8naming
-            result = self.analyse_pep8naming()
+            with span("scan:pep8naming"):
+                result = self.analyse_pep8naming()
             self.output.append(self.process_scan_results('pep8naming', result))
 
         if "pycodestyle" in scans:
+            self.check_cancelled()
             # Direct and filtered analysis of pycodestyle
-            result = self.analyse_pycodestyle()
+            with span("scan:pycodestyle"):
+                result = self.analyse_pycodestyle()
             self.output.append(self.process_scan_results('pycodestyle', result))
 
         if "bandit" in scans:
-            result = self.analyse_bandit()
+            self.check_cancelled()
+            with span("scan:bandit"):
+                result = self.analyse_bandit()
             self.output.append(self.process_scan_results('bandit', result))
 
         return self.output
 
+    def check_cancelled(self):
+        if self.cancelled is not None and self.cancelled():
+            raise Cancelled()
+
     def check_extra_rules(self, extra_rules):
         if extra_rules:
             for dictionary in extra_rules:
@@ -44,6 +106,17 @@ class Analysis:
                     self.line_length = dictionary['line_length']
                 elif 'code_complexity' in dictionary:
                     self.code_complexity = dictionary['code_complexity']
+                elif 'scan_timeouts' in dictionary:
+                    self.scan_timeouts = dictionary['scan_timeouts']
+
+    def checks(self, category):
+        return self.categories is None or category in self.categories
+
+    def checks_scan(self, scan):
+        if scan == "pycodestyle":
+            # The C901 check of code_complexity runs in the pycodestyle pass
+            return self.checks("style_conventions") or self.checks("code_complexity")
+        return self.checks(self.scan_categories[scan])
 
     @staticmethod
     def process_scan_results(scan, result):
@@ -52,166 +125,414 @@ class Analysis:
         """
         structured_output = {
             scan: {
-                "result": result.splitlines()  # Split result into a list of lines.
+                "result": result  # List of Diagnostic findings
             }
         }
         return structured_output
 
-    def analyse_pep8naming(self):
-        temp = tmpfile.generate_tmp_file(self.sourcecode)
-        try:
-            command = ["flake8", "--select", "N", "--isolated", temp]
-            result = subprocess.run(command, capture_output=True, text=True)
-            length = len(temp)
-            output = ""
-            if result.stdout:
-                # Use regex to clean up the file path
-                output_lines = result.stdout.splitlines()
-                for line in output_lines:
-                    # Remove file path based on the length of tmp-path but keep error details
-                    match = re.match(r'^.{%d}(.*)' % length, line)
-                    if match:
-                        output += match.group(1) + "\n"
-
-            if result.stderr:
-                output += "Flake8 Errors:\n" + result.stderr
-
-            return output.strip()
+    def combined_analysis(self, scans):
+        """
+        Run every enabled scan in a single flake8 pass and route the findings back to their scan.
+        """
+        flake8_scans = [scan for scan in scans if self.needs_flake8(scan)]
+        errors = len(self.scan_errors)
+        result = self.run_flake8(self.combined_arguments(flake8_scans)) if flake8_scans else []
+        if len(self.scan_errors) > errors and len(flake8_scans) > 1:
+            # The pass failed (e.g. flake8 rejected an option of one scan), check the scans one at a time
+            # so only the failing one goes without findings
+            del self.scan_errors[errors:]
+            result = [diagnostic for scan in flake8_scans for diagnostic in self.run_flake8(self.scan_arguments(scan))]
+        for scan in scans:
+            if self.is_native(scan):
+                result.extend(self.run_native(scan))
+        if "pycodestyle" in scans and self.native_pycodestyle() is not None:
+            result = self.merge_native(result, self.native_pycodestyle())
+        self.route_results(scans, result)
 
-        except FileNotFoundError:
-            return "Error: Flake8 is not installed. Install it using `pip install flake8`."
-        except Exception as e:
-            return f"An unexpected error occurred: {e}"
-        finally:
-            if 'temp' in locals() and os.path.exists(temp):
-                os.unlink(temp)
+    def combined_arguments(self, scans):
+        select = []
+        ignore = []
+        options = []
+        if "pep8naming" in scans:
+            select.extend(self.pep8naming_selection())
+        if "pycodestyle" in scans:
+            pycodestyle_select, pycodestyle_ignore = self.pycodestyle_pass_selection()
+            select.extend(pycodestyle_select)
+            ignore.extend(pycodestyle_ignore)
+            options.extend(self.pycodestyle_options())
+        if "bandit" in scans:
+            bandit_select, bandit_ignore = self.bandit_selection()
+            select.extend(bandit_select)
+            ignore.extend(bandit_ignore)
+
+        return self.build_arguments(select, ignore, options)
+
+    @staticmethod
+    def merge_native(result, findings):
+        """
+        Adds the findings of the native checks to the ones of a flake8 pass in flake8's order: by
+        position, and at the same position the AST plugins (mccabe first), then the physical line and
+        then the logical line checks.
+        """
+        native = {id(diagnostic) for diagnostic in findings}
+
+        def order(diagnostic):
+            # pycodestyle's line checks report E and W, the AST plugins other codes
+            if diagnostic.code[:1] in "EW":
+                return 2 if id(diagnostic) in native else 3
+            return 0 if diagnostic.code[:1] == "C" else 1
+
+        merged = result + findings
+        merged.sort(key=lambda diagnostic: (diagnostic.line, diagnostic.column, order(diagnostic)))
+        return merged
+
+    def route_results(self, scans, result):
+        routed = {scan: [] for scan in scans}
+        for diagnostic in result:
+            scan = self.scan_prefixes.get(diagnostic.code[:1], "pycodestyle")
+            if scan in routed:
+                routed[scan].append(diagnostic)
 
+        for scan in ("pep8naming", "pycodestyle", "bandit"):
+            if scan in routed:
+                self.output.append(self.process_scan_results(scan, routed[scan]))
+
+    @staticmethod
+    def build_arguments(select, ignore, options=()):
+        arguments = ["--select=" + ",".join(select)]
+        if ignore:
+            arguments.append("--ignore=" + ",".join(ignore))
+        arguments.extend(options)
+        arguments.append("--isolated")
+        return arguments
+
+    def concurrent_analysis(self, scans):
+        """
+        Runs the passes of the enabled scans at the same time, each one limited to the timeout the
+        policy sets for its category. The flake8 passes always run as subprocesses, whatever the
+        backend: a thread of the in-process engine can neither run in parallel nor be stopped. A scan
+        that overruns its timeout is killed, it reports the findings it produced until then and is
+        listed in partial_scans. The native backend's built-in checks run in this process without a
+        timeout.
+        """
+        import asyncio
+
+        selected = [scan for scan in ("pep8naming", "pycodestyle", "bandit") if scan in scans]
+        results = asyncio.run(self.run_scans(selected))
+        for scan, result in zip(selected, results):
+            self.output.append(self.process_scan_results(scan, result))
+
+    def scan_arguments(self, scan):
+        if scan == "pep8naming":
+            return self.build_arguments(self.pep8naming_selection(), [])
+        if scan == "pycodestyle":
+            select, ignore = self.pycodestyle_pass_selection()
+            return self.build_arguments(select, ignore, self.pycodestyle_options())
+        select, ignore = self.bandit_selection()
+        return self.build_arguments(select, ignore)
+
+    def scan_timeout(self, scan):
+        return self.scan_timeouts.get(self.scan_categories[scan], self.scan_timeouts.get("default"))
+
+    async def run_scans(self, scans):
+        import asyncio
+
+        return await asyncio.gather(*(self.run_scan(scan) for scan in scans))
+
+    async def run_scan(self, scan):
+        import asyncio
+
+        if self.is_native(scan):
+            return self.run_native(scan)
+        findings = []
+        if self.needs_flake8(scan):
+            timeout = self.scan_timeout(scan)
+            try:
+                await asyncio.wait_for(self.stream_flake8_subprocess(self.scan_arguments(scan), findings), timeout)
+            except asyncio.TimeoutError:
+                self.partial_scans[scan] = timeout
+        if scan == "pycodestyle" and self.native_pycodestyle() is not None:
+            findings = self.merge_native(findings, self.native_pycodestyle())
+        return findings
+
+    def analyse_scan(self, scan):
+        if self.is_native(scan):
+            return self.run_native(scan)
+        result = self.run_flake8(self.scan_arguments(scan)) if self.needs_flake8(scan) else []
+        if scan == "pycodestyle" and self.native_pycodestyle() is not None:
+            result = self.merge_native(result, self.native_pycodestyle())
+        return result
+
+    def analyse_pep8naming(self):
+        return self.analyse_scan("pep8naming")
 
     def analyse_pycodestyle(self):
-        temp = tmpfile.generate_tmp_file(self.sourcecode)
+        return self.analyse_scan("pycodestyle")
+
+    def analyse_bandit(self):
+        return self.analyse_scan("bandit")
+
+    def is_native(self, scan):
+        return self.backend == "native" and scan in self.native_scans
+
+    def needs_flake8(self, scan):
+        # The native backend may check all the codes selected for pycodestyle itself
+        if self.is_native(scan):
+            return False
+        return scan != "pycodestyle" or self.pycodestyle_pass_selection() is not None
+
+    def run_native(self, scan):
+        """
+        Checks a scan with the built-in checks on the shared parse of the source, returns the
+        findings as a list of Diagnostic like run_flake8.
+        """
+        from pyguardian_lite.pg_files.naming import NamingChecker
+
+        with span("native:" + scan):
+            return self.parsed.report(NamingChecker(self.parsed.tree()).check())
+
+    def native_pycodestyle(self):
+        """
+        The findings of the pycodestyle scan's checks the native backend runs itself: the physical line
+        checks (W291/W292/W293/W391, E501, W191/E101) on the raw bytes and C901 on the shared parse.
+        None when flake8 runs all of them: another backend, none of them selected, or a source the
+        native checks leave to flake8 (see check_physical_lines and check_complexity).
+        """
+        if self.native_codes is None:
+            self.native_codes = []
+            if self.backend == "native":
+                from pyguardian_lite.pg_files.complexity import check_complexity
+                from pyguardian_lite.pg_files.physical import PHYSICAL_CODES, check_physical_lines
+
+                select, ignore = self.pycodestyle_selection()
+
+                def selected(code):
+                    return code.startswith(tuple(select)) and not code.startswith(tuple(ignore))
+
+                codes = [code for code in PHYSICAL_CODES if selected(code)]
+                # flake8 reports a line_length that isn't a number
+                if codes and isinstance(self.line_length, int):
+                    with span("native:physical"):
+                        findings = check_physical_lines(self.parsed, codes, self.line_length or 79)
+                    if findings is not None:
+                        self.native_codes.extend(codes)
+                        self.native_findings = findings
+                if selected("C901") and self.max_complexity() is not None:
+                    with span("native:complexity"):
+                        findings = check_complexity(self.parsed, self.max_complexity())
+                    if findings is not None:
+                        self.native_codes.append("C901")
+                        self.native_findings = (self.native_findings or []) + findings
+        return self.native_findings
+
+    def pycodestyle_pass_selection(self):
+        """
+        The selection of pycodestyle's flake8 pass, without the codes native_pycodestyle checks. None
+        when that leaves nothing to select.
+        """
+        select, ignore = self.pycodestyle_selection()
+        if self.native_pycodestyle() is None:
+            return select, ignore
+        from pyguardian_lite.pg_files.rulebook import code_category_index
+
+        def native_only(entry):
+            # A whitelisted code, or a prefix like C90 of native codes only
+            if entry in self.native_codes or entry in code_category_index:
+                return entry in self.native_codes
+            codes = [code for code in code_category_index if code.startswith(entry)]
+            return bool(codes) and all(code in self.native_codes for code in codes)
+
+        selected = [entry for entry in select if not native_only(entry)]
+        if not selected:
+            return None
+        # Blacklist mode selects the native codes by prefix
+        return selected, ignore + [code for code in self.native_codes if code not in select]
+
+    @staticmethod
+    def pep8naming_selection():
+        # The pep8naming blacklist is applied afterwards by the OutputFormatter
+        return ["N"]
+
+    def pycodestyle_selection(self):
         # Extract the pycodestyle key's contents
         pycodestyle_data = None
         collected_errors = []
-        command_error_codes = ""
-        flake8select = "--select=E,W,F,C"
-        command = ""
         for item in self.configuration:
             if 'pycodestyle' in item:
                 pycodestyle_data = item['pycodestyle']
                 break
 
         if 'blacklist' in pycodestyle_data:
-            flake8ignore = "--ignore="
             # Loop through the blacklist dictionary
             for key, error_codes in pycodestyle_data['blacklist'].items():
                 collected_errors.extend(error_codes)  # Add all error codes to the collected list
+            if not self.checks("style_conventions"):
+                return ["C90"], collected_errors
+            if not self.checks("code_complexity"):
+                collected_errors.append("C90")
+            return ["E", "W", "F", "C"], collected_errors
 
-            # Create the command_error_codes string by joining with commas
-            command_error_codes = ",".join(collected_errors)
-            command = ["flake8", flake8select, flake8ignore+command_error_codes, "--isolated", temp]
-        else:
-            # Loop through the blacklist dictionary
-            for key, error_codes in pycodestyle_data['error_codes'].items():
+        # Loop through the error_codes dictionary
+        for key, error_codes in pycodestyle_data['error_codes'].items():
+            if self.checks("code_complexity" if key == "code_complexity" else "style_conventions"):
                 collected_errors.extend(error_codes)  # Add all error codes to the collected list
-            command_error_codes = ",".join(collected_errors)
-            # Create the command_error_codes string by joining with commas
-            command = ["flake8", "--select="+command_error_codes, "--isolated", temp]
-        if self.line_length:
-            # Insert the line length before the temp file argument (-1)
-            command.insert(-1, f"--max-line-length={self.line_length}")
-
-        # Check if self.code_complexity is a valid integer
-        if isinstance(self.code_complexity, int):
-            # If self.code_complexity is negative, use --min-complexity
-            if self.code_complexity < 0:
-                command.insert(-1, f"--min-complexity={abs(self.code_complexity)}")
-            # If self.code_complexity is positive, use --max-complexity
-            elif self.code_complexity > 0:
-                command.insert(-1, f"--max-complexity={self.code_complexity}")
-
-        try:
-            result = subprocess.run(command, capture_output=True, text=True)
-            length = len(temp)
-
-            output = ""
-            if result.stdout:
-                # Use regex to clean up the file path
-                output_lines = result.stdout.splitlines()
-                for line in output_lines:
-                    # Remove file path based on the length of tmp-path but keep error details
-                    match = re.match(r'^.{%d}(.*)' % length, line)
-                    if match:
-                        output += match.group(1) + "\n"
+        return collected_errors, []
 
-            if result.stderr:
-                output += "Flake8 Errors:\n" + result.stderr
+    def pycodestyle_options(self):
+        options = []
+        if self.line_length:
+            options.append(f"--max-line-length={self.line_length}")
 
-            return output.strip()
+        # The native backend may check C901 itself
+        native = self.native_pycodestyle() is not None and "C901" in self.native_codes
+        if self.max_complexity() is not None and self.checks("code_complexity") and not native:
+            options.append(f"--max-complexity={self.max_complexity()}")
+        return options
 
-        except FileNotFoundError:
-            return "Error: Flake8 is not installed. Install it using `pip install flake8`."
-        except Exception as e:
-            return f"An unexpected error occurred: {e}"
-        finally:
-            if 'temp' in locals() and os.path.exists(temp):
-                os.unlink(temp)
+    def max_complexity(self):
+        """
+        mccabe's --max-complexity for code_complexity, None when C901 isn't checked. mccabe reports the
+        functions more complex than the maximum; a negative code_complexity is a minimum instead, it
+        reports the functions at least that complex (flake8 has no --min-complexity).
+        """
+        # Check if self.code_complexity is a valid integer
+        if not isinstance(self.code_complexity, int) or self.code_complexity == 0:
+            return None
+        if self.code_complexity < 0:
+            return abs(self.code_complexity) - 1
+        return self.code_complexity
 
-    def analyse_bandit(self):
-        temp = tmpfile.generate_tmp_file(self.sourcecode)
-        # Extract the pycodestyle key's contents
+    def bandit_selection(self):
+        # Extract the bandit key's contents
         bandit_data = None
         collected_errors = []
-        command_error_codes = ""
-        flake8select = "--select=S"
-        command = ""
         for item in self.configuration:
             if 'bandit' in item:
                 bandit_data = item['bandit']
                 break
 
         if 'blacklist' in bandit_data:
-            flake8ignore = "--ignore="
-            # Loop through the blacklist dictionary
+            # Loop through the blacklist list
             for error_codes in bandit_data['blacklist']:
                 collected_errors.append(error_codes)  # Add all error codes to the collected list
+            return ["S"], collected_errors
 
-            # Create the command_error_codes string by joining with commas
-            command_error_codes = ",".join(collected_errors)
-            command = ["flake8", flake8select, flake8ignore+command_error_codes, "--isolated", temp]
-        else:
-            #Loop through the blacklist dictionary
-            for error_codes in bandit_data['error_codes']:
-                collected_errors.append(error_codes)  # Add all error codes to the collected list
-            command_error_codes = ",".join(collected_errors)
-            #Create the command_error_codes string by joining with commas
-            command = ["flake8", "--select="+command_error_codes, "--isolated", temp]
+        # Loop through the error_codes list
+        for error_codes in bandit_data['error_codes']:
+            collected_errors.append(error_codes)  # Add all error codes to the collected list
+        return collected_errors, []
+
+    def run_flake8(self, arguments):
+        """
+        Run flake8 with the given arguments on the file or in-memory source through the selected backend.
+        Returns the findings as a list of Diagnostic.
+        """
+        self.check_cancelled()
+        if self.backend != "subprocess":
+            try:
+                from pyguardian_lite.pg_files.engine import get_engine
+            except ImportError:
+                # flake8 cannot be imported here, the subprocess backend reports why
+                return self.run_flake8_subprocess(arguments)
+            return self.run_flake8_inprocess(get_engine(), arguments)
+        return self.run_flake8_subprocess(arguments)
+
+    def run_flake8_inprocess(self, engine, arguments, checks="all"):
+        # checks limits an in-memory check to the "tree" or the "lines" plugins, see Flake8Engine
+        try:
+            if self.sourcecode is None:
+                violations = engine.check_file(self.path, arguments)
+            else:
+                violations = engine.check_source(self.path, self.sourcecode, arguments, checks, self.cancelled)
+            return [Diagnostic(violation.line_number, violation.column_number, violation.code, violation.text)
+                    for violation in violations]
+
+        except Cancelled:
+            raise
+        except Exception as e:
+            self.scan_errors.append("Flake8 Errors:\n" + str(e))
+            return []
+
+    def flake8_command(self, arguments):
+        # Let flake8 print the findings without the path, in the format the formatter expects
+        command = ["flake8", *arguments, "--format=:%(row)d:%(col)d: %(code)s %(text)s"]
+        if self.sourcecode is None:
+            return [*command, self.path]
+        return [*command, f"--stdin-display-name={self.path}", "-"]
+
+    def run_flake8_subprocess(self, arguments):
+        command = self.flake8_command(arguments)
         try:
-            result = subprocess.run(command, capture_output=True, text=True)
-            length = len(temp)
-            output = ""
-            if result.stdout:
-                # Use regex to clean up the file path
-                output_lines = result.stdout.splitlines()
-                for line in output_lines:
-                    # Remove file path based on the length of tmp-path but keep error details
-                    match = re.match(r'^.{%d}(.*)' % length, line)
-                    if match:
-                        output += match.group(1) + "\n"
-
-            if result.stderr:
-                output += "Flake8 Errors:\n" + result.stderr
-
-            return output.strip()
+            current = current_span()
+            if self.sourcecode is None:
+                result = subprocess.run(command, capture_output=True, text=True)
+            else:
+                result = subprocess.run(command, input=self.sourcecode, capture_output=True, text=True)
+                current.add("pipe_bytes_sent", len(self.sourcecode.encode("utf-8")))
+            current.add("subprocesses")
+            current.add("pipe_bytes_received", len(result.stdout.encode("utf-8")) + len(result.stderr.encode("utf-8")))
+            # flake8 exits with 1 for findings; plugins also warn on stderr (e.g. bandit for a module
+            # outside of a package) without failing
+            if result.returncode not in (0, 1):
+                self.scan_errors.append("Flake8 Errors:\n" + result.stderr)
+
+            output = []
+            for line in result.stdout.splitlines():
+                diagnostic = Diagnostic.from_line(line)
+                if diagnostic is not None:
+                    output.append(diagnostic)
+            return output
 
         except FileNotFoundError:
-            return "Error: Flake8 is not installed. Install it using `pip install flake8`."
+            self.scan_errors.append("Error: Flake8 is not installed. Install it using `pip install flake8`.")
         except Exception as e:
-            return f"An unexpected error occurred: {e}"
+            self.scan_errors.append(f"An unexpected error occurred: {e}")
+        return []
+
+    async def stream_flake8_subprocess(self, arguments, findings):
+        """
+        Runs flake8 as an asyncio subprocess and appends its findings to `findings` while they are
+        printed. When the caller is cancelled (its timeout) the process is killed.
+        """
+        import asyncio
+
+        source = None if self.sourcecode is None else self.sourcecode.encode("utf-8")
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self.flake8_command(arguments), stdin=subprocess.PIPE if source is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            self.scan_errors.append("Error: Flake8 is not installed. Install it using `pip install flake8`.")
+            return
+        current = current_span()
+        current.add("subprocesses")
+        errors = asyncio.ensure_future(process.stderr.read())
+        try:
+            if source is not None:
+                process.stdin.write(source)
+                current.add("pipe_bytes_sent", len(source))
+                await process.stdin.drain()
+                process.stdin.close()
+            async for line in process.stdout:
+                current.add("pipe_bytes_received", len(line))
+                diagnostic = Diagnostic.from_line(line.decode("utf-8", "replace").rstrip("\r\n"))
+                if diagnostic is not None:
+                    findings.append(diagnostic)
+            stderr = await errors
+            current.add("pipe_bytes_received", len(stderr))
+            if await process.wait() not in (0, 1):
+                self.scan_errors.append("Flake8 Errors:\n" + stderr.decode("utf-8", "replace"))
         finally:
-            if 'temp' in locals() and os.path.exists(temp):
-                os.unlink(temp)
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            errors.cancel()
 
     def reset(self):
+        # Drop the references only, the configuration is shared with the caller
         self.sourcecode = ""
-        self.configuration.clear()
-        self.extra_rules.clear()
+        self.configuration = []
+        self.extra_rules = []
+        self.parsed = None
+        self.native_findings = None
+        self.output = []
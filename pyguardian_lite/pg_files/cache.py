@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+
+from pyguardian_lite.pg_files.timings import current_span
+
+# Bump when the layout of the cached diagnostics changes
+CACHE_VERSION = "1"
+# Distributions whose versions change the findings of a scan
+SCANNER_PACKAGES = ("flake8", "pep8-naming", "flake8-bandit", "bandit", "pycodestyle", "pyflakes", "mccabe")
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pyguardian-lt")
+
+
+def normalize_name(name):
+    return name.lower().replace("-", "_").replace(".", "_")
+
+
+def installed_versions():
+    """
+    Reads distribution versions from the *.dist-info / *.egg-info names on sys.path. This is much
+    cheaper than importing importlib.metadata on a cache hit, the first entry on sys.path wins.
+    """
+    versions = {}
+    for entry in sys.path:
+        try:
+            names = os.listdir(entry or ".")
+        except OSError:
+            continue
+        for name in names:
+            if name.endswith(".dist-info") or name.endswith(".egg-info"):
+                parts = name.rsplit(".", 1)[0].split("-")
+                if len(parts) >= 2:
+                    versions.setdefault(normalize_name(parts[0]), parts[1])
+    return versions
+
+
+def plugin_versions():
+    installed = installed_versions()
+    versions = []
+    for package in SCANNER_PACKAGES:
+        version = installed.get(normalize_name(package))
+        if version is None:
+            # Not laid out as a plain directory entry (e.g. a zipped install), ask importlib
+            from importlib import metadata
+            try:
+                version = metadata.version(package)
+            except metadata.PackageNotFoundError:
+                version = "missing"
+        versions.append(f"{package}=={version}")
+    return ",".join(versions)
+
+
+class ResultCache:
+    """
+    Content-addressed cache of final diagnostics. Entries are keyed by the source, the compiled
+    policy and the scanner versions, and the least recently used entries are evicted once the
+    cache directory grows beyond max_size bytes.
+    """
+
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory or default_cache_dir()
+        self.max_size = max_size
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self.versions = plugin_versions()
+        # Size of the cache directory, measured on the first write
+        self.size = None
+        # Guards the counters and the size when a session is shared between threads
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Sent to pool workers, which create their own lock
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def count(self, counter, value=1):
+        with self.lock:
+            self.stats[counter] += value
+
+    def make_key(self, source, errors_and_rules, custom_severity, extra_rules):
+        if isinstance(source, str):
+            source = source.encode("utf-8")
+        policy = json.dumps([errors_and_rules, custom_severity, extra_rules], sort_keys=True, default=str)
+        digest = hashlib.sha256()
+        for part in (CACHE_VERSION.encode(), self.versions.encode(),
+                     hashlib.sha256(policy.encode("utf-8")).digest(), hashlib.sha256(source).digest()):
+            digest.update(part)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """
+        Returns the cached diagnostics for key, or None on a miss.
+        """
+        path = self.entry_path(key)
+        try:
+            with open(path, "r") as f:
+                diagnostics = json.load(f)
+        except (OSError, ValueError):
+            self.count("misses")
+            return None
+        try:
+            # Mark the entry as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        self.count("hits")
+        return diagnostics
+
+    def put(self, key, diagnostics):
+        path = self.entry_path(key)
+        data = json.dumps(diagnostics).encode("utf-8")
+        # Only needed on a miss, a cache hit doesn't import it
+        import tempfile
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write next to the entry and rename, so readers never see a partial file
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            current_span().add("temp_bytes_written", len(data))
+        except OSError:
+            return
+        with self.lock:
+            if self.size is None:
+                self.size = self.measure()
+            else:
+                self.size += len(data)
+            if self.size > self.max_size:
+                self.evict()
+
+    def entries(self):
+        entries = []
+        for root, dirs, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".json"):
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+        return entries
+
+    def measure(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        # Evict down to 90% of the limit, so not every following write has to evict again
+        target = self.max_size * 0.9
+        entries = sorted(self.entries())
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.size <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            self.size -= size
+            self.stats["evictions"] += 1
+
+    def take_stats(self):
+        """
+        Returns the counters collected so far and starts counting from zero again.
+        """
+        with self.lock:
+            stats = self.stats
+            self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        return stats
+
+    def add_stats(self, stats):
+        for counter, value in stats.items():
+            self.count(counter, value)
@@ -0,0 +1,237 @@
+import ast
+import hashlib
+import threading
+
+from pyguardian_lite.pg_files.diagnostic import Diagnostic
+
+# Scores kept by the ScoreCache of the process
+MAX_SCORES = 100000
+
+
+class ScoreCache:
+    """
+    The complexity of already scored functions, keyed by the hash of their source. A function is
+    only walked again when its source changed, e.g. the edited one of a file the editor re-checks.
+    The least recently used scores are dropped beyond max_size.
+    """
+
+    def __init__(self, max_size=MAX_SCORES):
+        self.max_size = max_size
+        self.scores = {}
+        self.stats = {"hits": 0, "misses": 0}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(lines, node):
+        # The lines of the statement, from its first line (after the decorators) to its last
+        text = "".join(lines[node.lineno - 1:node.end_lineno])
+        return hashlib.sha256(f"{type(node).__name__}\0{text}".encode("utf-8", "surrogatepass")).digest()
+
+    def get(self, key):
+        with self.lock:
+            score = self.scores.pop(key, None)
+            if score is None:
+                self.stats["misses"] += 1
+                return None
+            # Mark the score as recently used
+            self.scores[key] = score
+            self.stats["hits"] += 1
+            return score
+
+    def put(self, key, score):
+        with self.lock:
+            self.scores[key] = score
+            while len(self.scores) > self.max_size:
+                del self.scores[next(iter(self.scores))]
+
+
+_scores = ScoreCache()
+
+
+def score_cache():
+    return _scores
+
+
+class ComplexityChecker:
+    """
+    Computes the McCabe complexity like the mccabe plugin does: every function, and every branch
+    or loop outside of a function, gets a path graph whose complexity is edges - nodes + 2. Nested
+    functions and classes belong to the graph of the function around them. The scores of the graphs
+    are cached by the hash of their source, see ScoreCache.
+    """
+
+    def __init__(self, tree, lines, cache=None):
+        self.tree = tree
+        self.lines = lines
+        self.cache = _scores if cache is None else cache
+        self.classname = ""
+        # key -> (name, line, column, complexity); a later graph with the same key replaces the
+        # earlier one, like in mccabe
+        self.graphs = {}
+        # The graph being built: node -> the nodes it connects to, None outside of a graph
+        self.graph = None
+        self.tail = None
+        self.nodes = 0
+        self.dispatch = {
+            ast.FunctionDef: self.visit_function,
+            ast.AsyncFunctionDef: self.visit_function,
+            ast.ClassDef: self.visit_class,
+            ast.For: self.visit_loop,
+            ast.AsyncFor: self.visit_loop,
+            ast.While: self.visit_loop,
+            ast.If: self.visit_if,
+            ast.Try: self.visit_try,
+            ast.With: self.visit_with,
+            ast.AsyncWith: self.visit_with,
+        }
+
+    def scores(self):
+        """
+        Returns [(name, line, column, complexity)] of every graph, in mccabe's order.
+        """
+        if self.tree is not None and not self.graphs:
+            self.visit(self.tree)
+        return list(self.graphs.values())
+
+    def check(self, max_complexity):
+        """
+        Returns the C901 findings of the graphs more complex than max_complexity, as Diagnostic.
+        """
+        return [Diagnostic(line, column + 1, "C901", f"{name!r} is too complex ({complexity})")
+                for name, line, column, complexity in self.scores() if complexity > max_complexity]
+
+    def visit(self, node):
+        visitor = self.dispatch.get(type(node))
+        if visitor is not None:
+            visitor(node)
+        elif isinstance(node, ast.stmt):
+            # Any other statement is a single node, its children aren't walked
+            self.append_node()
+        else:
+            for child in ast.iter_child_nodes(node):
+                self.visit(child)
+
+    def visit_body(self, body):
+        for node in body:
+            self.visit(node)
+
+    def new_node(self):
+        self.nodes += 1
+        return self.nodes
+
+    def connect(self, first, second):
+        self.graph.setdefault(first, []).append(second)
+        # The destination always counts, mccabe also drops the edges it had so far
+        self.graph[second] = []
+
+    def append_node(self):
+        if not self.tail:
+            return None
+        node = self.new_node()
+        self.connect(self.tail, node)
+        self.tail = node
+        return node
+
+    def score(self, key, node, name, entity, build):
+        """
+        Adds the graph of `node`, a function or a branch outside of a function, scoring it with
+        build(start node) unless its source was scored before.
+        """
+        cache_key = self.cache.make_key(self.lines, node)
+        complexity = self.cache.get(cache_key)
+        if complexity is None:
+            self.graph = {}
+            build(self.new_node())
+            complexity = sum(len(targets) for targets in self.graph.values()) - len(self.graph) + 2
+            self.cache.put(cache_key, complexity)
+        self.graphs[key] = (entity, node.lineno, node.col_offset, complexity)
+        self.graph = None
+        self.tail = None
+
+    def visit_function(self, node):
+        entity = self.classname + node.name
+        if self.graph is not None:
+            # A closure
+            start = self.append_node()
+            self.tail = start
+            self.visit_body(node.body)
+            bottom = self.new_node()
+            self.connect(self.tail, bottom)
+            self.connect(start, bottom)
+            self.tail = bottom
+            return
+
+        def build(start):
+            self.tail = start
+            self.visit_body(node.body)
+
+        self.score(entity, node, entity, entity, build)
+
+    def visit_class(self, node):
+        classname = self.classname
+        self.classname += node.name + "."
+        self.visit_body(node.body)
+        self.classname = classname
+
+    def visit_loop(self, node):
+        self.subgraph(node, f"Loop {node.lineno}")
+
+    def visit_if(self, node):
+        self.subgraph(node, f"If {node.lineno}")
+
+    def visit_try(self, node):
+        self.subgraph(node, f"TryExcept {node.lineno}", node.handlers)
+
+    def visit_with(self, node):
+        self.append_node()
+        self.visit_body(node.body)
+
+    def subgraph(self, node, name, extra_blocks=()):
+        if self.graph is None:
+            # A branch or loop outside of a function
+            self.score(self.classname + name, node, name, name,
+                       lambda start: self.subgraph_parse(node, start, extra_blocks))
+        else:
+            self.subgraph_parse(node, self.append_node(), extra_blocks)
+
+    def subgraph_parse(self, node, start, extra_blocks):
+        # The body and every other block (handlers, else) start at `start` and end at one bottom node
+        loose_ends = []
+        self.tail = start
+        self.visit_body(node.body)
+        loose_ends.append(self.tail)
+        for extra in extra_blocks:
+            self.tail = start
+            self.visit_body(extra.body)
+            loose_ends.append(self.tail)
+        if node.orelse:
+            self.tail = start
+            self.visit_body(node.orelse)
+            loose_ends.append(self.tail)
+        else:
+            loose_ends.append(start)
+        if start:
+            bottom = self.new_node()
+            for end in loose_ends:
+                self.connect(end, bottom)
+            self.tail = bottom
+
+
+def check_complexity(parsed, max_complexity):
+    """
+    Returns the C901 findings of a ParsedSource for functions more complex than max_complexity, or
+    None when the source doesn't parse (flake8 only reports the E999 then).
+    """
+    tree = parsed.tree()
+    if tree is None:
+        return None
+    return parsed.report(ComplexityChecker(tree, parsed.lines()).check(max_complexity))
+
+
+def complexity_report(parsed):
+    """
+    Returns the complexity of every function of a ParsedSource, and of every branch or loop outside
+    of a function, as [{"name", "line", "column", "complexity"}]; empty when the source doesn't parse.
+    """
+    return [{"name": name, "line": line, "column": column + 1, "complexity": complexity}
+            for name, line, column, complexity in ComplexityChecker(parsed.tree(), parsed.lines()).scores()]
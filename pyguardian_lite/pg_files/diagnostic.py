@@ -0,0 +1,49 @@
+import re
+
+# ":12:5: E501 line too long (82 > 79 characters)" as printed by flake8 without the path
+LINE_PATTERN = re.compile(r":(\d+):(\d+): (\S+) ?(.*)")
+
+
+class Diagnostic:
+    """
+    A single finding, carried from the scanner up to the serializer.
+    The category and severity are filled in by the OutputFormatter.
+    """
+
+    __slots__ = ("line", "column", "code", "message", "category", "severity")
+
+    def __init__(self, line, column, code, message, category=None, severity=None):
+        self.line = line
+        self.column = column
+        self.code = code
+        self.message = message
+        self.category = category
+        self.severity = severity
+
+    @classmethod
+    def from_line(cls, line):
+        """
+        Parses a line of flake8 output, returns None when the line holds no finding.
+        """
+        match = LINE_PATTERN.match(line)
+        if match is None:
+            return None
+        row, column, code, message = match.groups()
+        return cls(int(row), int(column), code, message)
+
+    def __repr__(self):
+        return f"Diagnostic(:{self.line}:{self.column}: {self.code} {self.message})"
+
+    def __str__(self):
+        return f":{self.line}:{self.column}: {self.code} {self.message}"
+
+    def to_dict(self, filename):
+        # The entry layout the VS Code extension reads
+        return {
+            "file": filename,
+            "line": self.line,
+            "position": self.column,
+            "severity": self.severity,
+            "message": f"{self.code} {self.message}",
+            "category": self.category
+        }
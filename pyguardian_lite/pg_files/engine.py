@@ -0,0 +1,270 @@
+import configparser
+import logging
+import operator
+import threading
+import time
+import types
+
+import flake8
+from flake8 import checker
+from flake8 import processor
+from flake8 import style_guide
+from flake8.formatting.base import BaseFormatter
+from flake8.main import options
+from flake8.options import aggregator
+from flake8.options import manager
+from flake8.plugins import finder
+
+from pyguardian_lite.pg_files.analysis import Cancelled
+from pyguardian_lite.pg_files.physical import PHYSICAL_CODES
+from pyguardian_lite.pg_files.timings import hooks_active, record, span
+
+
+class ViolationCollector(BaseFormatter):
+    """
+    Flake8 formatter that keeps the reported violations in memory instead of writing them out.
+    """
+
+    def after_init(self):
+        self.violations = []
+
+    def handle(self, error):
+        self.violations.append(error)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class TimedChecker(checker.FileChecker):
+    """
+    FileChecker reporting the time of every plugin as a "check:<plugin>" span while timing hooks are
+    registered, e.g. check:pyflakes[F] or check:pycodestyle[E]. The line plugins run once per line,
+    their times are added up and reported as one span per plugin once the file is checked.
+    """
+
+    def run_checks(self):
+        # plugin -> [calls, wall, cpu] of the line plugins, None while nothing is timed
+        self.line_times = {} if hooks_active() else None
+        try:
+            return super().run_checks()
+        finally:
+            for name, (calls, wall, cpu) in (self.line_times or {}).items():
+                record("check:" + name, wall, cpu, calls=calls)
+            self.line_times = None
+
+    def run_check(self, plugin, **arguments):
+        if getattr(self, "line_times", None) is None or "tree" in arguments:
+            return super().run_check(plugin, **arguments)
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = super().run_check(plugin, **arguments)
+        if isinstance(result, types.GeneratorType):
+            # The checks do their work while the results are consumed
+            result = list(result)
+        times = self.line_times.setdefault(plugin.display_name, [0, 0.0, 0.0])
+        times[0] += 1
+        times[1] += time.perf_counter() - wall
+        times[2] += time.process_time() - cpu
+        return result
+
+    def run_ast_checks(self):
+        if self.line_times is None:
+            return super().run_ast_checks()
+        tree = self.processor.build_ast()
+        for plugin in self.plugins.tree:
+            with span("check:" + plugin.display_name):
+                plugin_checker = self.run_check(plugin, tree=tree)
+                # Like flake8: a plugin class is run, a plugin function returns the findings
+                run = getattr(plugin_checker, "run", None)
+                results = list(plugin_checker if run is None else run())
+            for line_number, offset, text, _ in results:
+                self.report(error_code=None, line_number=line_number, column=offset, text=text)
+
+
+class SourceChecker(TimedChecker):
+    """
+    FileChecker that reads the source lines from memory instead of from disk.
+    Without tree plugins the source isn't parsed, without line plugins it isn't tokenized.
+    An empty source isn't parsed either: it has no AST findings, and bandit would read the file
+    at `filename` (or stdin) for it instead. `cancelled` is called before every plugin check, the
+    check stops with Cancelled once it returns True.
+    """
+
+    def __init__(self, *, filename, lines, plugins, options, cancelled=None):
+        self.source_lines = lines
+        self.cancelled = cancelled
+        super().__init__(filename=filename, plugins=plugins, options=options)
+
+    def run_check(self, plugin, **arguments):
+        if self.cancelled is not None and self.cancelled():
+            raise Cancelled()
+        return super().run_check(plugin, **arguments)
+
+    def _make_processor(self):
+        return processor.FileProcessor(self.filename, self.options, lines=self.source_lines)
+
+    def run_ast_checks(self):
+        if self.plugins.tree and self.processor.lines:
+            super().run_ast_checks()
+
+    def process_tokens(self):
+        if self.plugins.logical_line or self.plugins.physical_line:
+            super().process_tokens()
+
+
+class ArgumentsError(Exception):
+    """
+    Raised for scan arguments flake8 doesn't accept, where its cli prints the usage and exits.
+    """
+
+
+class Flake8Engine:
+    """
+    Runs flake8 inside the current process. Plugin discovery and option registration
+    happen once, every check afterwards only parses the scan arguments.
+    """
+
+    def __init__(self):
+        # Always behave like --isolated: no user or project flake8 configuration
+        self.config = configparser.RawConfigParser()
+        plugin_options = finder.parse_plugin_options(
+            self.config, "", enable_extensions=None, require_plugins=None
+        )
+        self.plugins = finder.load_plugins(finder.find_plugins(self.config, plugin_options), plugin_options)
+
+        self.option_manager = manager.OptionManager(
+            version=flake8.__version__,
+            plugin_versions=self.plugins.versions_str(),
+            parents=[options.stage1_arg_parser()],
+            formatter_names=list(self.plugins.reporters),
+        )
+        options.register_default_options(self.option_manager)
+        # argparse would print the usage and raise SystemExit, which the callers don't expect from a check
+        self.option_manager.parser.error = self.reject_arguments
+        self.option_manager.register_plugins(self.plugins)
+        # The plugins as loaded, their options are parsed on the plugin classes themselves
+        self.loaded_plugins = list(self.plugins.all_plugins())
+        self.checkers = None
+        self.set_checkers(self.plugins.checkers)
+
+        # bandit warns on stderr for every in-memory source it can't map to a module name
+        logging.getLogger("bandit").addHandler(logging.NullHandler())
+
+        # Plugins such as pep8-naming and mccabe store their options on the class
+        self.lock = threading.Lock()
+        # The options of the last check, reused as long as the scan arguments don't change
+        self.last_arguments = None
+        self.last_parsed = None
+
+    @staticmethod
+    def reject_arguments(message):
+        raise ArgumentsError(f"flake8: error: {message}")
+
+    def set_checkers(self, checkers):
+        """
+        Sets the plugins the checks run, e.g. wrapped ones while the rules are profiled.
+        """
+        self.plugins = self.plugins._replace(checkers=checkers)
+        # Plugins working on the AST (pyflakes, mccabe, pep8-naming, bandit) and the ones working on
+        # logical and physical lines (pycodestyle), for checks that only need one of them
+        self.checkers = {
+            "all": checkers,
+            "tree": checkers._replace(logical_line=[], physical_line=[]),
+            "lines": checkers._replace(tree=[]),
+        }
+        # (checks, selected and ignored codes) -> the checkers of selected_checkers
+        self.selected = {}
+
+    def parse_arguments(self, arguments):
+        if arguments == self.last_arguments:
+            return self.last_parsed
+        parsed = aggregator.aggregate_options(self.option_manager, self.config, "", arguments)
+        for loaded in self.loaded_plugins:
+            parse_options = getattr(loaded.obj, "parse_options", None)
+            if parse_options is None:
+                continue
+            try:
+                parse_options(self.option_manager, parsed, parsed.filenames)
+            except TypeError:
+                parse_options(parsed)
+        self.last_arguments = list(arguments)
+        self.last_parsed = parsed
+        return parsed
+
+    def selected_checkers(self, parsed, checks="all"):
+        """
+        The plugins of `checks`, without the AST plugins none of the selected codes belong to (e.g. bandit
+        in a pass that only reports naming issues) and without pycodestyle's physical line checks when
+        none of their codes is selected, their findings would be discarded anyway.
+        """
+        codes = tuple(parsed.select or ()) + tuple(parsed.extend_select or ())
+        if not codes:
+            return self.checkers[checks]
+        key = (checks, codes, tuple(parsed.ignore or ()), tuple(parsed.extend_ignore or ()))
+        selected = self.selected.get(key)
+        if selected is None:
+            checkers = self.checkers[checks]
+            tree = [loaded for loaded in checkers.tree
+                    if any(code.startswith(loaded.entry_name) or loaded.entry_name.startswith(code) for code in codes)]
+            if not tree:
+                # Without AST plugins the source isn't parsed and syntax errors (E999) would go unreported
+                tree = checkers.tree
+            physical_line = checkers.physical_line
+            decider = style_guide.DecisionEngine(parsed)
+            if not any(decider.decision_for(code) is style_guide.Decision.Selected for code in PHYSICAL_CODES):
+                physical_line = [loaded for loaded in physical_line if loaded.plugin.package != "pycodestyle"]
+            selected = self.selected[key] = checkers._replace(tree=tree, physical_line=physical_line)
+        return selected
+
+    def check_file(self, filename, arguments):
+        """
+        Check a single file on disk with the given flake8 arguments (e.g. ["--select", "N"]).
+        Returns the reported flake8 Violation tuples ordered by line and column.
+        """
+        with self.lock:
+            parsed = self.parse_arguments(arguments)
+            file_checker = TimedChecker(filename=filename, plugins=self.selected_checkers(parsed), options=parsed)
+            _, results, _ = file_checker.run_checks()
+        return self.report(filename, parsed, results)
+
+    def check_source(self, filename, source, arguments, checks="all", cancelled=None):
+        """
+        Check source code that only lives in memory, `filename` is used for reporting only.
+        `checks` selects the plugins that run: "all", "tree" or "lines". See SourceChecker for `cancelled`.
+        """
+        lines = source.splitlines(keepends=True)
+        with self.lock:
+            parsed = self.parse_arguments(arguments)
+            file_checker = SourceChecker(filename=filename, lines=lines, plugins=self.selected_checkers(parsed, checks),
+                                         options=parsed, cancelled=cancelled)
+            _, results, _ = file_checker.run_checks()
+        return self.report(filename, parsed, results)
+
+    @staticmethod
+    def report(filename, parsed, results):
+        # Apply the select/ignore decisions and noqa comments, like flake8 does when reporting
+        collector = ViolationCollector(parsed)
+        guide = style_guide.StyleGuideManager(parsed, collector)
+        results.sort(key=operator.itemgetter(1, 2))
+        with guide.processing_file(filename):
+            for error_code, line_number, column, text, physical_line in results:
+                guide.handle_error(error_code, filename, line_number, column, text, physical_line)
+        return collector.violations
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Returns the process wide engine, loading the flake8 plugins on first use.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = Flake8Engine()
+    return _engine
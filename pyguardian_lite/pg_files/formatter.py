@@ -1,4 +1,3 @@
-import re
 import pyguardian_lite.pg_files.rulebook as rulebook
 
 
@@ -38,27 +37,23 @@ class OutputFormatter:
     def default_reformat(self, collection, parentkey):
         output = collection
         default_output = {}
+        # Index the custom severities once, the last entry for a code wins
+        custom_severity = {}
+        for dictionary in self.custom_severity:
+            custom_severity.update(dictionary)
 
         for error in output:
-            regex_error = error
-            # Find all error codes in the error message using regex
-            match = re.search(r"(:\d+:\d+:) ([A-Za-z]\d{3}) ", regex_error)
-            severity = ""
-            if match:
-                error_code = match.group(2)  # Extract the error code (like: S101)
-                if self.custom_severity:
-                    for dictionary in self.custom_severity:
-                        for key, value in dictionary.items():
-                            if key == error_code:
-                                severity = value
-                # If severity is not yet defined, then we collect the default severity
-                elif not severity:
-                    # Check if severity is a warning error
-                    if error_code in rulebook.error_warning_collection:
-                        severity = "warning"
+            error_code = error.code  # The error code (like: S101)
+            if self.custom_severity:
+                severity = custom_severity.get(error_code, "")
+            # If severity is not yet defined, then we collect the default severity
+            else:
+                severity = rulebook.default_severity_index.get(error_code, "")
             if not severity:
                 severity = "error"
 
+            error.severity = severity
+            error.category = parentkey
             default_output.setdefault(severity, []).append(error)
 
         # Wrap that up under the parent key
@@ -72,22 +67,14 @@ class OutputFormatter:
     def reformat_pep8naming(partial_analysis, configuration):
         output = []
         if 'blacklist' in configuration:
-            blacklist = configuration['blacklist']
-
-            # Define regex pattern to extract the error code
-            pattern = r':\d+:\d+: (\w{4})'  # Matches ':line:position: error_code'
+            blacklist = set(configuration['blacklist'])
 
             # Loop through the result list and check each error code
             for error in partial_analysis['result']:
-                # Use regex to find the error code
-                match = re.search(pattern, error)
-                if match:
-                    # Extract the error code from the match object
-                    error_code = match.group(1)
-                    # Check if error code is not in blacklist
-                    if error_code not in blacklist:
-                        # Add error message to output list if not blacklisted
-                        output.append(error)
+                # Check if error code is not in blacklist
+                if error.code not in blacklist:
+                    # Add error message to output list if not blacklisted
+                    output.append(error)
         else:
             output = partial_analysis['result']
         # Return the filtered output
@@ -95,23 +82,12 @@ class OutputFormatter:
 
     @staticmethod
     def reformat_toggle_line(error):
-        reformat_lines = ""
-        match = re.match(r":(\d+):(\d+): (.+)", error)
-        if match:
-            line, position, message = match.groups()
-            reformat_lines = f"Line {line} at position {position}: {message}"
-        else:
-            reformat_lines = error
-        return reformat_lines
+        return f"Line {error.line} at position {error.column}: {error.code} {error.message}"
 
     @staticmethod
     def reformat_error_code(error):
-        reformat_errors = error
-        cleaned_error = re.sub(r"(:\d+:\d+:) [A-Za-z]\d{3} ", r"\1 ", error)
-        if cleaned_error:
-            reformat_errors = cleaned_error
-
-        return reformat_errors
+        # The finding without its error code
+        return f":{error.line}:{error.column}: {error.message}"
 
     @staticmethod
     def group_errors_by_severity(errors):
@@ -137,31 +113,17 @@ class OutputFormatter:
 
     @staticmethod
     def order_error_messages(error_messages):
-        lp_index = []
-
-        for index, error in enumerate(error_messages):
-            match = re.match(r":(\d+):(\d+): (.+)", error)
-            if match:
-                line, position, message = match.groups()
-                lp_index.append({"line": line, "position": position, "index": index})
-            else:
-                return error_messages
-
-        # Sort lp_index based on line number first, then position
-        sorted_lp_index = sorted(lp_index, key=lambda x: (int(x['line']), int(x['position'])))
-
-        # Reorder error_messages based on sorted_lp_index
-        ordered_errors = [error_messages[item['index']] for item in sorted_lp_index]
-
-        return ordered_errors
+        # Sort based on line number first, then position
+        return sorted(error_messages, key=lambda error: (error.line, error.column))
 
     def collect_default_output(self):
         if self.default_format:
             return self.default_format
 
     def reset(self):
-        self.analysis.clear()
-        self.configuration.clear()
-        self.custom_severity.clear()
-        self.reformat_rules.clear()
-        self.default_format.clear()
+        # Drop the references only, the configuration is shared with the caller
+        self.analysis = []
+        self.configuration = []
+        self.custom_severity = []
+        self.reformat_rules = []
+        self.default_format = []
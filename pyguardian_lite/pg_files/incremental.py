@@ -0,0 +1,259 @@
+import ast
+import re
+
+from pyguardian_lite.core import format_findings, run_source_analysis
+from pyguardian_lite.pg_files.analysis import Analysis
+from pyguardian_lite.pg_files.diagnostic import Diagnostic
+
+# Comments that change what is reported for other lines or by the AST plugins
+DIRECTIVE_PATTERN = re.compile(r"noqa|nosec", re.IGNORECASE)
+# Messages that may name a line, e.g. pyflakes' "redefinition of unused 'x' from line 3" or
+# mccabe's "'If 228' is too complex (17)"
+LINE_REFERENCE = re.compile(r"\d")
+# pycodestyle's E1 checks depend on the first indentation of the whole file
+TAB_INDENT = re.compile(r"^ *\t", re.MULTILINE)
+# Top-level lines pycodestyle's E402 check allows before the imports
+DUNDER_PATTERN = re.compile(r"^__([^\s]+)__(?::\s*[a-zA-Z>]+)? = ")
+IMPORT_ALLOWED_KEYWORDS = ("try", "except", "else", "finally", "with", "if", "elif")
+
+
+class Block:
+    """
+    One or more top-level statements sharing lines, together with the blank lines and comments
+    before them.
+    """
+
+    __slots__ = ("start", "head", "end", "heads", "text", "nodes", "dump")
+
+    def __init__(self, start, head, end, heads, text, nodes):
+        self.start = start
+        self.head = head
+        self.end = end
+        self.heads = heads
+        self.text = text
+        self.nodes = nodes
+        self.dump = None
+
+    def same_ast(self, other):
+        """
+        Compares the ASTs with their positions relative to the first line of the block.
+        """
+        if self.text == other.text:
+            return True
+        return self.signature() == other.signature()
+
+    def signature(self):
+        # Dumped on demand, only blocks whose text changed are compared by their AST
+        if self.dump is None:
+            self.dump = []
+            for node in self.nodes:
+                ast.increment_lineno(node, 1 - self.head)
+                self.dump.append(ast.dump(node, include_attributes=True))
+        return self.dump
+
+
+def parse_blocks(source, lines):
+    """
+    Splits the source into top-level blocks, returns None when it doesn't parse.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+
+    groups = []
+    for node in tree.body:
+        head = min([node.lineno] + [decorator.lineno for decorator in getattr(node, "decorator_list", [])])
+        if groups and head <= groups[-1][1]:
+            # Shares a line with the previous statement, e.g. "import os; import sys"
+            groups[-1][1] = max(groups[-1][1], node.end_lineno)
+            groups[-1][2].append(node)
+        else:
+            groups.append([head, node.end_lineno, [node]])
+
+    blocks = []
+    previous_end = 0
+    for head, end, nodes in groups:
+        heads = [lines[line - 1] for line in sorted({node.lineno for node in nodes})]
+        blocks.append(Block(previous_end + 1, head, end, heads, "".join(lines[head - 1:end]), nodes))
+        previous_end = end
+    if previous_end < len(lines):
+        # Comments and blank lines after the last statement
+        blocks.append(Block(previous_end + 1, None, len(lines), [], None, None))
+    return blocks
+
+
+def import_state(blocks, state=(False, False)):
+    """
+    Follows pycodestyle's E402 check over the heads of the blocks, returns (seen_docstring, seen_non_imports).
+    """
+    seen_docstring, seen_non_imports = state
+    for block in blocks:
+        for line in block.heads:
+            if line.startswith(("import ", "from ") + IMPORT_ALLOWED_KEYWORDS) or DUNDER_PATTERN.match(line):
+                continue
+            literal = line[1:] if line[:1] in "uUbB" else line
+            literal = literal[1:] if literal[:1] in "rR" else literal
+            if literal.startswith(("'", '"')) and not seen_docstring:
+                seen_docstring = True
+            else:
+                seen_non_imports = True
+    return seen_docstring, seen_non_imports
+
+
+def shifted(diagnostic, offset):
+    return Diagnostic(diagnostic.line + offset, diagnostic.column, diagnostic.code, diagnostic.message)
+
+
+class IncrementalAnalysis:
+    """
+    Analysis of one document that is edited over time. The previous source and findings are kept:
+    pycodestyle's line checks run again only for the edited top-level blocks (plus one block of
+    context before and one after), and the AST plugins (pyflakes, mccabe, pep8-naming, bandit)
+    only when the AST of a top-level block changed. Findings of untouched lines are shifted.
+    Needs the inprocess backend in combined mode, otherwise every call is a full analysis.
+    """
+
+    def __init__(self, policy, backend="inprocess", scan_mode="combined"):
+        self.policy = policy
+        self.backend = backend
+        self.scan_mode = scan_mode
+        # (first, last) line checked again by the last call, None after a full check
+        self.last_window = None
+        self.forget()
+
+    def forget(self):
+        self.lines = None
+        self.blocks = None
+        self.tree_results = None
+        self.line_results = None
+
+    def analyze(self, name, source, cancelled=None):
+        """
+        Analyses the current source of the document, findings report the given name. Raises
+        Cancelled once `cancelled` returns True (e.g. the document was edited again), the next
+        call then still re-checks against the source of the last completed call.
+        """
+        if self.backend != "inprocess" or self.scan_mode != "combined":
+            return run_source_analysis(name, source, self.policy, self.backend, self.scan_mode, cancelled=cancelled)
+        try:
+            from flake8.defaults import NOQA_FILE
+            from pyguardian_lite.pg_files.engine import get_engine
+        except ImportError:
+            # The full analysis falls back to the flake8 cli
+            return run_source_analysis(name, source, self.policy, self.backend, self.scan_mode, cancelled=cancelled)
+
+        lines = source.splitlines(keepends=True)
+        blocks = parse_blocks(source, lines)
+        if not blocks or TAB_INDENT.search(source) or NOQA_FILE.search(source):
+            # Reported as a whole (e.g. E999), empty, or not safe to check in parts
+            self.forget()
+            self.last_window = None
+            return run_source_analysis(name, source, self.policy, self.backend, self.scan_mode, cancelled=cancelled)
+
+        engine = get_engine()
+        analysis = Analysis(source, self.policy.rules, self.policy.extra_rules, self.backend, self.scan_mode, name,
+                            cancelled=cancelled)
+        analysis.check_extra_rules(self.policy.extra_rules)
+        scans = [key for entry in self.policy.rules for key in entry.keys()]
+        arguments = analysis.combined_arguments(scans)
+
+        if self.lines is None or not self.update(engine, analysis, arguments, lines, blocks):
+            # Both are replaced together, a cancelled call leaves the previous state
+            tree_results = analysis.run_flake8_inprocess(engine, arguments, "tree")
+            self.line_results = analysis.run_flake8_inprocess(engine, arguments, "lines")
+            self.tree_results = tree_results
+            self.last_window = None
+        self.lines = lines
+        self.blocks = blocks
+        if analysis.scan_errors:
+            self.forget()
+
+        # Same order as a single flake8 pass: by position, AST plugin findings first
+        results = sorted(self.tree_results + self.line_results, key=lambda error: (error.line, error.column))
+        analysis.route_results(scans, results)
+        return format_findings(analysis.output, self.policy, name)
+
+    def update(self, engine, analysis, arguments, lines, blocks):
+        """
+        Updates the findings for the edit from the previous source to `lines`. Returns False when
+        the edit can't be checked in parts.
+        """
+        old_lines = self.lines
+        prefix = 0
+        limit = min(len(old_lines), len(lines))
+        while prefix < limit and old_lines[prefix] == lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old_lines[-1 - suffix] == lines[-1 - suffix]:
+            suffix += 1
+        delta = len(lines) - len(old_lines)
+        if prefix == len(lines) and delta == 0:
+            self.last_window = (1, 0)
+            return True
+
+        changed = old_lines[prefix:len(old_lines) - suffix] + lines[prefix:len(lines) - suffix]
+        if any(DIRECTIVE_PATTERN.search(line) for line in changed):
+            return False
+
+        tree_results = self.shift_tree_results(blocks)
+        if tree_results is None:
+            tree_results = analysis.run_flake8_inprocess(engine, arguments, "tree")
+
+        # The edited blocks, from the line before the edit to its last line
+        first_line = max(prefix, 1)
+        last_line = min(max(len(lines) - suffix, prefix + 1), len(lines))
+        first = next(index for index, block in enumerate(blocks) if block.end >= first_line)
+        last = max(index for index, block in enumerate(blocks) if block.start <= last_line)
+        # pycodestyle's state at a block depends on the block before it, and the block after the
+        # edit reports the blank lines in front of it (E30x)
+        keep_start = blocks[first].start
+        keep_end = blocks[last + 1].end if last + 1 < len(blocks) else len(lines)
+        window_start = blocks[first - 1].head if first > 0 else 1
+
+        old_blocks = [block for block in self.blocks if block.head is not None and block.head <= keep_end - delta]
+        if import_state(old_blocks) != import_state([block for block in blocks if block.head is not None and
+                                                     block.head <= keep_end]):
+            # The edit changes which imports below it are reported as E402
+            return False
+        state = import_state(blocks[:max(first - 1, 0)])
+        preamble = "pass\n" if state[1] else '""\n' if state[0] else ""
+
+        window = Analysis(preamble + "".join(lines[window_start - 1:keep_end]), analysis.configuration,
+                          analysis.extra_rules, analysis.backend, analysis.scan_mode, analysis.path,
+                          cancelled=analysis.cancelled)
+        offset = window_start - 1 - preamble.count("\n")
+        window_results = []
+        for diagnostic in window.run_flake8_inprocess(engine, arguments, "lines"):
+            if keep_start <= diagnostic.line + offset <= keep_end:
+                window_results.append(shifted(diagnostic, offset))
+        analysis.scan_errors.extend(window.scan_errors)
+
+        self.tree_results = tree_results
+        self.line_results = ([error for error in self.line_results if error.line < keep_start] + window_results +
+                             [shifted(error, delta) for error in self.line_results if error.line > keep_end - delta])
+        self.last_window = (keep_start, keep_end)
+        return True
+
+    def shift_tree_results(self, blocks):
+        """
+        Moves the AST plugin findings along with their blocks, returns None when the AST changed.
+        """
+        old_blocks = [block for block in self.blocks if block.head is not None]
+        new_blocks = [block for block in blocks if block.head is not None]
+        if len(old_blocks) != len(new_blocks):
+            return None
+        if not all(old.same_ast(new) for old, new in zip(old_blocks, new_blocks)):
+            return None
+        results = []
+        for error in self.tree_results:
+            for old, new in zip(old_blocks, new_blocks):
+                if old.head <= error.line <= old.end:
+                    break
+            else:
+                return None
+            offset = new.head - old.head
+            if offset and LINE_REFERENCE.search(error.message):
+                return None
+            results.append(shifted(error, offset))
+        return results
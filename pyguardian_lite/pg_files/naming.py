@@ -0,0 +1,337 @@
+import ast
+
+from pyguardian_lite.pg_files.diagnostic import Diagnostic
+
+# The messages of the pep8-naming plugin, N808 is reported by it although the rulebook doesn't list it
+MESSAGES = {
+    "N801": "class name '{name}' should use CapWords convention",
+    "N802": "function name '{name}' should be lowercase",
+    "N803": "argument name '{name}' should be lowercase",
+    "N804": "first argument of a classmethod should be named 'cls'",
+    "N805": "first argument of a method should be named 'self'",
+    "N806": "variable '{name}' in function should be lowercase",
+    "N807": "function name '{name}' should not start and end with '__'",
+    "N808": "type variable name '{name}' should use CapWords convention and an optional '_co' or '_contra' suffix",
+    "N811": "constant '{name}' imported as non constant '{asname}'",
+    "N812": "lowercase '{name}' imported as non lowercase '{asname}'",
+    "N813": "camelcase '{name}' imported as lowercase '{asname}'",
+    "N814": "camelcase '{name}' imported as constant '{asname}'",
+    "N815": "variable '{name}' in class scope should not be mixedCase",
+    "N816": "variable '{name}' in global scope should not be mixedCase",
+    "N817": "camelcase '{name}' imported as acronym '{asname}'",
+    "N818": "exception name '{name}' should be named with an Error suffix",
+}
+
+# pep8-naming's defaults, the scans run flake8 --isolated so they are never changed
+IGNORED_NAMES = frozenset((
+    "setUp", "tearDown", "setUpClass", "tearDownClass", "setUpModule", "tearDownModule", "asyncSetUp",
+    "asyncTearDown", "setUpTestData", "failureException", "longMessage", "maxDiff",
+))
+DECORATOR_TYPES = {"classmethod": "classmethod", "staticmethod": "staticmethod"}
+CLASS_METHODS = frozenset(("__new__", "__init_subclass__", "__class_getitem__"))
+METACLASS_BASES = frozenset(("type", "ABCMeta"))
+# Statements whose body may hold the methods of a class
+METHOD_CONTAINERS = (ast.If, ast.While, ast.For, ast.With, ast.Try, ast.AsyncWith, ast.AsyncFor)
+FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef)
+COMPREHENSIONS = (ast.GeneratorExp, ast.ListComp, ast.DictComp, ast.SetComp)
+
+
+class NamingChecker:
+    """
+    Checks the naming conventions of pep8-naming (N801-N818) on an already parsed module, with
+    the same codes, messages and positions as the flake8 plugin.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.findings = []
+        # function node -> "function", "method", "classmethod" or "staticmethod"
+        self.function_types = {}
+        # function node -> the names it declares global
+        self.global_names = {}
+
+    def check(self):
+        """
+        Returns the findings as a list of Diagnostic, in the order the tree was walked.
+        """
+        if self.tree is not None:
+            self.visit(self.tree, [])
+        return self.findings
+
+    def report(self, node, code, **names):
+        column = node.col_offset
+        # pep8-naming points at the name of a class or function definition
+        if isinstance(node, ast.ClassDef):
+            column += 6
+        elif isinstance(node, FUNCTIONS):
+            column += 4
+        # flake8 reports the column 1-based on top of the plugin's own offset
+        self.findings.append(Diagnostic(node.lineno, column + 2, code, MESSAGES[code].format(**names)))
+
+    def visit(self, node, parents):
+        if isinstance(node, ast.ClassDef):
+            self.tag_class_functions(node)
+            self.check_class(node, parents)
+        elif isinstance(node, FUNCTIONS):
+            self.global_names[node] = find_global_names(node)
+            self.check_function_name(node)
+            self.check_arguments(node)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            self.check_import(node)
+        elif isinstance(node, ast.Assign):
+            if not is_namedtuple(node.value):
+                for target in node.targets:
+                    self.check_variables(target, parents)
+        elif isinstance(node, (ast.NamedExpr, ast.AnnAssign)):
+            if not is_namedtuple(node.value):
+                self.check_variables(node.target, parents)
+        elif isinstance(node, (ast.With, ast.AsyncWith)):
+            for item in node.items:
+                self.check_variables(item.optional_vars, parents)
+        elif isinstance(node, (ast.For, ast.AsyncFor)):
+            self.check_variables(node.target, parents)
+        elif isinstance(node, ast.ExceptHandler):
+            if node.name:
+                self.check_variables(node, parents)
+        elif isinstance(node, COMPREHENSIONS):
+            for generator in node.generators:
+                self.check_variables(generator.target, parents)
+        elif isinstance(node, ast.Module):
+            self.check_type_variables(node)
+
+        parents.append(node)
+        for child in ast.iter_child_nodes(node):
+            self.visit(child, parents)
+        parents.pop()
+
+    def tag_class_functions(self, class_node):
+        # Functions decorated afterwards, e.g. "method = staticmethod(method)"
+        late_decoration = {}
+        for node in ast.iter_child_nodes(class_node):
+            if not (isinstance(node, ast.Assign) and isinstance(node.value, ast.Call)
+                    and isinstance(node.value.func, ast.Name)):
+                continue
+            if node.value.func.id not in DECORATOR_TYPES:
+                continue
+            method = len(node.value.args) == 1 and node.value.args[0]
+            if isinstance(method, ast.Name):
+                late_decoration[method.id] = DECORATOR_TYPES[node.value.func.id]
+
+        # All methods of a metaclass are classmethods
+        bases = [base.id for base in class_node.bases if isinstance(base, ast.Name)]
+        bases.extend(base.attr for base in class_node.bases if isinstance(base, ast.Attribute))
+        metaclass = any(name in METACLASS_BASES for name in bases)
+        self.tag_functions(ast.iter_child_nodes(class_node), metaclass, late_decoration)
+
+    def tag_functions(self, nodes, metaclass, late_decoration):
+        for node in nodes:
+            if type(node) in METHOD_CONTAINERS:
+                self.tag_functions(ast.iter_child_nodes(node), metaclass, late_decoration)
+            if not isinstance(node, FUNCTIONS):
+                continue
+            self.function_types[node] = "method"
+            if node.name in CLASS_METHODS or metaclass:
+                self.function_types[node] = "classmethod"
+            if node.name in late_decoration:
+                self.function_types[node] = late_decoration[node.name]
+            else:
+                for decorator in node.decorator_list:
+                    function_type = DECORATOR_TYPES.get(decorator_name(decorator))
+                    if function_type:
+                        self.function_types[node] = function_type
+                        break
+
+    def check_class(self, node, parents):
+        name = node.name
+        if name in IGNORED_NAMES:
+            return
+        name = name.strip("_")
+        if not name[:1].isupper() or "_" in name:
+            self.report(node, "N801", name=name)
+        if "Exception" in superclass_names(name, parents) and not name.endswith("Error"):
+            self.report(node, "N818", name=name)
+
+    def check_function_name(self, node):
+        function_type = self.function_types.get(node, "function")
+        name = node.name
+        if name in IGNORED_NAMES or name in ("__dir__", "__getattr__"):
+            return
+        if function_type != "function" and has_override_decorator(node):
+            return
+        if name.lower() != name:
+            self.report(node, "N802", name=name)
+        if function_type == "function" and name[:2] == "__" and name[-2:] == "__":
+            self.report(node, "N807", name=name)
+
+    def check_arguments(self, node):
+        arguments = node.args.posonlyargs + node.args.args + node.args.kwonlyargs
+        if arguments and arguments[0].arg not in IGNORED_NAMES:
+            function_type = self.function_types.get(node)
+            name = arguments[0].arg
+            if function_type == "method" and name != "self":
+                self.report(arguments[0], "N805")
+            elif function_type == "classmethod" and name != "cls":
+                self.report(arguments[0], "N804")
+
+        # *args and **kwargs aren't first arguments, but their names are checked too
+        if node.args.vararg:
+            arguments.append(node.args.vararg)
+        if node.args.kwarg:
+            arguments.append(node.args.kwarg)
+        for argument in arguments:
+            name = argument.arg
+            if name.lower() != name and name not in IGNORED_NAMES:
+                self.report(argument, "N803", name=name)
+
+    def check_import(self, node):
+        for alias in node.names:
+            asname = alias.asname
+            if not asname:
+                continue
+            name = alias.name
+            if name.isupper():
+                if not asname.isupper():
+                    self.report(node, "N811", name=name, asname=asname)
+            elif name.islower():
+                if asname.lower() != asname:
+                    self.report(node, "N812", name=name, asname=asname)
+            elif asname.islower():
+                self.report(node, "N813", name=name, asname=asname)
+            elif asname.isupper():
+                if "".join(filter(str.isupper, name)) == asname:
+                    self.report(node, "N817", name=name, asname=asname)
+                else:
+                    self.report(node, "N814", name=name, asname=asname)
+
+    def check_variables(self, target, parents):
+        # The innermost class or function decides the convention
+        scope = None
+        for parent in reversed(parents):
+            if isinstance(parent, (ast.ClassDef,) + FUNCTIONS):
+                scope = parent
+                break
+        for name in target_names(target):
+            if name in IGNORED_NAMES:
+                continue
+            if scope is None:
+                code = "N816" if is_mixed_case(name) else None
+            elif isinstance(scope, ast.ClassDef):
+                code = "N815" if is_mixed_case(name) else None
+            elif name in self.global_names[scope] or name.lower() == name:
+                code = None
+            else:
+                code = "N806"
+            if code:
+                self.report(target, code, name=name)
+
+    def check_type_variables(self, module):
+        for statement in module.body:
+            try:
+                if len(statement.targets) != 1:
+                    continue
+                name = statement.targets[0].id
+                function_name = statement.value.func.id
+                arguments = [argument.value for argument in statement.value.args]
+                keywords = {keyword.arg: keyword.value.value for keyword in statement.value.keywords}
+            except AttributeError:
+                # Not a "T = TypeVar(...)" assignment
+                continue
+            if function_name != "TypeVar" or name in IGNORED_NAMES:
+                continue
+
+            if not arguments or arguments[0] != name:
+                self.report(statement, "N808", name=name)
+            stripped = name.removeprefix("_")
+            if not stripped[:1].isupper():
+                self.report(statement, "N808", name=name)
+            parts = stripped.split("_")
+            if len(parts) > 2:
+                self.report(statement, "N808", name=name)
+            suffix = parts[-1] if len(parts) > 1 else ""
+            if suffix and suffix != "co" and suffix != "contra":
+                self.report(statement, "N808", name=name)
+            elif keywords.get("covariant") and suffix != "co":
+                self.report(statement, "N808", name=name)
+            elif keywords.get("contravariant") and suffix != "contra":
+                self.report(statement, "N808", name=name)
+
+
+def decorator_name(decorator):
+    if isinstance(decorator, ast.Name):
+        return decorator.id
+    if isinstance(decorator, ast.Attribute):
+        return decorator.attr
+    if isinstance(decorator, ast.Call):
+        return decorator_name(decorator.func)
+    return None
+
+
+def has_override_decorator(node):
+    for decorator in node.decorator_list:
+        if isinstance(decorator, ast.Name) and decorator.id == "override":
+            return True
+        if (isinstance(decorator, ast.Attribute) and isinstance(decorator.value, ast.Name)
+                and decorator.value.id == "typing" and decorator.attr == "override"):
+            return True
+    return False
+
+
+def find_global_names(function):
+    names = set()
+    nodes = list(ast.iter_child_nodes(function))
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, ast.Global):
+            names.update(node.names)
+        # Nested classes and functions have their own scope
+        if not isinstance(node, (ast.ClassDef,) + FUNCTIONS):
+            nodes.extend(ast.iter_child_nodes(node))
+    return names
+
+
+def superclass_names(name, parents, names=None):
+    # The names of the bases of the class `name`, and of their bases, defined next to it or around it
+    names = names or set()
+    class_node = None
+    for parent in parents:
+        for node in getattr(parent, "body", ()):
+            if isinstance(node, ast.ClassDef) and node.name == name:
+                class_node = node
+                break
+        if class_node is not None:
+            break
+    if class_node is None:
+        return names
+    for base in class_node.bases:
+        if isinstance(base, ast.Name) and base.id not in names:
+            names.add(base.id)
+            names.update(superclass_names(base.id, parents, names))
+    return names
+
+
+def is_namedtuple(value):
+    if isinstance(value, ast.Call):
+        if isinstance(value.func, ast.Attribute):
+            return value.func.attr == "namedtuple"
+        if isinstance(value.func, ast.Name):
+            return value.func.id == "namedtuple"
+    return False
+
+
+def target_names(target):
+    if isinstance(target, ast.ExceptHandler):
+        yield target.name
+    elif type(target) is ast.Name:
+        yield target.id
+    elif type(target) in (ast.Tuple, ast.List):
+        for element in target.elts:
+            if type(element) is ast.Name:
+                yield element.id
+            elif type(element) in (ast.Tuple, ast.List):
+                yield from target_names(element)
+            elif type(element) is ast.Starred:
+                yield from target_names(element.value)
+
+
+def is_mixed_case(name):
+    return name.lower() != name and name.lstrip("_")[:1].islower()
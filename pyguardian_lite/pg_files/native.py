@@ -0,0 +1,113 @@
+import ast
+import io
+import re
+import tokenize
+
+# flake8's inline "# noqa" / "# noqa: N802,N803" comment and its file wide "# flake8: noqa"
+NOQA_INLINE = re.compile(r"# noqa(?::[\s]?(?P<codes>([A-Z]+[0-9]+(?:[,\s]+)?)+))?", re.I)
+NOQA_FILE = re.compile(r"\s*# flake8[:=]\s*noqa", re.I)
+CODE_SEPARATOR = re.compile(r"[,\s]")
+
+
+class ParsedSource:
+    """
+    One file as the native checks see it. The lines, the AST and the noqa comments are built on
+    first use and shared by all native checks of the file, so the source is parsed once.
+    """
+
+    def __init__(self, path, source=None):
+        # source is the in-memory source, or None to read the file at path
+        self.path = path
+        self.source = source
+        self.source_lines = None
+        self.source_tree = None
+        self.parsed = False
+        self.noqa_lines = None
+
+    def lines(self):
+        if self.source_lines is None:
+            if self.source is not None:
+                lines = self.source.splitlines(keepends=True)
+            else:
+                lines = read_lines(self.path)
+            if lines and lines[0][:1] == "\ufeff":
+                lines[0] = lines[0][1:]
+            self.source_lines = lines
+        return self.source_lines
+
+    def tree(self):
+        """
+        The module's AST, None when the source doesn't parse (flake8 reports the E999 then).
+        """
+        if not self.parsed:
+            self.parsed = True
+            try:
+                self.source_tree = ast.parse("".join(self.lines()))
+            except (SyntaxError, ValueError):
+                self.source_tree = None
+        return self.source_tree
+
+    def report(self, diagnostics):
+        """
+        Returns the findings of a native check the way flake8 reports them: ordered by position,
+        without the ones a noqa comment disables and none at all for a "# flake8: noqa" file.
+        """
+        diagnostics.sort(key=lambda diagnostic: (diagnostic.line, diagnostic.column))
+        if not diagnostics or not any("noqa" in line.lower() for line in self.lines()):
+            return diagnostics
+        if any(NOQA_FILE.match(line) for line in self.lines()):
+            return []
+        return [diagnostic for diagnostic in diagnostics if not self.disabled(diagnostic)]
+
+    def disabled(self, diagnostic):
+        match = NOQA_INLINE.search(self.noqa_line(diagnostic.line))
+        if match is None:
+            return False
+        if match.group("codes") is None:
+            # A bare "# noqa" disables every finding on the line
+            return True
+        codes = tuple(code for code in CODE_SEPARATOR.split(match.group("codes")) if code)
+        return diagnostic.code in codes or diagnostic.code.startswith(codes)
+
+    def noqa_line(self, line):
+        # Like flake8, a noqa comment after a multi-line string applies to all of its lines
+        if self.noqa_lines is None:
+            self.noqa_lines = noqa_line_mapping(self.lines())
+        if line in self.noqa_lines:
+            return self.noqa_lines[line]
+        lines = self.lines()
+        return lines[line - 1] if 0 < line <= len(lines) else ""
+
+
+def read_lines(path):
+    # Read like flake8 does: in the PEP 263 encoding, latin-1 when that fails
+    try:
+        with tokenize.open(path) as f:
+            return f.readlines()
+    except (SyntaxError, UnicodeError):
+        with open(path, encoding="latin-1") as f:
+            return f.readlines()
+
+
+def noqa_line_mapping(lines):
+    """
+    Returns {line number: text searched for noqa}, the text of all lines a token spans.
+    """
+    mapping = {}
+    first = len(lines) + 2
+    last = -1
+    try:
+        for token_type, _, (start, _), (end, _), _ in tokenize.generate_tokens(io.StringIO("".join(lines)).readline):
+            if token_type in (tokenize.ENDMARKER, tokenize.DEDENT):
+                continue
+            first = min(first, start)
+            last = max(last, end)
+            if token_type in (tokenize.NL, tokenize.NEWLINE):
+                joined = "".join(lines[first - 1:last])
+                for number in range(first, last + 1):
+                    mapping[number] = joined
+                first = len(lines) + 2
+                last = -1
+    except (tokenize.TokenError, SyntaxError):
+        return {}
+    return mapping
@@ -0,0 +1,193 @@
+import io
+import mmap
+import os
+import re
+import tokenize
+
+from pyguardian_lite.pg_files.diagnostic import Diagnostic
+
+# The codes of pycodestyle's physical line checks, in the order its flake8 plugin reports them
+PHYSICAL_CODES = ("E501", "W191", "E101", "W391", "W292", "W293", "W291")
+# Files from this size on are memory-mapped instead of read
+MMAP_SIZE = 1 << 20
+
+UTF8_BOM = b"\xef\xbb\xbf"
+# Line breaks flake8 doesn't split lines at like at "\n" (a lone "\r", and the ones str.splitlines splits
+# in-memory sources at), and the "\v" and "\f" the checks strip: pycodestyle checks such sources
+IRREGULAR = re.compile(rb"\r(?!\n)|[\x0b\x0c\x1c-\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]")
+NON_ASCII = re.compile(rb"[\x80-\xff]")
+TRAILING_WHITESPACE = re.compile(rb"[ \t]+\r?$", re.M)
+INDENT_START = re.compile(rb"^[ \t]", re.M)
+# An indentation with a tab, up to the first tab
+TAB_INDENT = re.compile(rb"^ *\t", re.M)
+# A tab indentation with a space, up to the first space
+SPACE_IN_TAB_INDENT = re.compile(rb"^\t* ", re.M)
+
+
+def check_physical_lines(parsed, codes, max_line_length):
+    """
+    Checks the `codes` of PHYSICAL_CODES on the raw bytes of a ParsedSource the way pycodestyle does in
+    flake8, with a few regular expression scans over the whole file instead of one call per line.
+    Returns the findings as a list of Diagnostic, or None when pycodestyle has to check the source: it
+    doesn't parse (flake8 only reports the E999), it isn't UTF-8, it has irregular line breaks, or a
+    long line could be a URL in a multi-line string, which takes the tokens to tell.
+    """
+    if parsed.tree() is None:
+        return None
+    mapped = None
+    try:
+        if parsed.source is not None:
+            data = parsed.source.encode("utf-8")
+        else:
+            with open(parsed.path, "rb") as f:
+                if os.fstat(f.fileno()).st_size >= MMAP_SIZE:
+                    data = mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    data = f.read()
+            if not is_utf8(data):
+                return None
+        if IRREGULAR.search(data):
+            return None
+        return PhysicalLineChecker(data, codes, max_line_length).check(parsed)
+    except (OSError, UnicodeError):
+        return None
+    finally:
+        if mapped is not None:
+            mapped.close()
+
+
+def is_utf8(data):
+    # The encoding flake8 reads a file in: its PEP 263 cookie, else UTF-8 (latin-1 when that fails)
+    end = data.find(b"\n", data.find(b"\n") + 1)
+    try:
+        encoding, _ = tokenize.detect_encoding(io.BytesIO(data[:end if end >= 0 else len(data)]).readline)
+    except SyntaxError:
+        return False
+    if encoding not in ("utf-8", "utf-8-sig"):
+        return False
+    if NON_ASCII.search(data):
+        # Raises UnicodeDecodeError
+        str(data, "utf-8")
+    return True
+
+
+class NeedsTokens(Exception):
+    """
+    Raised for a finding that depends on the tokens of the line.
+    """
+
+
+class PhysicalLineChecker:
+    """
+    pycodestyle's physical line checks over the bytes of a UTF-8 source with "\n" or "\r\n" line
+    breaks. Every check is one scan of the whole source for the lines it reports, only those lines
+    are decoded to find the columns in characters.
+    """
+
+    def __init__(self, data, codes, max_line_length):
+        self.data = data
+        self.codes = codes
+        self.max_line_length = max_line_length
+        # flake8 strips the BOM
+        self.start = len(UTF8_BOM) if data[:len(UTF8_BOM)] == UTF8_BOM else 0
+        # (line, offset, order, code, message)
+        self.findings = []
+
+    def check(self, parsed):
+        try:
+            if "E501" in self.codes:
+                self.check_line_length()
+            if "W191" in self.codes or "E101" in self.codes:
+                self.check_tabs()
+            if "W391" in self.codes or "W292" in self.codes:
+                self.check_end_of_file()
+            if "W291" in self.codes or "W293" in self.codes:
+                self.check_trailing_whitespace()
+        except NeedsTokens:
+            return None
+        self.findings.sort(key=lambda finding: finding[:3])
+        return parsed.report([Diagnostic(line, offset + 1, code, message)
+                              for line, offset, _, code, message in self.findings])
+
+    def add(self, line, offset, code, message):
+        if code in self.codes:
+            self.findings.append((line, offset, PHYSICAL_CODES.index(code), code, message))
+
+    def count_lines(self, start, end):
+        # Line breaks in data[start:end]; mmap has no count()
+        if isinstance(self.data, bytes):
+            return self.data.count(b"\n", start, end)
+        return self.data[start:end].count(b"\n")
+
+    def numbered(self, pattern):
+        """
+        Yields (line number, start of the line, match) for the matches of pattern in the source.
+        """
+        line = 1
+        position = self.start
+        for match in pattern.finditer(self.data, self.start):
+            line += self.count_lines(position, match.start())
+            position = match.start()
+            yield line, self.data.rfind(b"\n", self.start, position) + 1 or self.start, match
+
+    def text(self, start, end):
+        return self.data[start:end].decode("utf-8")
+
+    def line_end(self, start):
+        end = self.data.find(b"\n", start)
+        return len(self.data) if end < 0 else end + 1
+
+    def check_line_length(self):
+        maximum = self.max_line_length
+        # Lines of more bytes than characters allowed, decoded to count the characters
+        pattern = re.compile(rb"^[^\n]{%d}" % (maximum + 1), re.M)
+        for number, start, _ in self.numbered(pattern):
+            line = self.text(start, self.line_end(start)).rstrip()
+            length = len(line)
+            if length <= maximum or (number == 1 and line.startswith("#!")):
+                continue
+            chunks = line.split()
+            if len(line) - len(chunks[-1]) < maximum - 7:
+                if len(chunks) == 2 and chunks[0] == "#":
+                    # A long URL in a comment
+                    continue
+                if len(chunks) == 1:
+                    # pycodestyle skips it when the line is in a multi-line string
+                    raise NeedsTokens()
+            self.add(number, maximum, "E501", f"line too long ({length} > {maximum} characters)")
+
+    def check_tabs(self):
+        first = INDENT_START.search(self.data, self.start)
+        if first is None:
+            # Nothing is indented
+            return
+        # flake8's indent_char, the first character of the first indented line
+        indent_char = self.data[first.start():first.start() + 1]
+        for number, start, match in self.numbered(TAB_INDENT):
+            self.add(number, match.end() - 1 - start, "W191", "indentation contains tabs")
+            if indent_char == b" ":
+                self.add(number, match.end() - 1 - start, "E101", "indentation contains mixed spaces and tabs")
+        if indent_char == b"\t":
+            for number, start, match in self.numbered(SPACE_IN_TAB_INDENT):
+                self.add(number, match.end() - 1 - start, "E101", "indentation contains mixed spaces and tabs")
+
+    def check_end_of_file(self):
+        size = len(self.data)
+        if size <= self.start:
+            return
+        lines = self.count_lines(self.start, size)
+        if self.data[size - 1:size] != b"\n":
+            # The last line has no line break, its length is the column
+            start = self.data.rfind(b"\n", self.start) + 1 or self.start
+            self.add(lines + 1, len(self.text(start, size)), "W292", "no newline at end of file")
+            return
+        start = self.data.rfind(b"\n", self.start, size - 1) + 1 or self.start
+        if self.data[start:size] in (b"\n", b"\r\n"):
+            self.add(lines, 0, "W391", "blank line at end of file")
+
+    def check_trailing_whitespace(self):
+        for number, start, match in self.numbered(TRAILING_WHITESPACE):
+            if match.start() == start:
+                self.add(number, 0, "W293", "blank line contains whitespace")
+            else:
+                self.add(number, len(self.text(start, match.start())), "W291", "trailing whitespace")
@@ -0,0 +1,260 @@
+import functools
+import threading
+import time
+import types
+
+import pyguardian_lite.pg_files.rulebook as rulebook
+
+# pycodestyle registers its checks with the codes found in their docstrings, which this one lacks
+CHECK_CODES = {"tabs_or_spaces": ("E101",)}
+
+# The RuleProfiler installed in this process, see active_profiler
+_active = None
+
+
+def active_profiler():
+    return _active
+
+
+def materialize(result):
+    # Checks are generators, their work happens while they are consumed
+    if isinstance(result, types.GeneratorType):
+        return list(result)
+    return result
+
+
+def bandit_test_codes(test):
+    """
+    Returns the error codes a bandit test reports, flake8-bandit reports bandit's B101 as S101.
+    """
+    test_id = getattr(test, "_test_id", "B")
+    if test_id != "B001":
+        return ["S" + test_id[1:]]
+    # The blacklist test (B001) reports the calls and imports of bandit's blacklists, S3xx and S4xx
+    codes = {code for code in rulebook.code_type_index if code[:2] in ("S3", "S4")}
+    try:
+        from bandit.core.extension_loader import MANAGER
+    except ImportError:
+        return sorted(codes)
+    codes.update("S" + entry["id"][1:] for entries in MANAGER.blacklist.values() for entry in entries)
+    return sorted(codes)
+
+
+class RuleProfiler:
+    """
+    Measures the time spent in every flake8 plugin of the in-process engine, and in the check
+    functions of pycodestyle, pep8-naming and bandit, mapped to the rulebook types and policy
+    categories of the codes they report. The plugins and checks are wrapped while the profiler is
+    installed; the timings include the wrappers, so they are for comparing rules with each other.
+    """
+
+    def __init__(self):
+        # (plugin, check or None) -> [calls, seconds]
+        self.stats = {}
+        # (plugin, check or None) -> error codes reported by the plugin or check
+        self.codes = {}
+        # (object, attribute, original value or None to delete) restored by uninstall
+        self.patches = []
+        self.engine = None
+        self.original_checkers = None
+        self.lock = threading.Lock()
+
+    def timed(self, key, function, codes=()):
+        record = self.stats.setdefault(key, [0, 0.0])
+        self.codes.setdefault(key, set()).update(codes)
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return materialize(function(*args, **kwargs))
+            finally:
+                record[0] += 1
+                record[1] += perf_counter() - start
+
+        return functools.update_wrapper(wrapper, function)
+
+    def timed_tree_plugin(self, key, plugin_class):
+        record = self.stats.setdefault(key, [0, 0.0])
+        perf_counter = time.perf_counter
+
+        def run_plugin(**arguments):
+            # Tree plugins do their work when created and while run() is consumed
+            start = perf_counter()
+            try:
+                return list(plugin_class(**arguments).run())
+            finally:
+                record[0] += 1
+                record[1] += perf_counter() - start
+
+        return run_plugin
+
+    def patch(self, target, attribute, value):
+        self.patches.append((target, attribute, target.__dict__.get(attribute)))
+        setattr(target, attribute, value)
+
+    def install(self, engine):
+        """
+        Wraps the plugins of the engine and the check functions, until uninstall() is called.
+        """
+        global _active
+        if _active is not None and _active is not self:
+            # Inherited by a forked pool worker, the wrappers would be wrapped again
+            _active.uninstall()
+        self.engine = engine
+        self.original_checkers = engine.plugins.checkers
+        checkers = self.original_checkers
+        wrapped = checkers._replace(
+            tree=[self.wrap_plugin(loaded, tree=True) for loaded in checkers.tree],
+            logical_line=[self.wrap_plugin(loaded) for loaded in checkers.logical_line],
+            physical_line=[self.wrap_plugin(loaded) for loaded in checkers.physical_line],
+        )
+        engine.set_checkers(wrapped)
+        self.wrap_pycodestyle()
+        self.wrap_pep8_naming()
+        self.wrap_bandit()
+        _active = self
+        return self
+
+    def uninstall(self):
+        global _active
+        for target, attribute, original in reversed(self.patches):
+            if original is None:
+                delattr(target, attribute)
+            else:
+                setattr(target, attribute, original)
+        self.patches = []
+        if self.engine is not None:
+            self.engine.set_checkers(self.original_checkers)
+            self.engine = None
+        if _active is self:
+            _active = None
+
+    def wrap_plugin(self, loaded, tree=False):
+        key = (loaded.display_name, None)
+        if loaded.plugin.package != "pycodestyle":
+            # pyflakes[F], mccabe[C90], pep8-naming[N8] and flake8-bandit[S] report the codes of their prefix
+            self.codes.setdefault(key, set()).update(
+                code for code in rulebook.code_category_index if code.startswith(loaded.entry_name))
+        if tree:
+            return loaded._replace(obj=self.timed_tree_plugin(key, loaded.obj))
+        return loaded._replace(obj=self.timed(key, loaded.obj))
+
+    def wrap_pycodestyle(self):
+        try:
+            import pycodestyle
+            from flake8.plugins import pycodestyle as plugin_module
+        except ImportError:
+            return
+        plugins = {"logical_line": "pycodestyle[E]", "physical_line": "pycodestyle[W]"}
+        for kind, checks in pycodestyle._checks.items():
+            if kind not in plugins:
+                continue
+            for function, (codes, _) in checks.items():
+                # flake8's generated plugin calls the checks through module globals like _bare_except
+                name = "_" + function.__name__
+                if getattr(plugin_module, name, None) is not function:
+                    continue
+                codes = CHECK_CODES.get(function.__name__) or [code for code in codes if code]
+                key = (plugins[kind], function.__name__)
+                self.patch(plugin_module, name, self.timed(key, function, codes))
+                self.codes.setdefault((plugins[kind], None), set()).update(codes)
+
+    def wrap_pep8_naming(self):
+        try:
+            import pep8ext_naming
+        except ImportError:
+            return
+        for visitor in pep8ext_naming.BaseASTCheck.all:
+            check_class = type(visitor)
+            key = ("pep8-naming[N8]", check_class.__name__)
+            for attribute in dir(check_class):
+                if attribute.startswith("visit_"):
+                    # NamingChecker looks the visit methods up on the visitor instances
+                    self.patch(visitor, attribute, self.timed(key, getattr(visitor, attribute), visitor.codes))
+
+    def wrap_bandit(self):
+        try:
+            from bandit.core.test_set import BanditTestSet
+        except ImportError:
+            return
+        get_tests = BanditTestSet.get_tests
+        wrappers = {}
+
+        def get_timed_tests(test_set, checktype):
+            tests = []
+            for test in get_tests(test_set, checktype):
+                if test not in wrappers:
+                    wrappers[test] = self.timed(("flake8-bandit[S]", test.__name__), test, bandit_test_codes(test))
+                tests.append(wrappers[test])
+            return tests
+
+        self.patch(BanditTestSet, "get_tests", get_timed_tests)
+
+    def take(self):
+        """
+        Returns the measurements so far as a picklable list and starts from zero again, used by pool workers.
+        """
+        with self.lock:
+            measurements = [(plugin, check, calls, seconds, sorted(self.codes.get((plugin, check), ())))
+                            for (plugin, check), (calls, seconds) in self.stats.items() if calls]
+            for record in self.stats.values():
+                record[0] = 0
+                record[1] = 0.0
+        return measurements
+
+    def merge(self, measurements):
+        with self.lock:
+            for plugin, check, calls, seconds, codes in measurements:
+                record = self.stats.setdefault((plugin, check), [0, 0.0])
+                record[0] += calls
+                record[1] += seconds
+                self.codes.setdefault((plugin, check), set()).update(codes)
+
+    def report(self):
+        """
+        Returns [plugin] with the calls, seconds, share of the total time, codes, rulebook types
+        and policy categories of every plugin, most expensive first, each with its checks.
+        """
+        with self.lock:
+            stats = {key: tuple(record) for key, record in self.stats.items() if record[0]}
+        total = sum(seconds for (_, check), (_, seconds) in stats.items() if check is None) or 1.0
+
+        def entry(name, key, calls, seconds):
+            codes = sorted(self.codes.get(key, ()))
+            return {
+                "name": name,
+                "calls": calls,
+                "seconds": seconds,
+                "share": seconds / total,
+                "codes": codes,
+                "types": sorted({rulebook.code_type_index[code] for code in codes
+                                 if code in rulebook.code_type_index}),
+                "categories": sorted({rulebook.code_category_index[code] for code in codes
+                                      if code in rulebook.code_category_index}),
+            }
+
+        plugins = []
+        for (plugin, check), (calls, seconds) in stats.items():
+            if check is not None:
+                continue
+            result = entry(plugin, (plugin, None), calls, seconds)
+            result["checks"] = sorted((entry(name, (owner, name), *stats[(owner, name)])
+                                       for owner, name in stats if owner == plugin and name is not None),
+                                      key=lambda item: item["seconds"], reverse=True)
+            plugins.append(result)
+        return sorted(plugins, key=lambda item: item["seconds"], reverse=True)
+
+
+def format_report(plugins):
+    """
+    Formats RuleProfiler.report() as the table printed by --profile-rules.
+    """
+    lines = [f"{'plugin / check':<44} {'calls':>9} {'ms':>10} {'share':>7}  rules"]
+    for plugin in plugins:
+        lines.append(f"{plugin['name']:<44} {plugin['calls']:>9} {plugin['seconds'] * 1000:>10.1f} "
+                     f"{plugin['share']:>7.1%}  {', '.join(plugin['categories'])}")
+        for check in plugin["checks"]:
+            lines.append(f"  {check['name']:<42} {check['calls']:>9} {check['seconds'] * 1000:>10.1f} "
+                         f"{check['share']:>7.1%}  {', '.join(check['types']) or ', '.join(check['codes'])}")
+    return "\n".join(lines)
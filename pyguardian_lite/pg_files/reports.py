@@ -0,0 +1,182 @@
+import html
+import json
+import os
+import re
+from urllib.parse import quote
+
+import pyguardian_lite.pg_files.rulebook as rulebook
+
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+# SARIF result levels of the policy severities
+SARIF_LEVEL = {"critical": "error", "error": "error", "warning": "warning", "info": "note", "hint": "note",
+               "debug": "note"}
+# Characters XML 1.0 doesn't allow, not even escaped
+INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def rule_metadata(config):
+    """
+    Returns {error code: rule} with the rulebook's type, group and category of every code,
+    and the name, description and severity the policy sets for it.
+    """
+    rules = {}
+    for category, book in rulebook.rulebook_categories.items():
+        for group, entries in book.items():
+            for rule_type, code in entries:
+                if code not in rules:
+                    rules[code] = {"type": rule_type, "group": group, "category": category,
+                                   "severity": rulebook.default_severity_index[code]}
+
+    for category, group, item in policy_items(config):
+        code = item.get("error_code")
+        if not code and "type" in item:
+            code = rulebook.type_index.get(group, {}).get(item["type"])
+        if not code:
+            continue
+        rule = rules.setdefault(code, {"type": item.get("type"), "group": group, "category": category,
+                                       "severity": "error"})
+        for key in ("name", "description"):
+            if item.get(key):
+                rule[key] = str(item[key]).strip()
+        if item.get("set.severity") in rulebook.valid_severities:
+            rule["severity"] = item["set.severity"]
+    return rules
+
+
+def policy_items(config):
+    # naming_conventions and security are lists of checks, style_conventions groups them
+    groups = {"naming_conventions": "pep8-naming", "security": "bandit"}
+    for category in rulebook.rulebook_categories:
+        section = config.get(category) if isinstance(config, dict) else None
+        if isinstance(section, list):
+            sections = [(groups[category], section)]
+        elif isinstance(section, dict):
+            sections = section.items()
+        else:
+            continue
+        for group, items in sections:
+            for item in items or ():
+                if isinstance(item, dict):
+                    yield category, group, item
+
+
+def split_message(entry):
+    code, _, message = entry["message"].partition(" ")
+    return code, message
+
+
+def artifact_uri(path):
+    if os.path.isabs(path):
+        return "file://" + quote(path.replace(os.sep, "/"))
+    return quote(path.replace(os.sep, "/"))
+
+
+class SarifWriter:
+    """
+    Writes a SARIF 2.1.0 log, one result at a time. Results come first and the rules they
+    reference are written once each after them, so only the rules that were reported are listed.
+    """
+
+    def __init__(self, stream, rules):
+        self.stream = stream
+        self.rules = rules
+        # error code -> ruleIndex, in the order the codes were first reported
+        self.rule_index = {}
+        self.count = 0
+
+    def start(self):
+        self.stream.write('{"$schema": %s, "version": "2.1.0", "runs": [{"results": [' % json.dumps(SARIF_SCHEMA))
+
+    def write(self, output, name=None):
+        for entry in output:
+            code, message = split_message(entry)
+            index = self.rule_index.setdefault(code, len(self.rule_index))
+            result = {
+                "ruleId": code,
+                "ruleIndex": index,
+                "level": SARIF_LEVEL.get(entry["severity"], "error"),
+                "message": {"text": message},
+                "locations": [{"physicalLocation": {
+                    "artifactLocation": {"uri": artifact_uri(entry["file"])},
+                    "region": {"startLine": max(entry["line"], 1), "startColumn": max(entry["position"], 1)}
+                }}],
+                "properties": {"severity": entry["severity"], "category": entry["category"]}
+            }
+            self.stream.write(("\n" if not self.count else ",\n") + json.dumps(result))
+            self.count += 1
+        self.stream.flush()
+
+    def finish(self):
+        rules = [self.describe(code) for code in self.rule_index]
+        driver = {"name": "pyguardian-lt", "rules": rules}
+        self.stream.write('\n], "tool": {"driver": %s}}]}\n' % json.dumps(driver))
+        self.stream.flush()
+
+    def describe(self, code):
+        rule = self.rules.get(code)
+        if rule is None:
+            # Not in the rulebook, e.g. E999 for a file that doesn't parse
+            return {"id": code}
+        description = {"id": code, "name": rule["type"] or code}
+        if rule.get("name"):
+            description["shortDescription"] = {"text": rule["name"]}
+        if rule.get("description"):
+            description["fullDescription"] = {"text": rule["description"]}
+        description["defaultConfiguration"] = {"level": SARIF_LEVEL.get(rule["severity"], "error")}
+        description["properties"] = {"category": rule["category"], "group": rule["group"],
+                                     "tags": [rule["category"], rule["group"]]}
+        return description
+
+
+class JUnitWriter:
+    """
+    Writes a JUnit XML report, one <testsuite> per file with a failed <testcase> per finding, or
+    one passed <testcase> for a file without findings. Every file is written as soon as its findings
+    arrive, so the totals are only on the suites.
+    """
+
+    def __init__(self, stream, rules=None):
+        self.stream = stream
+
+    def start(self):
+        self.stream.write('<?xml version="1.0" encoding="UTF-8"?>\n<testsuites name="pyguardian-lt">\n')
+
+    def write(self, output, name=None):
+        # An output normally holds one file (`name`), keep the files apart when it holds several
+        files = {} if name is None else {name: []}
+        for entry in output:
+            files.setdefault(entry["file"], []).append(entry)
+        write = self.stream.write
+        for path, entries in files.items():
+            if not entries:
+                write('  <testsuite name=%s tests="1" failures="0">\n' % attribute(path))
+                write('    <testcase classname=%s name="pyguardian-lt"/>\n' % attribute(path))
+                write('  </testsuite>\n')
+                continue
+            write('  <testsuite name=%s tests="%d" failures="%d">\n' % (attribute(path), len(entries), len(entries)))
+            for entry in entries:
+                code, message = split_message(entry)
+                name = f"{code} line {entry['line']}, col {entry['position']}"
+                write('    <testcase classname=%s name=%s>\n' % (attribute(path), attribute(name)))
+                write('      <failure type=%s message=%s>%s</failure>\n' % (
+                    attribute(code), attribute(message),
+                    text(f"{path}:{entry['line']}:{entry['position']}: {entry['severity']} "
+                         f"({entry['category']}) {entry['message']}")))
+                write('    </testcase>\n')
+            write('  </testsuite>\n')
+        self.stream.flush()
+
+    def finish(self):
+        self.stream.write('</testsuites>\n')
+        self.stream.flush()
+
+
+def attribute(value):
+    return '"%s"' % html.escape(INVALID_XML.sub("\ufffd", str(value)))
+
+
+def text(value):
+    return html.escape(INVALID_XML.sub("\ufffd", str(value)), quote=False)
+
+
+REPORT_WRITERS = {"sarif": SarifWriter, "junit": JUnitWriter}
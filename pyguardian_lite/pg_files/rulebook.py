@@ -459,3 +459,40 @@ valid_severities = {
 
 
 
+
+
+# Indexes built once at import time, so lookups don't have to scan the lists above
+# The policy category every rulebook belongs to
+rulebook_categories = {
+    "naming_conventions": naming_convention,
+    "style_conventions": style_convention,
+    "security": security,
+}
+
+# rulebook group (e.g. "pep8-naming", "whitespaces", "bandit") -> {type: error code}
+type_index = {}
+# error code -> policy category
+code_category_index = {}
+# error code -> type
+code_type_index = {}
+for _category, _rulebook in rulebook_categories.items():
+    for _group, _rules in _rulebook.items():
+        _types = type_index.setdefault(_group, {})
+        for _type, _code in _rules:
+            # The first entry wins, like the linear lookups did
+            _types.setdefault(_type, _code)
+            code_category_index.setdefault(_code, _category)
+            code_type_index.setdefault(_code, _type)
+
+# policy category -> all of its error codes
+category_codes = {
+    category: frozenset(code for code, owner in code_category_index.items() if owner == category)
+    for category in rulebook_categories
+}
+
+# error code -> severity reported when the policy doesn't set one
+default_severity_index = {
+    code: "warning" if code in error_warning_collection else "error" for code in code_category_index
+}
+
+del _category, _rulebook, _group, _rules, _types, _type, _code
@@ -29,11 +29,13 @@ class RulesFilter:
     rulebookStyleLogicalOperations = rulebook.style_convention["logical_operations"]
     rulebookStyleCodeComplexity = rulebook.style_convention["code_complexity"]
     rulebookSecurity = rulebook.security["bandit"]
+    # type -> error code lookups of the rulebooks above
+    typeIndex = rulebook.type_index
+    # policy category -> frozenset of its error codes
+    categoryCodes = rulebook.category_codes
 
-    errorMapPep8 = rulebook.error_map['pep8-naming']
     validSeverity = rulebook.valid_severities
     errorMapSeverity = rulebook.error_severity_map
-    errorMapSecurity = rulebook.error_map['bandit']
     errorMap = rulebook.error_map
 
     def collect_all(self):
@@ -50,7 +52,7 @@ class RulesFilter:
             if self.blocklist:
                 blacklist = collection
             else:
-                blacklist = self.identify_blacklist(collection, self.errorMapPep8)
+                blacklist = sorted(self.categoryCodes["naming_conventions"].difference(collection))
             rule_entry = {
                 "pep8naming": {
                     "error_codes": collection
@@ -85,7 +87,7 @@ class RulesFilter:
             if self.blocklist:
                 blacklist = collection
             else:
-                blacklist = self.identify_blacklist(collection, self.errorMapSecurity)
+                blacklist = sorted(self.categoryCodes["security"].difference(collection))
             rule_entry = {
                 "bandit": {
                     "error_codes": collection
@@ -106,11 +108,7 @@ class RulesFilter:
                 error_code = item.get("error_code")
                 if not error_code and "type" in item:
                     # Look up the error code in the rulebook for the given type
-                    type_name = item["type"]
-                    error_code = next(
-                        (code for t, code in self.rulebookPep8Naming if t == type_name),
-                        None,
-                    )
+                    error_code = self.typeIndex["pep8-naming"].get(item["type"])
                 if error_code:
                     self.check_custom_severity(item, error_code)
                     error_codes.append(error_code)
@@ -157,11 +155,7 @@ class RulesFilter:
                 error_code = item.get("error_code")
                 if not error_code and "type" in item:
                     # Look up the error code in the rulebook for the given type
-                    type_name = item["type"]
-                    error_code = next(
-                        (code for t, code in self.rulebookSecurity if t == type_name),
-                        None,
-                    )
+                    error_code = self.typeIndex["bandit"].get(item["type"])
                 if error_code:
                     self.check_custom_severity(item, error_code)
                     error_codes.append(error_code)
@@ -171,19 +165,44 @@ class RulesFilter:
         if data['meta'] and "blocklist" in data['meta']:
             if data['meta']['blocklist']:  # Check if the value of 'blocklist' is True
                 self.blocklist = True
+        if data['meta'] and "scan_timeouts" in data['meta']:
+            self.collect_scan_timeouts(data['meta']['scan_timeouts'])
+        if data['meta'] and "tiers" in data['meta']:
+            self.collect_tiers(data['meta']['tiers'])
 
-    def assemble_codes(self, data, category, key, ruleset) -> list:
+    def collect_scan_timeouts(self, timeouts):
+        """
+        Collects the seconds per policy category (or "default") a scan may take in the concurrent scan mode.
+        """
+        collected = {}
+        for category, seconds in (timeouts or {}).items():
+            if isinstance(seconds, (int, float)) and not isinstance(seconds, bool) and seconds > 0:
+                collected[category] = seconds
+        if collected:
+            self.extraRules.append({"scan_timeouts": collected})
+
+    # Parts of a policy a tier can hold: the categories, and the C901 check of style_conventions
+    tierCategories = ("naming_conventions", "style_conventions", "code_complexity", "security")
+
+    def collect_tiers(self, tiers):
+        """
+        Collects the tier (1 is reported first) of every policy category set in meta.tiers.
+        """
+        collected = {}
+        for category, tier in (tiers or {}).items():
+            if category in self.tierCategories and isinstance(tier, int) and not isinstance(tier, bool) and tier > 0:
+                collected[category] = tier
+        if collected:
+            self.extraRules.append({"tiers": collected})
+
+    def assemble_codes(self, data, category, key, type_index) -> list:
         error_codes = []
         for item in data[category][key]:
             if item.get("enabled"):
                 error_code = item.get("error_code")
                 if not error_code and "type" in item:
                     # Look up the error code in the rulebook for the given type
-                    type_name = item["type"]
-                    error_code = next(
-                        (code for t, code in ruleset if t == type_name),
-                        None,
-                    )
+                    error_code = type_index.get(item["type"])
                 if error_code:
                     self.check_custom_severity(item, error_code)
                     error_codes.append(error_code)
@@ -201,50 +220,52 @@ class RulesFilter:
         """
         Identifies error values in errormap that are not in the yaml and returns them as a list.
         """
+        collected = set(collected)
         blacklist = [error for error in errormap if error not in collected]
         return blacklist
 
     def collect_indentation(self, data):
-        return self.assemble_codes(data, "style_conventions", "indentation", self.rulebookStyleIndentation)
+        return self.assemble_codes(data, "style_conventions", "indentation", self.typeIndex["indentation"])
 
     def collect_whitespace(self, data):
-        return self.assemble_codes(data, "style_conventions", "whitespaces", self.rulebookStyleWhitespaces)
+        return self.assemble_codes(data, "style_conventions", "whitespaces", self.typeIndex["whitespaces"])
 
     def collect_blankline(self, data):
-        return self.assemble_codes(data, "style_conventions", "blank_lines", self.rulebookStyleBlanklines)
+        return self.assemble_codes(data, "style_conventions", "blank_lines", self.typeIndex["blank_lines"])
 
     def collect_import(self, data):
-        return self.assemble_codes(data, "style_conventions", "import", self.rulebookStyleImport)
+        return self.assemble_codes(data, "style_conventions", "import", self.typeIndex["import"])
 
     def collect_linelength(self, data):
-        return self.assemble_codes(data, "style_conventions", "line_length", self.rulebookStyleLinelength)
+        return self.assemble_codes(data, "style_conventions", "line_length", self.typeIndex["line_length"])
 
     def collect_statement(self, data):
-        return self.assemble_codes(data, "style_conventions", "statement", self.rulebookStyleStatement)
+        return self.assemble_codes(data, "style_conventions", "statement", self.typeIndex["statement"])
 
     def collect_runtime(self, data):
-        return self.assemble_codes(data, "style_conventions", "runtime", self.rulebookStyleRuntime)
+        return self.assemble_codes(data, "style_conventions", "runtime", self.typeIndex["runtime"])
 
     def collect_linebreak(self, data):
-        return self.assemble_codes(data, "style_conventions", "line_break", self.rulebookStyleLinebreak)
+        return self.assemble_codes(data, "style_conventions", "line_break", self.typeIndex["line_break"])
 
     def collect_deprecation(self, data):
-        return self.assemble_codes(data, "style_conventions", "deprecation", self.rulebookStyleDeprecation)
+        return self.assemble_codes(data, "style_conventions", "deprecation", self.typeIndex["deprecation"])
 
     def collect_flowcontrol(self, data):
-        return self.assemble_codes(data, "style_conventions", "flow_control", self.rulebookStyleFlowcontrol)
+        return self.assemble_codes(data, "style_conventions", "flow_control", self.typeIndex["flow_control"])
 
     def collect_logicalissues(self, data):
-        return self.assemble_codes(data, "style_conventions", "logical_issues", self.rulebookStyleLogicalIssues)
+        return self.assemble_codes(data, "style_conventions", "logical_issues", self.typeIndex["logical_issues"])
 
     def collect_codequality(self, data):
-        return self.assemble_codes(data, "style_conventions", "code_quality", self.rulebookStyleCodequality)
+        return self.assemble_codes(data, "style_conventions", "code_quality", self.typeIndex["code_quality"])
 
     def collect_logicaloperation(self, data):
-        return self.assemble_codes(data, "style_conventions", "logical_operations", self.rulebookStyleLogicalOperations)
+        return self.assemble_codes(data, "style_conventions", "logical_operations",
+                                   self.typeIndex["logical_operations"])
 
     def collect_codecomplexity(self, data):
-        return self.assemble_codes(data, "style_conventions", "code_complexity", self.rulebookStyleLogicalOperations)
+        return self.assemble_codes(data, "style_conventions", "code_complexity", self.typeIndex["logical_operations"])
 
     def collect_complexity(self, data):
         for item in data:
@@ -274,9 +295,46 @@ class RulesFilter:
         return self.extraRules
 
     def reset(self):
-        self.data_list.clear()
-        self.rulesCollection.clear()
-        self.customSeverity.clear()
-        self.formatRules.clear()
-        self.extraRules.clear()
+        # Drop the references only, the policy and the collections may still be used by the caller
+        self.data_list = {}
+        self.rulesCollection = []
+        self.customSeverity = []
+        self.formatRules = []
+        self.extraRules = []
         self.blocklist = None  # Bool
+
+
+class CompiledPolicy:
+    """
+    The rule collections RulesFilter builds from a policy, ready to be handed to the scanners.
+    """
+
+    def __init__(self, rules, severity, extra_rules, format_rules):
+        self.rules = rules
+        self.severity = severity
+        self.extra_rules = extra_rules
+        self.format_rules = format_rules
+
+    @classmethod
+    def from_config(cls, config):
+        fetch_rules = RulesFilter(config)
+        errors_and_rules = fetch_rules.collect_all()
+        # Collect the 'custom' severity list
+        custom_severity_list = fetch_rules.collect_severity()
+        # Collect extra rules that are defined within the yaml blocks
+        extra_rules = fetch_rules.collect_extra_rules()
+        # Collect the format rules
+        format_rules = fetch_rules.collect_format_rules()
+        return cls(errors_and_rules, custom_severity_list, extra_rules, format_rules)
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(data["rules"], data["severity"], data["extra_rules"], data["format_rules"])
+
+    def to_data(self):
+        return {
+            "rules": self.rules,
+            "severity": self.severity,
+            "extra_rules": self.extra_rules,
+            "format_rules": self.format_rules,
+        }
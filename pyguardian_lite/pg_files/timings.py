@@ -0,0 +1,259 @@
+import json
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+# Callbacks receiving ("start" | "end", Span), see add_hook
+_hooks = ()
+_local = threading.local()
+
+
+def cpu_time():
+    # User and system time of this process and of its finished subprocesses (the subprocess backend)
+    if resource is None:
+        times = os.times()
+        return times.user + times.system + times.children_user + times.children_system
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+class Span:
+    """
+    One timed stage. `wall` and `cpu` are filled in when the span ends; the CPU time is the whole
+    process' (including finished subprocesses), so it also counts other threads of a daemon.
+    """
+
+    __slots__ = ("name", "attributes", "parent", "started", "cpu_started", "wall", "cpu")
+
+    def __init__(self, name, attributes, parent=None):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.started = None
+        self.cpu_started = None
+        self.wall = None
+        self.cpu = None
+
+    def add(self, counter, value=1):
+        """
+        Adds to a numeric attribute, e.g. span.add("subprocesses").
+        """
+        self.attributes[counter] = self.attributes.get(counter, 0) + value
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        emit("start", self)
+        self.cpu_started = cpu_time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wall = time.perf_counter() - self.started
+        self.cpu = cpu_time() - self.cpu_started
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        emit("end", self)
+        return False
+
+    def to_dict(self):
+        return {"name": self.name, "parent": self.parent, "wall": self.wall, "cpu": self.cpu,
+                "attributes": self.attributes}
+
+    @classmethod
+    def from_dict(cls, data):
+        span = cls(data["name"], data["attributes"], data["parent"])
+        span.wall = data["wall"]
+        span.cpu = data["cpu"]
+        return span
+
+
+class NullSpan:
+    """
+    Returned by span() while no hook is registered, so instrumented code pays next to nothing.
+    """
+
+    def add(self, counter, value=1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def span(name, **attributes):
+    """
+    Context manager timing the stage `name`, e.g. `with span("load_config"): ...`.
+    """
+    if not _hooks:
+        return NULL_SPAN
+    return Span(name, attributes)
+
+
+def record(name, wall, cpu, **attributes):
+    """
+    Emits a span timed by the caller, e.g. the sum of many calls too short to time one by one.
+    """
+    if not _hooks:
+        return
+    stack = _stack()
+    recorded = Span(name, attributes, stack[-1].name if stack else None)
+    recorded.wall = wall
+    recorded.cpu = cpu
+    emit("start", recorded)
+    emit("end", recorded)
+
+
+def current_span():
+    """
+    The innermost running span of this thread, to add counters to (a NullSpan when there is none).
+    """
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else NULL_SPAN
+
+
+def add_hook(hook):
+    """
+    Registers `hook(event, span)`, called with "start" and "end" for every span from then on.
+    """
+    global _hooks
+    _hooks = _hooks + (hook,)
+    return hook
+
+
+def remove_hook(hook):
+    global _hooks
+    _hooks = tuple(registered for registered in _hooks if registered is not hook)
+
+
+def hooks_active():
+    return bool(_hooks)
+
+
+def emit(event, span):
+    for hook in _hooks:
+        try:
+            hook(event, span)
+        except Exception:
+            # A broken exporter must not break the analysis
+            pass
+
+
+def replay(spans):
+    """
+    Emits the spans recorded in another process (a pool worker) to the hooks of this one.
+    """
+    for data in spans:
+        recorded = Span.from_dict(data)
+        emit("start", recorded)
+        emit("end", recorded)
+
+
+class SpanRecorder:
+    """
+    Hook keeping the finished spans as dicts, e.g. for a pool worker to send them back with
+    its results.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def __call__(self, event, span):
+        if event == "end":
+            with self.lock:
+                self.spans.append(span.to_dict())
+
+    def take(self):
+        with self.lock:
+            spans = self.spans
+            self.spans = []
+        return spans
+
+
+class TimingCollector:
+    """
+    Hook adding up the calls, wall and CPU time and the counters of every span name.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, event, span):
+        if event != "end":
+            return
+        with self.lock:
+            stage = self.stages.setdefault(span.name, {"calls": 0, "wall": 0.0, "cpu": 0.0, "counters": {}})
+            stage["calls"] += 1
+            stage["wall"] += span.wall
+            stage["cpu"] += span.cpu
+            for counter, value in span.attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stage["counters"][counter] = stage["counters"].get(counter, 0) + value
+
+    def totals(self):
+        """
+        Returns the counters summed over all stages.
+        """
+        totals = {}
+        with self.lock:
+            for stage in self.stages.values():
+                for counter, value in stage["counters"].items():
+                    totals[counter] = totals.get(counter, 0) + value
+        return totals
+
+    def report(self):
+        """
+        Returns the report printed by --timings, one line per stage in the order they first ended.
+        """
+        lines = [f"{'stage':<28} {'calls':>7} {'wall ms':>10} {'cpu ms':>10}"]
+        with self.lock:
+            for name, stage in self.stages.items():
+                lines.append(f"{name:<28} {stage['calls']:>7} {stage['wall'] * 1000:>10.1f} "
+                             f"{stage['cpu'] * 1000:>10.1f}")
+        totals = self.totals()
+        lines.append(f"subprocesses: {totals.get('subprocesses', 0)}, "
+                     f"pipe I/O: {totals.get('pipe_bytes_sent', 0)} bytes sent, "
+                     f"{totals.get('pipe_bytes_received', 0)} bytes received, "
+                     f"temp file I/O: {totals.get('temp_bytes_written', 0)} bytes written")
+        return "\n".join(lines)
+
+
+class MetricsFile:
+    """
+    Hook appending one JSON line per finished span to a local metrics file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def __call__(self, event, span):
+        if event != "end":
+            return
+        line = json.dumps({"time": time.time(), "pid": os.getpid(), **span.to_dict()}) + "\n"
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(line)
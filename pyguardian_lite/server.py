@@ -0,0 +1,185 @@
+import json
+import os
+import socket
+import sys
+
+from pyguardian_lite.pg_files.timings import span
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+ANALYSIS_ERROR = -32000
+
+
+class ServerError(Exception):
+    """
+    Error response of the daemon.
+    """
+
+    def __init__(self, code, message):
+        super().__init__(f"{message} ({code})")
+        self.code = code
+        self.message = message
+
+
+def default_socket_path():
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("TMPDIR") or "/tmp"
+    return os.path.join(runtime_dir, f"pyguardian-lt-{os.getuid()}.sock")
+
+
+def request(method, params=None, socket_path=None, timeout=60):
+    """
+    Sends one JSON-RPC request to the daemon and returns its result. Raises OSError when no
+    daemon is listening and ServerError when the daemon answers with an error.
+    """
+    message = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params or {}}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        connection.connect(socket_path or default_socket_path())
+        connection.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        with connection.makefile("rb") as stream:
+            line = stream.readline()
+    if not line:
+        raise ConnectionError("The daemon closed the connection without answering")
+    response = json.loads(line)
+    if "error" in response:
+        raise ServerError(response["error"]["code"], response["error"]["message"])
+    return response["result"]
+
+
+class Daemon:
+    """
+    Keeps a warm Analyzer per policy file around and answers newline-delimited JSON-RPC requests.
+    A policy is reloaded when its file changes.
+    """
+
+    def __init__(self, backend="inprocess", scan_mode="combined", cache=None):
+        self.backend = backend
+        self.scan_mode = scan_mode
+        self.cache = cache
+        # policy path -> (mtime and size of the policy file, its Analyzer)
+        self.analyzers = {}
+        self.running = True
+
+    def current_analyzer(self, policy=None):
+        """
+        Returns the Analyzer of the policy file at `policy`, the one found from the daemon's own
+        directory when None. Clients send the policy they would use, see run_client.
+        """
+        from pyguardian_lite.config import find_config, load_compiled_policy
+        from pyguardian_lite.core import Analyzer
+
+        config_path = find_config(policy)
+        try:
+            stat = os.stat(config_path)
+            state = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            state = (None, None)
+        current = self.analyzers.get(config_path)
+        if current is None or state != current[0]:
+            # Built first and swapped in after, requests in flight keep their analyzer
+            current = self.analyzers[config_path] = (state, Analyzer(load_compiled_policy(config_path), self.backend,
+                                                                     self.scan_mode, self.cache))
+        return current[1]
+
+    def warm_up(self):
+        analyzer = self.current_analyzer()
+        if self.backend != "subprocess":
+            # Load the flake8 plugins before the first request comes in
+            analyzer.analyze_source("warmup.py", "import os\n")
+
+    def handle(self, message):
+        """
+        Returns the response for one request, or None for a notification.
+        """
+        if not isinstance(message, dict) or not isinstance(message.get("method"), str):
+            return error_response(None, INVALID_REQUEST, "Invalid request")
+        request_id = message.get("id")
+        params = message.get("params") or {}
+        method = getattr(self, "rpc_" + message["method"], None)
+        if method is None:
+            response = error_response(request_id, METHOD_NOT_FOUND, f"Unknown method '{message['method']}'")
+        else:
+            try:
+                with span("rpc:" + message["method"]):
+                    response = {"jsonrpc": "2.0", "id": request_id, "result": method(**params)}
+            except TypeError as e:
+                response = error_response(request_id, INVALID_PARAMS, str(e))
+            except Exception as e:
+                response = error_response(request_id, ANALYSIS_ERROR, f"{type(e).__name__}: {e}")
+        if "id" not in message:
+            return None
+        return response
+
+    def rpc_ping(self):
+        return "pong"
+
+    def rpc_analyze(self, path, display_name=None, policy=None):
+        return self.current_analyzer(policy).analyze(path, display_name)
+
+    def rpc_analyze_source(self, name, text, policy=None):
+        return self.current_analyzer(policy).analyze_source(name, text)
+
+    def rpc_shutdown(self):
+        self.running = False
+        return None
+
+
+def error_response(request_id, code, message):
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+def serve(socket_path=None, backend="inprocess", scan_mode="combined", cache=None):
+    """
+    Runs the daemon on a Unix socket until it receives a shutdown request or is interrupted.
+    """
+    import socketserver
+    import threading
+
+    socket_path = socket_path or default_socket_path()
+    if os.path.exists(socket_path):
+        try:
+            request("ping", socket_path=socket_path, timeout=2)
+        except OSError:
+            # Left behind by a daemon that didn't shut down cleanly
+            os.unlink(socket_path)
+        else:
+            print(f"A pyguardian-lt daemon is already listening on {socket_path}", file=sys.stderr)
+            sys.exit(1)
+
+    daemon = Daemon(backend, scan_mode, cache)
+    daemon.warm_up()
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    response = error_response(None, PARSE_ERROR, "Parse error")
+                else:
+                    response = daemon.handle(message)
+                if response is not None:
+                    self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+                if not daemon.running:
+                    # shutdown() waits for serve_forever to return, so call it from another thread
+                    threading.Thread(target=self.server.shutdown).start()
+                    return
+
+    class Server(socketserver.ThreadingUnixStreamServer):
+        # Open client connections don't keep the daemon alive
+        daemon_threads = True
+
+    with Server(socket_path, RequestHandler) as server:
+        os.chmod(socket_path, 0o600)
+        print(f"pyguardian-lt daemon listening on {socket_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
@@ -0,0 +1,118 @@
+import json
+import os
+
+import pytest
+
+from pyguardian_lite.config import load_config
+from pyguardian_lite.core import compile_policy, run_batch_analysis, run_source_analysis
+from pyguardian_lite.pg_files.cache import ResultCache
+
+SOURCE = "import subprocess\nsubprocess.call('ls', shell=True)\n"
+
+
+def policy_key(cache, config, source=SOURCE):
+    policy = compile_policy(config)
+    return cache.make_key(source, policy.rules, policy.severity, policy.extra_rules)
+
+
+def entry_keys(cache):
+    return {os.path.basename(path)[:-len(".json")] for _, _, path in cache.entries()}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "cache"))
+
+
+def test_key_follows_source_policy_and_versions(cache):
+    config = load_config()
+    key = policy_key(cache, config)
+    assert policy_key(cache, load_config()) == key
+    assert policy_key(cache, config, SOURCE + "\n") != key
+
+    config["meta"]["scan_timeouts"] = {"security": 5}
+    assert policy_key(cache, config) != key
+
+    cache.versions = cache.versions.replace("flake8==", "flake8==0.0.0+", 1)
+    assert policy_key(cache, load_config()) != key
+
+
+def test_hit_after_miss(cache):
+    config = load_config()
+    output = run_source_analysis("a.py", SOURCE, config, cache=cache)
+    assert output
+    assert cache.take_stats() == {"hits": 0, "misses": 1, "evictions": 0}
+    # Renamed files share the entry, the findings report the new name
+    renamed = [{**entry, "file": "b.py"} for entry in output]
+    assert run_source_analysis("b.py", SOURCE, config, cache=cache) == renamed
+    assert cache.take_stats() == {"hits": 1, "misses": 0, "evictions": 0}
+    assert cache.stats == {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def test_policy_change_misses(cache):
+    config = load_config()
+    run_source_analysis("a.py", SOURCE, config, cache=cache)
+    config["meta"]["scan_timeouts"] = {"security": 5}
+    run_source_analysis("a.py", SOURCE, config, cache=cache)
+    assert cache.take_stats()["misses"] == 2
+    assert len(entry_keys(cache)) == 2
+
+
+def test_eviction_keeps_recently_used_entries(cache):
+    cache.max_size = 1000
+    # 100 bytes per entry, ten of them fill the cache
+    diagnostics = [{"message": "x" * 83}]
+    assert len(json.dumps(diagnostics)) == 100
+    keys = [f"{index:02d}" + "0" * 62 for index in range(10)]
+    for age, key in enumerate(keys):
+        cache.put(key, diagnostics)
+        os.utime(cache.entry_path(key), (age, age))
+    assert cache.stats["evictions"] == 0
+    # The oldest entry was used again, the next oldest ones go first
+    assert cache.get(keys[0]) == diagnostics
+    cache.put("aa" + "0" * 62, diagnostics)
+
+    assert cache.measure() <= 0.9 * cache.max_size
+    assert cache.stats["evictions"] == 2
+    assert entry_keys(cache) == {keys[0], *keys[3:], "aa" + "0" * 62}
+
+
+def test_stats_of_pool_workers_are_added_up(cache, tmp_path):
+    files = []
+    for index in range(3):
+        path = tmp_path / f"module{index}.py"
+        path.write_text(SOURCE + f"value = {index}\n")
+        files.append(str(path))
+    config = load_config()
+    first = run_batch_analysis(files, config, jobs=2, cache=cache)
+    assert cache.take_stats() == {"hits": 0, "misses": 3, "evictions": 0}
+    assert run_batch_analysis(files, config, jobs=2, cache=cache) == first
+    assert cache.take_stats() == {"hits": 3, "misses": 0, "evictions": 0}
+
+
+def test_add_stats(cache):
+    cache.count("hits")
+    cache.add_stats({"hits": 2, "misses": 1, "evictions": 4})
+    cache.add_stats({"misses": 1})
+    assert cache.take_stats() == {"hits": 3, "misses": 2, "evictions": 4}
+
+
+def test_failed_scan_is_not_stored(cache):
+    config = load_config()
+    for entry in config["style_conventions"]["line_length"]:
+        if entry["error_code"] == "E501":
+            # flake8 rejects the option, the pycodestyle scan fails
+            entry["max_line_length"] = "abc"
+    run_source_analysis("a.py", SOURCE, config, cache=cache)
+    assert cache.entries() == []
+    run_source_analysis("a.py", SOURCE, config, cache=cache)
+    assert cache.take_stats()["hits"] == 0
+
+
+def test_partial_scan_is_not_stored(cache):
+    config = load_config()
+    # No flake8 process starts within a millisecond
+    config["meta"]["scan_timeouts"] = {"security": 0.001}
+    output = run_source_analysis("a.py", SOURCE, config, scan_mode="concurrent", cache=cache)
+    assert any(entry.get("partial") for entry in output)
+    assert cache.entries() == []
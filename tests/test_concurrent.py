@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+from pyguardian_lite.config import load_config
+from pyguardian_lite.core import run_source_analysis
+from pyguardian_lite.pg_files.analysis import Analysis
+from pyguardian_lite.pg_files.cache import ResultCache
+
+SOURCE = "import subprocess\nsubprocess.call('ls', shell=True)\nBadName=1\n"
+
+# Stands in for a bandit pass that hangs after its first finding, and leaves its pid behind
+HANGING_SCAN = """
+import os, sys, time
+print(":2:1: S602 subprocess call with shell=True identified, security issue.", flush=True)
+with open(sys.argv[1], "w") as f:
+    f.write(str(os.getpid()))
+time.sleep(60)
+"""
+
+
+@pytest.fixture
+def hanging_bandit(monkeypatch, tmp_path):
+    pid_path = tmp_path / "scan.pid"
+    flake8_command = Analysis.flake8_command
+
+    def command(self, arguments):
+        if any(argument.startswith("--select=S") for argument in arguments):
+            return [sys.executable, "-c", HANGING_SCAN, str(pid_path)]
+        return flake8_command(self, arguments)
+
+    monkeypatch.setattr(Analysis, "flake8_command", command)
+    return pid_path
+
+
+def test_timed_out_scan_is_killed_and_marked_partial(hanging_bandit, tmp_path):
+    config = load_config()
+    config["meta"]["scan_timeouts"] = {"security": 2}
+    cache = ResultCache(str(tmp_path / "cache"))
+    output = run_source_analysis("a.py", SOURCE, config, scan_mode="concurrent", cache=cache)
+
+    # The process was killed and reaped at the timeout
+    pid = int(hanging_bandit.read_text())
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+
+    security = [entry for entry in output if entry["category"] == "security"]
+    timeouts = [entry for entry in security if entry["message"].startswith("TIMEOUT")]
+    findings = [entry for entry in security if not entry["message"].startswith("TIMEOUT")]
+    assert len(timeouts) == 1
+    assert timeouts[0]["partial"] is True
+    assert "bandit scan timed out after 2s" in timeouts[0]["message"]
+    # The finding printed before the timeout is kept
+    assert [entry["message"].split()[0] for entry in findings] == ["S602"]
+    assert all(entry["partial"] is True for entry in findings)
+    # The categories that finished aren't partial
+    others = [entry for entry in output if entry["category"] != "security"]
+    assert others
+    assert not any("partial" in entry for entry in others)
+
+    assert cache.entries() == []
+
+
+def test_scans_within_their_timeout_are_complete(tmp_path):
+    config = load_config()
+    config["meta"]["scan_timeouts"] = {"default": 60}
+    expected = run_source_analysis("a.py", SOURCE, load_config())
+    output = run_source_analysis("a.py", SOURCE, config, scan_mode="concurrent")
+    assert output == expected
+    assert not any("partial" in entry for entry in output)
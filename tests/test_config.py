@@ -0,0 +1,101 @@
+import os
+import shutil
+
+import pytest
+import yaml
+
+from pyguardian_lite import config as config_module
+from pyguardian_lite.config import SNAPSHOT_SUFFIX, load_compiled_policy, load_config
+from pyguardian_lite.pg_files.rulesfilter import CompiledPolicy
+
+DEFAULT_POLICY = os.path.join(os.path.dirname(config_module.__file__), "config", "pipeguardian.yaml")
+
+
+@pytest.fixture
+def policy_path(tmp_path):
+    path = tmp_path / "pipeguardian.yaml"
+    shutil.copyfile(DEFAULT_POLICY, path)
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    return str(path)
+
+
+@pytest.fixture
+def compiles(monkeypatch):
+    # The policy paths compiled from the YAML, a reused snapshot doesn't show up
+    compiled = []
+    compile_snapshot = config_module.compile_snapshot
+
+    def counting(config_path):
+        compiled.append(config_path)
+        return compile_snapshot(config_path)
+
+    monkeypatch.setattr(config_module, "compile_snapshot", counting)
+    return compiled
+
+
+def expected_policy(path):
+    with open(path) as f:
+        return CompiledPolicy.from_config(yaml.safe_load(f)).to_data()
+
+
+def line_length(config):
+    return next(entry["max_line_length"] for entry in config["style_conventions"]["line_length"]
+                if entry["error_code"] == "E501")
+
+
+def test_snapshot_is_written_and_reused(policy_path, compiles):
+    assert load_compiled_policy(policy_path).to_data() == expected_policy(policy_path)
+    assert os.path.isfile(policy_path + SNAPSHOT_SUFFIX)
+    assert load_compiled_policy(policy_path).to_data() == expected_policy(policy_path)
+    assert compiles == [policy_path]
+
+
+def test_touched_policy_reuses_the_snapshot(policy_path, compiles):
+    load_compiled_policy(policy_path)
+    os.utime(policy_path, ns=(2_000_000_000, 2_000_000_000))
+    assert load_compiled_policy(policy_path).to_data() == expected_policy(policy_path)
+    assert compiles == [policy_path]
+    # The snapshot took the new mtime, the content isn't hashed again
+    assert config_module.read_snapshot(policy_path + SNAPSHOT_SUFFIX)["mtime"] == 2_000_000_000
+
+
+def test_changed_policy_is_parsed_again(policy_path, compiles):
+    assert line_length(load_config(policy_path)) == 79
+    with open(policy_path) as f:
+        content = f.read()
+    # Same size, only the content hash tells the versions apart
+    with open(policy_path, "w") as f:
+        f.write(content.replace("max_line_length: 79 ", "max_line_length: 99 ", 1))
+    os.utime(policy_path, ns=(2_000_000_000, 2_000_000_000))
+
+    assert line_length(load_config(policy_path)) == 99
+    assert load_compiled_policy(policy_path).to_data() == expected_policy(policy_path)
+    assert compiles == [policy_path, policy_path]
+
+
+@pytest.mark.parametrize("damage", ["truncate", "garbage", "magic", "empty"])
+def test_damaged_snapshot_falls_back_to_the_yaml(policy_path, compiles, damage):
+    load_compiled_policy(policy_path)
+    snapshot_path = policy_path + SNAPSHOT_SUFFIX
+    with open(snapshot_path, "rb") as f:
+        data = f.read()
+    damaged = {
+        "truncate": data[:len(data) // 2],
+        "garbage": data[:len(config_module.SNAPSHOT_MAGIC)] + b"\xff" * 64,
+        "magic": b"XXXXXXXX" + data[8:],
+        "empty": b"",
+    }[damage]
+    with open(snapshot_path, "wb") as f:
+        f.write(damaged)
+
+    assert load_compiled_policy(policy_path).to_data() == expected_policy(policy_path)
+    assert compiles == [policy_path, policy_path]
+    # The snapshot was written again
+    assert config_module.read_snapshot(snapshot_path) is not None
+
+
+def test_snapshot_of_another_compiler_is_ignored(policy_path, compiles, monkeypatch):
+    load_compiled_policy(policy_path)
+    monkeypatch.setattr(config_module, "compiler_signature", lambda: [0, 0])
+    assert load_compiled_policy(policy_path).to_data() == expected_policy(policy_path)
+    assert compiles == [policy_path, policy_path]
@@ -0,0 +1,53 @@
+import shutil
+import subprocess
+
+import pytest
+
+from pyguardian_lite.gitdiff import changed_lines, diff_path, parse_hunks, staged_lines
+
+
+def test_plain_path():
+    patch = b"+++ b/pkg/mod.py\n@@ -3,0 +4,2 @@\n"
+    assert parse_hunks(patch) == {"pkg/mod.py": [(4, 5)]}
+
+
+def test_path_with_spaces():
+    # git ends the header with a tab when the path contains a space
+    patch = b"+++ b/sp ace/c.py\t\n@@ -1 +1 @@\n@@ -9,2 +10,3 @@\n"
+    assert parse_hunks(patch) == {"sp ace/c.py": [(1, 1), (10, 12)]}
+
+
+def test_quoted_path():
+    patch = b'+++ "b/caf\\303\\251.py"\n@@ -2,0 +3 @@\n'
+    assert parse_hunks(patch) == {"café.py": [(3, 3)]}
+
+
+def test_quoted_path_with_escapes():
+    assert diff_path(b'"b/a \\"q\\"\\tb.py"') == 'a "q"\tb.py'
+
+
+def test_deletions_and_other_files():
+    patch = (b"+++ b/README.md\n@@ -1 +1 @@\n"
+             b"+++ b/x y.py\t\n@@ -5,2 +4,0 @@\n"
+             b"+++ /dev/null\n@@ -1,3 +0,0 @@\n")
+    assert parse_hunks(patch) == {"x y.py": []}
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_git_diff_of_special_paths(tmp_path):
+    def git(*arguments):
+        subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@t", *arguments], cwd=tmp_path,
+                       check=True, capture_output=True)
+
+    names = ["sp ace.py", "café.py", "plain.py"]
+    git("init", "-q")
+    for name in names:
+        (tmp_path / name).write_text("a = 1\nb = 2\n")
+    git("add", ".")
+    git("commit", "-q", "-m", "base")
+    for name in names:
+        (tmp_path / name).write_text("a = 1\nb = 3\nc = 4\n")
+    expected = {name: [(2, 3)] for name in names}
+    assert changed_lines("HEAD", cwd=tmp_path) == expected
+    git("add", ".")
+    assert staged_lines(cwd=tmp_path) == expected
@@ -0,0 +1,69 @@
+import pytest
+
+from pyguardian_lite.core import Analyzer, run_source_analysis
+
+BASE = '''import os
+import sys
+
+
+def first(a):
+    return a + 1
+
+
+class Holder:
+    value = 1
+
+    def get(self):
+        return self.value
+
+
+def last():
+    print(os.sep)
+'''
+
+# Each step replaces the document with the source returned for the previous one
+EDITS = [
+    ("edit a body", lambda source: source.replace("return a + 1", "return a+1  ")),
+    ("add a function", lambda source: source + "\n\ndef Added( x ):\n    eval(x)\n"),
+    ("remove an import", lambda source: source.replace("import sys\n", "")),
+    ("insert lines at the top", lambda source: "# header\n\n" + source),
+    ("break the syntax", lambda source: source + "\ndef broken(:\n"),
+    ("fix the syntax", lambda source: source.replace("\ndef broken(:\n", "")),
+    ("rename a class", lambda source: source.replace("class Holder", "class holder_Bad")),
+    ("clear the document", lambda source: ""),
+    ("type again", lambda source: "x=1\n"),
+    ("paste the base", lambda source: BASE),
+    ("delete everything but a line", lambda source: "import os\n"),
+    ("clear again", lambda source: ""),
+]
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return Analyzer()
+
+
+def test_edit_sequence_matches_full_analysis(analyzer):
+    document = analyzer.incremental()
+    source = BASE
+    assert document.analyze("doc.py", source) == run_source_analysis("doc.py", source, analyzer.policy)
+    for step, edit in EDITS:
+        source = edit(source)
+        expected = run_source_analysis("doc.py", source, analyzer.policy)
+        assert document.analyze("doc.py", source) == expected, step
+
+
+def test_edits_are_checked_in_a_window(analyzer):
+    document = analyzer.incremental()
+    document.analyze("doc.py", BASE)
+    source = BASE.replace("print(os.sep)", "print( os.sep )")
+    assert document.analyze("doc.py", source) == run_source_analysis("doc.py", source, analyzer.policy)
+    assert document.last_window is not None
+
+
+def test_cleared_document_starts_over(analyzer):
+    document = analyzer.incremental()
+    document.analyze("doc.py", BASE)
+    assert document.analyze("doc.py", "") == run_source_analysis("doc.py", "", analyzer.policy)
+    assert document.lines is None and document.last_window is None
+    assert document.analyze("doc.py", BASE) == run_source_analysis("doc.py", BASE, analyzer.policy)
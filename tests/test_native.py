@@ -0,0 +1,146 @@
+import pytest
+
+from pyguardian_lite.config import load_config
+from pyguardian_lite.core import run_source_analysis
+
+SOURCES = {
+    "naming": '''import os as OS
+
+
+class lower_case:
+    classAttr = 1
+
+    def Method(this, Arg):
+        CamelVar = Arg
+        return CamelVar
+
+    @classmethod
+    def build(self):
+        return self
+
+
+def BadName(X=1, *Args, **Kwargs):
+    global Shared
+    for Item in Args:
+        print(Item)
+    return [Value for Value in Kwargs]
+
+
+class GoodError(Exception):
+    pass
+
+
+class BadException(Exception):
+    pass
+
+
+Lambda = lambda x: x  # noqa: E731
+mixedCase = 2
+''',
+    # Spelled out, the trailing whitespace is part of the sample
+    "physical": ("x = 1   \n"
+                 "y = 2\t\n"
+                 "# a comment that runs past the default maximum line length of seventy-nine characters\n"
+                 'url = "https://example.invalid/a/path/that/is/long/enough/to/pass/the/length/limit"  # noqa: E501\n'
+                 "z = 3  \\\n"
+                 "    + 4\n"
+                 "   \n"
+                 "w = 5"),
+    "complexity": '''def branches(a, b, c):
+    if a:
+        for item in b:
+            if item and c:
+                while c:
+                    c -= 1
+            elif item or a:
+                try:
+                    pass
+                except ValueError:
+                    pass
+    else:
+        return [x for x in b if x]
+    with open(a) as handle:
+        return handle.read() if c else None
+
+
+class Outer:
+    def method(self, value):
+        def inner():
+            return 1 if value else 2
+        if value:
+            return inner()
+        return None
+
+
+async def coroutine(items):
+    async for item in items:
+        if item:
+            return item
+''',
+    "mixed": '''import os, sys
+import subprocess
+def BadName(X):
+    assert X
+    y = eval("1")
+    subprocess.call("ls", shell=True)
+    if X == None:
+        return 1
+    l = 1
+    return os.path.join("a","b")
+class foo:
+    def m(this): pass
+password = "hunter2"
+''',
+}
+
+
+def configure(config, error_code, key, value):
+    # Sets `key` of the policy entry with this error code, wherever it is nested
+    if isinstance(config, dict):
+        if config.get("error_code") == error_code:
+            config[key] = value
+        for child in config.values():
+            configure(child, error_code, key, value)
+    elif isinstance(config, list):
+        for child in config:
+            configure(child, error_code, key, value)
+
+
+def policy(line_length=None, complexity=None):
+    config = load_config()
+    if line_length is not None:
+        configure(config, "E501", "max_line_length", line_length)
+    if complexity is not None:
+        configure(config, "C901", "value", complexity)
+    return config
+
+
+def assert_parity(name, source, config):
+    expected = run_source_analysis(name, source, config, backend="inprocess")
+    assert run_source_analysis(name, source, config, backend="native") == expected
+
+
+@pytest.mark.parametrize("name", sorted(SOURCES))
+@pytest.mark.parametrize("scan_mode", ["combined", "separate"])
+def test_native_matches_inprocess(name, scan_mode):
+    config = policy(complexity=5)
+    source = SOURCES[name]
+    expected = run_source_analysis(f"{name}.py", source, config, backend="inprocess", scan_mode=scan_mode)
+    assert expected
+    assert run_source_analysis(f"{name}.py", source, config, backend="native", scan_mode=scan_mode) == expected
+
+
+@pytest.mark.parametrize("complexity", [1, 3, -3, 0])
+def test_native_complexity_settings(complexity):
+    assert_parity("complexity.py", SOURCES["complexity"], policy(complexity=complexity))
+
+
+@pytest.mark.parametrize("line_length", [40, 120, "abc"])
+def test_native_line_length_settings(line_length):
+    assert_parity("physical.py", SOURCES["physical"], policy(line_length=line_length))
+
+
+def test_native_on_empty_and_broken_sources():
+    config = policy()
+    for source in ["", "\n", "def broken(:\n    pass\n"]:
+        assert_parity("edge.py", source, config)
@@ -0,0 +1,54 @@
+import pytest
+
+from pyguardian_lite.config import load_config
+from pyguardian_lite.core import run_source_analysis
+from pyguardian_lite.pg_files.engine import get_engine
+from pyguardian_lite.pg_files.profiler import RuleProfiler
+
+SOURCE = '''import pickle
+import subprocess
+
+
+def load(data):
+    subprocess.call(data, shell=True)
+    return pickle.loads(data)
+'''
+
+
+@pytest.fixture
+def report():
+    profiler = RuleProfiler().install(get_engine())
+    try:
+        run_source_analysis("profiled.py", SOURCE, load_config())
+    finally:
+        profiler.uninstall()
+    return profiler.report()
+
+
+def check(report, plugin, name):
+    for entry in report:
+        if entry["name"] == plugin:
+            for found in entry["checks"]:
+                if found["name"] == name:
+                    return found
+    raise AssertionError(f"no {plugin} {name} row in the report")
+
+
+def test_blacklist_maps_to_rulebook_types(report):
+    blacklist = check(report, "flake8-bandit[S]", "blacklist")
+    assert "S001" not in blacklist["codes"]
+    assert {"S301", "S404", "S602"} & set(blacklist["codes"]) == {"S301", "S404"}
+    assert all(code[:2] in ("S3", "S4") for code in blacklist["codes"])
+    assert blacklist["categories"] == ["security"]
+    assert {"pickle-used", "security-implications-subprocess"} <= set(blacklist["types"])
+
+
+def test_bandit_tests_keep_their_own_code(report):
+    shell = check(report, "flake8-bandit[S]", "subprocess_popen_with_shell_equals_true")
+    assert shell["codes"] == ["S602"]
+    assert shell["categories"] == ["security"]
+
+
+def test_uninstall_restores_the_engine(report):
+    findings = run_source_analysis("profiled.py", SOURCE, load_config())
+    assert {finding["message"].split()[0] for finding in findings} >= {"S301", "S404", "S602"}
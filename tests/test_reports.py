@@ -0,0 +1,103 @@
+import io
+import json
+import sys
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+
+from pyguardian_lite.cli import main
+from pyguardian_lite.config import load_config
+from pyguardian_lite.core import run_source_analysis
+from pyguardian_lite.pg_files.reports import JUnitWriter, SarifWriter, rule_metadata
+
+DIRTY = "import subprocess\nsubprocess.call('ls', shell=True)\nBadName=1\n"
+CLEAN = "VALUE = 1\n"
+
+
+def finding(name, code, message, line=1, position=1):
+    return {"file": name, "line": line, "position": position, "severity": "error", "message": f"{code} {message}",
+            "category": "style_conventions"}
+
+
+def write_report(writer_class, outputs):
+    stream = io.StringIO()
+    writer = writer_class(stream, rule_metadata(load_config()))
+    writer.start()
+    for name, output in outputs:
+        writer.write(output, name)
+    writer.finish()
+    return stream.getvalue()
+
+
+def test_sarif_rule_indexes_point_at_their_rules():
+    config = load_config()
+    outputs = [("a.py", run_source_analysis("a.py", DIRTY, config)),
+               ("b.py", [finding("b.py", "X100", "reported by a plugin outside the rulebook")]),
+               ("clean.py", []),
+               ("c.py", run_source_analysis("c.py", DIRTY, config))]
+    log = json.loads(write_report(SarifWriter, outputs))
+
+    run = log["runs"][0]
+    rules = run["tool"]["driver"]["rules"]
+    results = run["results"]
+    assert len(results) == sum(len(output) for _, output in outputs)
+    assert len({rule["id"] for rule in rules}) == len(rules)
+    assert {rule["id"] for rule in rules} == {result["ruleId"] for result in results}
+    for result in results:
+        assert rules[result["ruleIndex"]]["id"] == result["ruleId"]
+    # A code outside the rulebook is listed without metadata
+    assert {"id": "X100"} in rules
+
+
+def test_sarif_without_results():
+    log = json.loads(write_report(SarifWriter, [("clean.py", [])]))
+    assert log["runs"][0]["results"] == []
+    assert log["runs"][0]["tool"]["driver"]["rules"] == []
+
+
+def suites(report):
+    return {suite.get("name"): suite for suite in ElementTree.fromstring(report).iter("testsuite")}
+
+
+def test_junit_passes_clean_files():
+    config = load_config()
+    report = write_report(JUnitWriter, [("dirty.py", run_source_analysis("dirty.py", DIRTY, config)),
+                                        ("clean.py", run_source_analysis("clean.py", CLEAN, config))])
+    found = suites(report)
+    assert set(found) == {"dirty.py", "clean.py"}
+
+    clean = found["clean.py"]
+    assert (clean.get("tests"), clean.get("failures")) == ("1", "0")
+    [testcase] = clean.findall("testcase")
+    assert testcase.find("failure") is None
+
+    dirty = found["dirty.py"]
+    assert int(dirty.get("failures")) == len(dirty.findall("testcase/failure")) > 0
+
+
+def test_junit_escapes_markup_and_control_characters():
+    message = 'bad <tag> & "quote"\x00\x1b[31m\x0c end'
+    report = write_report(JUnitWriter, [("we<ird>&.py", [finding("we<ird>&.py", "E999", message)])])
+    suite = suites(report)["we<ird>&.py"]
+    failure = suite.find("testcase/failure")
+    expected = 'bad <tag> & "quote"\ufffd\ufffd[31m\ufffd end'
+    assert failure.get("message") == expected
+    assert failure.text.endswith("E999 " + expected)
+
+
+@pytest.mark.parametrize("output_format", ["junit", "sarif"])
+def test_cli_reports_every_file(tmp_path, monkeypatch, capsys, output_format):
+    clean = tmp_path / "clean.py"
+    clean.write_text(CLEAN)
+    dirty = tmp_path / "dirty.py"
+    dirty.write_text(DIRTY)
+    monkeypatch.setattr(sys, "argv", ["pyguardian-lt", "--format", output_format, str(clean), str(dirty)])
+    main()
+    report = capsys.readouterr().out
+    if output_format == "junit":
+        assert {name.rsplit("/", 1)[-1] for name in suites(report)} == {"clean.py", "dirty.py"}
+    else:
+        results = json.loads(report)["runs"][0]["results"]
+        assert results
+        assert {result["locations"][0]["physicalLocation"]["artifactLocation"]["uri"].rsplit("/", 1)[-1]
+                for result in results} == {"dirty.py"}
@@ -0,0 +1,78 @@
+import pytest
+
+from pyguardian_lite.config import load_config
+from pyguardian_lite.core import policy_tiers, run_analysis, run_tiered_analysis
+from pyguardian_lite.pg_files.cache import ResultCache
+
+SOURCE = '''import subprocess
+
+
+def BadName(a, b):
+    if a:
+        for item in b:
+            if item:
+                subprocess.call(item, shell=True)
+    return a
+x=1
+'''
+
+TIERS = {"naming_conventions": 1, "style_conventions": 1, "code_complexity": 2, "security": 2}
+
+
+def tiered_config():
+    config = load_config()
+    config["meta"]["tiers"] = dict(TIERS)
+    for entry in config["style_conventions"]["code_complexity"]:
+        entry["value"] = 2
+    return config
+
+
+def ordered(findings):
+    return sorted(findings, key=lambda entry: (entry["line"], entry["position"], entry["message"]))
+
+
+@pytest.fixture
+def source_path(tmp_path):
+    path = tmp_path / "tiered.py"
+    path.write_text(SOURCE)
+    return str(path)
+
+
+def test_code_complexity_gets_its_own_tier():
+    assert policy_tiers(tiered_config()) == [(1, {"naming_conventions", "style_conventions"}),
+                                             (2, {"code_complexity", "security"})]
+    # Without a tier of its own it follows style_conventions
+    config = tiered_config()
+    del config["meta"]["tiers"]["code_complexity"]
+    assert policy_tiers(config) == [(1, {"naming_conventions", "style_conventions", "code_complexity"}),
+                                    (2, {"security"})]
+
+
+@pytest.mark.parametrize("backend, scan_mode", [("inprocess", "combined"), ("inprocess", "separate"),
+                                                ("native", "combined")])
+def test_tiers_add_up_to_a_full_run(source_path, backend, scan_mode):
+    config = tiered_config()
+    tiers = dict(run_tiered_analysis(source_path, config, backend, scan_mode))
+    assert sorted(tiers) == [1, 2]
+    assert {entry["category"] for entry in tiers[1]} == {"naming_conventions", "style_conventions"}
+    assert {entry["message"].split()[0] for entry in tiers[2]} == {"C901", "S404", "S602"}
+
+    full = run_analysis(source_path, config, backend, scan_mode)
+    assert ordered(tiers[1] + tiers[2]) == ordered(full)
+
+
+def test_tier_entries_are_cached_apart(source_path, tmp_path):
+    config = tiered_config()
+    cache = ResultCache(str(tmp_path / "cache"))
+    tiers = dict(run_tiered_analysis(source_path, config, cache=cache))
+    assert cache.take_stats()["misses"] == 2
+
+    # A whole-policy run neither hits a tier's entry nor overwrites it
+    full = run_analysis(source_path, config, cache=cache)
+    assert cache.take_stats() == {"hits": 0, "misses": 1, "evictions": 0}
+    assert ordered(full) == ordered(tiers[1] + tiers[2])
+    assert len(cache.entries()) == 3
+
+    assert dict(run_tiered_analysis(source_path, config, cache=cache)) == tiers
+    assert run_analysis(source_path, config, cache=cache) == full
+    assert cache.take_stats() == {"hits": 3, "misses": 0, "evictions": 0}
@@ -0,0 +1,42 @@
+import pytest
+
+from pyguardian_lite.config import load_config
+from pyguardian_lite.core import run_analysis, run_source_analysis
+from pyguardian_lite.pg_files.timings import TimingCollector, add_hook, remove_hook
+
+SOURCE = ("import subprocess\n"
+          "def BadName(X):\n"
+          "    subprocess.call(X, shell=True)\n"
+          "    return X  \n")
+
+
+@pytest.fixture
+def collector():
+    collector = add_hook(TimingCollector())
+    yield collector
+    remove_hook(collector)
+
+
+@pytest.mark.parametrize("scan_mode", ["combined", "separate"])
+def test_every_scanner_is_timed(collector, scan_mode):
+    config = load_config()
+    expected = run_source_analysis("timed.py", SOURCE, config, scan_mode=scan_mode)
+    collector.stages.clear()
+    assert run_source_analysis("timed.py", SOURCE, config, scan_mode=scan_mode) == expected
+    assert {"check:pyflakes[F]", "check:mccabe[C90]", "check:pep8-naming[N8]", "check:flake8-bandit[S]",
+            "check:pycodestyle[E]", "check:pycodestyle[W]"} <= set(collector.stages)
+    # The line checks are added up per file, the lines are counted
+    assert collector.stages["check:pycodestyle[W]"]["counters"]["calls"] >= len(SOURCE.splitlines())
+
+
+def test_timing_leaves_the_findings_alone(tmp_path):
+    path = tmp_path / "timed.py"
+    path.write_text(SOURCE)
+    config = load_config()
+    expected = run_analysis(str(path), config)
+    collector = add_hook(TimingCollector())
+    try:
+        assert run_analysis(str(path), config) == expected
+    finally:
+        remove_hook(collector)
+    assert "check:pycodestyle[E]" in collector.stages